@@ -0,0 +1,203 @@
+# backend/converter_app/batch.py
+"""
+Batch conversion: many files in, one NDJSON line out per file as soon as it
+finishes. Files run through aconvert_with_mcp with a bounded number of
+workers, so the usual cache, coalescing and LLM limiter all still apply.
+"""
+
+import asyncio
+import io
+import json
+import os
+import tarfile
+import time
+import zipfile
+
+from .limiter import LimiterBusy
+from .mcp_connector import aconvert_with_mcp
+
+BATCH_CONCURRENCY = int(os.getenv("CONVERT_BATCH_CONCURRENCY", "4"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("CONVERT_BATCH_MAX_CONCURRENCY", "16"))
+BATCH_MAX_FILES = int(os.getenv("CONVERT_BATCH_MAX_FILES", "500"))
+BATCH_MAX_FILE_BYTES = int(os.getenv("CONVERT_BATCH_MAX_FILE_BYTES", str(256 * 1024)))
+BUSY_RETRIES = 3
+
+LANG_BY_EXT = {
+    ".py": "python",
+    ".go": "go",
+    ".java": "java",
+    ".js": "js", ".mjs": "js",
+    ".c": "c", ".h": "c",
+    ".cpp": "cpp", ".cc": "cpp", ".cxx": "cpp", ".hpp": "cpp",
+}
+EXT_BY_LANG = {
+    "python": "py", "py": "py",
+    "go": "go",
+    "java": "java",
+    "js": "js", "javascript": "js",
+    "c": "c",
+    "cpp": "cpp", "c++": "cpp",
+}
+
+
+class BatchError(ValueError):
+    """Malformed batch input; reported to the client as a 400."""
+
+
+def clamp_concurrency(value):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return BATCH_CONCURRENCY
+    return max(1, min(value, BATCH_MAX_CONCURRENCY))
+
+
+def output_path(path, target_lang):
+    ext = EXT_BY_LANG.get((target_lang or "").lower().strip())
+    if not ext:
+        return path
+    return os.path.splitext(path)[0] + "." + ext
+
+
+def files_from_json(items, default_lang=""):
+    """Validate a JSON list of {path, source_code, source_lang?} entries."""
+    if not isinstance(items, list) or not items:
+        raise BatchError("'files' must be a non-empty list")
+    if len(items) > BATCH_MAX_FILES:
+        raise BatchError(f"Too many files (max {BATCH_MAX_FILES})")
+
+    files = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise BatchError(f"files[{i}] must be an object")
+        path = item.get("path") or f"file_{i}"
+        lang = item.get("source_lang") or default_lang or _lang_for(path)
+        files.append({"path": path, "source_code": item.get("source_code", ""), "source_lang": lang})
+    return files
+
+
+def files_from_archive(upload, default_lang=""):
+    """Read source files out of an uploaded .zip or .tar(.gz) archive."""
+    data = upload.read()
+    name = (getattr(upload, "name", "") or "").lower()
+    try:
+        if name.endswith(".zip") or zipfile.is_zipfile(io.BytesIO(data)):
+            members = _zip_members(data)
+        else:
+            members = _tar_members(data)
+    except (zipfile.BadZipFile, tarfile.TarError) as e:
+        raise BatchError(f"Unreadable archive: {e}")
+
+    files = []
+    for path, raw in members:
+        lang = default_lang or _lang_for(path)
+        if not lang:
+            continue  # not a source file we know how to convert
+        if len(files) >= BATCH_MAX_FILES:
+            raise BatchError(f"Too many files (max {BATCH_MAX_FILES})")
+        files.append({"path": path, "source_code": raw, "source_lang": lang})
+    if not files:
+        raise BatchError("Archive contains no supported source files")
+    return files
+
+
+def _lang_for(path):
+    return LANG_BY_EXT.get(os.path.splitext(path)[1].lower(), "")
+
+
+def _zip_members(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            if info.file_size > BATCH_MAX_FILE_BYTES:
+                yield info.filename, None
+                continue
+            yield info.filename, zf.read(info)
+
+
+def _tar_members(data):
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:*") as tf:
+        for member in tf:
+            if not member.isfile():
+                continue
+            if member.size > BATCH_MAX_FILE_BYTES:
+                yield member.name, None
+                continue
+            yield member.name, tf.extractfile(member).read()
+
+
+async def _convert_one(index, item, target_lang, use_cache):
+    started = time.monotonic()
+    line = {"index": index, "path": item["path"], "output_path": output_path(item["path"], target_lang)}
+
+    source = item["source_code"]
+    if source is None:
+        return dict(line, status="error", error=f"File larger than {BATCH_MAX_FILE_BYTES} bytes")
+    if isinstance(source, bytes):
+        try:
+            source = source.decode("utf-8")
+        except UnicodeDecodeError:
+            return dict(line, status="error", error="File is not valid UTF-8")
+    if not source.strip():
+        return dict(line, status="error", error="Empty source")
+    if not item["source_lang"]:
+        return dict(line, status="error", error="Unknown source language")
+
+    for attempt in range(BUSY_RETRIES):
+        try:
+            res = await aconvert_with_mcp(source, item["source_lang"], target_lang, use_cache=use_cache)
+            break
+        except LimiterBusy as e:
+            if attempt == BUSY_RETRIES - 1:
+                return dict(line, status="error", error=str(e))
+            await asyncio.sleep(e.retry_after)
+
+    line["elapsed_ms"] = round((time.monotonic() - started) * 1000)
+    if res.get("status") == "error":
+        return dict(line, status="error", error=res.get("message", "MCP error"))
+    return dict(line, status="ok", converted_code=res.get("converted_code", ""),
+                cache=res.get("cache", "disabled"), coalesced=res.get("coalesced", False),
+                model=res.get("model"), truncated=res.get("truncated", False))
+
+
+async def stream_batch(files, target_lang, concurrency=BATCH_CONCURRENCY, use_cache=True):
+    """Convert files with at most `concurrency` in flight, yielding NDJSON lines as they complete."""
+    started = time.monotonic()
+    pending = asyncio.Queue()
+    for index, item in enumerate(files):
+        pending.put_nowait((index, item))
+    done = asyncio.Queue()
+
+    async def worker():
+        while True:
+            try:
+                index, item = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                line = await _convert_one(index, item, target_lang, use_cache)
+            except Exception as e:
+                # isolate per-file failures from the rest of the batch
+                line = {"index": index, "path": item["path"], "status": "error", "error": f"Conversion failed: {e}"}
+            await done.put(line)
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(files)))]
+    ok = failed = 0
+    try:
+        for _ in range(len(files)):
+            line = await done.get()
+            if line["status"] == "ok":
+                ok += 1
+            else:
+                failed += 1
+            yield json.dumps(line) + "\n"
+    finally:
+        # client went away or we are done: never leave workers running
+        for task in workers:
+            task.cancel()
+
+    yield json.dumps({
+        "summary": True, "files": len(files), "ok": ok, "failed": failed,
+        "concurrency": len(workers), "elapsed_ms": round((time.monotonic() - started) * 1000),
+    }) + "\n"
@@ -0,0 +1,354 @@
+# backend/converter_app/build_cache.py
+"""
+Content-addressed cache of compiled programs for the Run buttons.
+
+C, C++, Go and Java sources are compiled once per (source, toolchain version,
+flags) and the artifacts are kept on local disk, so pressing Run again with
+different stdin skips the compiler entirely. Entries are directories named by
+a sha256 key; the least recently used ones are evicted once the cache grows
+past BUILD_CACHE_BYTES. Concurrent builds of the same key share one compile.
+
+prepare() is the single entry point used by every runner: it writes the
+source, compiles (or reuses) it and returns the command to execute. Java is
+compiled on a resident compile server and launched with a class-data-sharing
+archive once those are ready (see java_runtime.py). C and C++ builds use
+precompiled headers (pch.py) and, when it is installed, ccache; Go builds a
+binary against a managed, pre-warmed GOCACHE (go_cache.py). All of these
+also speed up programs never seen before.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from .go_cache import go_cache
+from .java_runtime import java_runtime
+from .pch import precompiled_headers
+from .singleflight import SingleFlight
+
+BUILD_CACHE_ENABLED = os.getenv("BUILD_CACHE", "1") == "1"
+BUILD_CACHE_DIR = os.getenv("BUILD_CACHE_DIR", os.path.join(tempfile.gettempdir(), "code_converter_builds"))
+BUILD_CACHE_BYTES = int(os.getenv("BUILD_CACHE_BYTES", str(512 * 1024 * 1024)))
+BUILD_CACHE_MIN_AGE = 60  # seconds; recently used entries may be running right now
+# "auto" uses ccache for C/C++ when it is on PATH, "0" never
+BUILD_CCACHE = os.getenv("BUILD_CCACHE", "auto")
+CCACHE = shutil.which("ccache") if BUILD_CCACHE != "0" else None
+CCACHE_ENV = dict(
+    os.environ,
+    CCACHE_DIR=os.getenv("CCACHE_DIR") or os.path.join(tempfile.gettempdir(), "code_converter_ccache"),
+    CCACHE_MAXSIZE=os.getenv("CCACHE_MAXSIZE", "1G"),
+    # builds happen in throwaway staging directories and may force-include a PCH
+    CCACHE_NOHASHDIR="1",
+    CCACHE_SLOPPINESS="pch_defines,time_macros,include_file_mtime,include_file_ctime",
+)
+
+FLAGS = {
+    "c": shlex.split(os.getenv("BUILD_CFLAGS", "")),
+    "cpp": shlex.split(os.getenv("BUILD_CXXFLAGS", "")),
+    "go": shlex.split(os.getenv("BUILD_GOFLAGS", "")),
+    "java": shlex.split(os.getenv("BUILD_JAVACFLAGS", "")),
+}
+COMPILERS = {"c": "gcc", "cpp": "g++", "go": "go", "java": "javac"}
+SOURCE_NAMES = {"python": "Main.py", "js": "Main.js", "c": "main.c", "cpp": "main.cpp", "go": "main.go"}
+LANG_ALIASES = {"py": "python", "javascript": "js", "c++": "cpp", "golang": "go"}
+
+_JAVA_PUBLIC_RE = re.compile(r"\bpublic\s+(?:final\s+|abstract\s+)*class\s+([A-Za-z_]\w*)")
+_JAVA_CLASS_RE = re.compile(r"\bclass\s+([A-Za-z_]\w*)")
+_JAVA_MAIN_RE = re.compile(r"\bstatic\s+void\s+main\s*\(")
+
+# how the last compile on this thread was done, for prepare()'s metrics
+_last_compile = threading.local()
+BUILD_METRICS = ("jvm", "cc", "go")  # prepare() keys the runners copy into a run's metrics
+
+
+def normalize_lang(lang: str) -> str:
+    lang = (lang or "").lower().strip()
+    return LANG_ALIASES.get(lang, lang)
+
+
+def java_class_names(code: str):
+    """Return (file stem, main class) for a Java source; both default to Main."""
+    public = _JAVA_PUBLIC_RE.search(code)
+    main = _JAVA_MAIN_RE.search(code)
+    main_class = None
+    if main:
+        declared = [m for m in _JAVA_CLASS_RE.finditer(code) if m.start() < main.start()]
+        main_class = declared[-1].group(1) if declared else None
+    stem = public.group(1) if public else (main_class or "Main")
+    return stem, main_class or stem
+
+
+_version_lock = threading.Lock()
+_versions = {}
+
+
+def toolchain_version(tool: str) -> str:
+    """Identify the installed compiler; re-checked when the binary changes."""
+    path = shutil.which(tool)
+    if path is None:
+        return ""
+    try:
+        ident = (path, os.stat(path).st_mtime)
+    except OSError:
+        return ""
+    with _version_lock:
+        if ident in _versions:
+            return _versions[ident]
+    args = {"go": ["version"], "javac": ["-version"]}.get(tool, ["--version"])
+    try:
+        proc = subprocess.run([path] + args, capture_output=True, text=True, timeout=10)
+        version = ((proc.stdout or proc.stderr).strip().splitlines() or [""])[0]
+    except (OSError, subprocess.SubprocessError):
+        version = ""
+    version = f"{path} {version}"
+    with _version_lock:
+        _versions[ident] = version
+    return version
+
+
+def build_key(lang: str, code: str) -> str:
+    h = hashlib.sha256()
+    for part in (lang, toolchain_version(COMPILERS[lang]), "\0".join(FLAGS[lang])):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    h.update(code.encode("utf-8"))
+    return h.hexdigest()
+
+
+def _compile(lang, code, outdir, timeout):
+    """Compile into outdir. Returns (meta, error_text); meta describes how to run it."""
+    # relative names keep compiler messages free of cache paths
+    if lang == "java":
+        stem, main_class = java_class_names(code)
+        src = stem + ".java"
+        meta = {"main_class": main_class}
+    else:
+        src = SOURCE_NAMES[lang]
+        meta = {"exe": "main"}
+    with open(os.path.join(outdir, src), "w", encoding="utf-8") as f:
+        f.write(code)
+
+    if lang == "java":
+        served = java_runtime.compile(FLAGS["java"] + ["-d", outdir, os.path.join(outdir, src)], outdir, timeout)
+        _last_compile.by = "javac" if served is None else "server"
+        if served is None:
+            try:
+                proc = subprocess.run(["javac"] + FLAGS["java"] + ["-d", ".", src],
+                                      cwd=outdir, capture_output=True, text=True, timeout=timeout)
+            except FileNotFoundError:
+                return None, "[javac is not installed]"
+        else:
+            proc = subprocess.CompletedProcess(["javac"], served[0], "", served[1])
+    elif lang == "go":
+        _last_compile.go = {"gocache": go_cache.state}
+        proc = subprocess.run(["go", "build"] + FLAGS["go"] + ["-o", "main", src],
+                              cwd=outdir, capture_output=True, text=True, timeout=timeout, env=go_cache.env())
+        go_cache.after_build()
+    else:
+        name, header = precompiled_headers.select(lang, code, COMPILERS[lang], FLAGS[lang],
+                                                  toolchain_version(COMPILERS[lang]))
+        proc = _compile_cc(lang, src, outdir, timeout, header)
+        if proc.returncode != 0 and header:
+            precompiled_headers.note_fallback()
+            name = None
+            proc = _compile_cc(lang, src, outdir, timeout, None)
+        _last_compile.cc = {"pch": name, "ccache": CCACHE is not None}
+    if proc.returncode != 0:
+        return None, proc.stderr.strip() or proc.stdout.strip() or f"[{COMPILERS[lang]} failed]"
+    os.remove(os.path.join(outdir, src))
+    return meta, None
+
+
+def _compile_cc(lang, src, outdir, timeout, header):
+    """gcc/g++ `src` to ./main, force-including a precompiled header if given."""
+    compiler = COMPILERS[lang]
+    pch = ["-include", header] if header else []
+    if CCACHE is None:
+        return subprocess.run([compiler] + pch + [src] + FLAGS[lang] + ["-o", "main"],
+                              cwd=outdir, capture_output=True, text=True, timeout=timeout)
+    # ccache only caches compiles, so link separately
+    proc = subprocess.run([CCACHE, compiler] + pch + ["-c", src] + FLAGS[lang] + ["-o", "main.o"],
+                          cwd=outdir, capture_output=True, text=True, timeout=timeout, env=CCACHE_ENV)
+    if proc.returncode == 0:
+        proc = subprocess.run([compiler, "main.o"] + FLAGS[lang] + ["-o", "main"],
+                              cwd=outdir, capture_output=True, text=True, timeout=timeout)
+        os.remove(os.path.join(outdir, "main.o"))
+    return proc
+
+
+def _command(lang, artifact_dir, meta):
+    if lang == "java":
+        return ["java"] + java_runtime.launch_flags() + ["-cp", artifact_dir, meta["main_class"]]
+    return [os.path.join(artifact_dir, meta["exe"])]
+
+
+class ArtifactCache:
+    def __init__(self, root=BUILD_CACHE_DIR, max_bytes=BUILD_CACHE_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._in_flight = SingleFlight()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "compile_errors": 0}
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def _load(self, key):
+        meta_path = os.path.join(self._path(key), "meta.json")
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            os.utime(meta_path)  # LRU clock
+            return meta
+        except (OSError, ValueError):
+            return None
+
+    def get_or_build(self, lang, code, timeout):
+        """Return (command, "hit"/"miss", error_text)."""
+        key = build_key(lang, code)
+        meta = self._load(key)
+        if meta is not None:
+            self._count("hits")
+            return _command(lang, self._path(key), meta), "hit", None
+
+        (meta, error), shared = self._in_flight.do(key, lambda: self._build(key, lang, code, timeout))
+        if error:
+            return None, "miss", error
+        if shared:
+            self._count("hits")  # another request compiled it a moment ago
+        return _command(lang, self._path(key), meta), "hit" if shared else "miss", None
+
+    def _build(self, key, lang, code, timeout):
+        self._count("misses")
+        os.makedirs(os.path.join(self.root, "staging"), exist_ok=True)
+        staging = tempfile.mkdtemp(dir=os.path.join(self.root, "staging"))
+        try:
+            meta, error = _compile(lang, code, staging, timeout)
+            if error:
+                self._count("compile_errors")
+                return None, error
+            with open(os.path.join(staging, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            final = self._path(key)
+            os.makedirs(os.path.dirname(final), exist_ok=True)
+            try:
+                os.rename(staging, final)
+            except OSError:
+                pass  # another worker stored the same build first
+            else:
+                staging = None
+                self._count("stores")
+                self._prune()
+            return meta, None
+        finally:
+            if staging:
+                shutil.rmtree(staging, ignore_errors=True)
+
+    def _prune(self):
+        """Evict least recently used builds until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for shard in os.listdir(self.root):
+            if shard == "staging":
+                continue
+            shard_dir = os.path.join(self.root, shard)
+            for key in os.listdir(shard_dir) if os.path.isdir(shard_dir) else []:
+                path = os.path.join(shard_dir, key)
+                size = 0
+                for dirpath, _, files in os.walk(path):
+                    for name in files:
+                        try:
+                            size += os.path.getsize(os.path.join(dirpath, name))
+                        except OSError:
+                            pass
+                try:
+                    used = os.path.getmtime(os.path.join(path, "meta.json"))
+                except OSError:
+                    used = 0
+                entries.append((used, size, path))
+                total += size
+
+        now = time.time()
+        entries.sort()
+        for used, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if now - used < BUILD_CACHE_MIN_AGE:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            self._count("evictions")
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self.counters)
+        lookups = data["hits"] + data["misses"]
+        data["hit_rate"] = round(data["hits"] / lookups, 4) if lookups else 0.0
+        return data
+
+
+artifact_cache = ArtifactCache() if BUILD_CACHE_ENABLED else None
+
+
+def prepare(lang: str, code: str, workdir: str, timeout: float = 30) -> dict:
+    """
+    Get `code` ready to run with `workdir` as its working directory.
+
+    Returns {"lang", "cmd", "compile_cache", "compile_error", "compile_ms"}
+    plus "source_path" for interpreted languages, "jvm" (see
+    JavaRuntime.build_metrics) for Java, "cc" ({"pch": set name or None,
+    "ccache"}) for C/C++ and "go" ({"gocache": "cold"/"warming"/"warm"})
+    for Go builds that actually compiled. compile_ms covers the build only;
+    run times are measured separately by the runners.
+    compile_cache is "hit", "miss", "disabled", or None for interpreted
+    languages. cmd is None when the language is unsupported or the compile
+    failed (compile_error then holds the compiler output).
+    Raises subprocess.TimeoutExpired if the compiler runs past `timeout`.
+    """
+    lang = normalize_lang(lang)
+    result = {"lang": lang, "cmd": None, "compile_cache": None, "compile_error": None, "compile_ms": 0.0}
+    if lang in ("python", "js"):
+        path = os.path.join(workdir, SOURCE_NAMES[lang])
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(code)
+        # source_path lets warm_pool run the script on a pre-started interpreter
+        result["cmd"] = [sys.executable, path] if lang == "python" else ["node", path]
+        result["source_path"] = path
+        return result
+    if lang not in COMPILERS:
+        return result
+
+    if lang == "java":
+        java_runtime.warm_up()
+        _last_compile.by = None
+    elif lang == "go":
+        go_cache.warm_up()
+    _last_compile.cc = _last_compile.go = None
+    started = time.monotonic()
+    if artifact_cache is None:
+        meta, error = _compile(lang, code, workdir, timeout)
+        cmd = _command(lang, workdir, meta) if meta else None
+        state = "disabled"
+    else:
+        cmd, state, error = artifact_cache.get_or_build(lang, code, timeout)
+    result.update(cmd=cmd, compile_cache=state, compile_error=error,
+                  compile_ms=round((time.monotonic() - started) * 1000, 1))
+    if lang == "java":
+        result["jvm"] = java_runtime.build_metrics(_last_compile.by)
+    elif _last_compile.cc:
+        result["cc"] = _last_compile.cc
+    elif _last_compile.go:
+        result["go"] = _last_compile.go
+    return result
@@ -0,0 +1,226 @@
+# backend/converter_app/cache.py
+"""
+Content-addressed cache for conversion results.
+
+Two tiers:
+  * an in-process LRU bounded by total payload bytes (fast, per worker)
+  * a shared on-disk tier that every daphne worker on the host can read
+
+Keys are a sha256 over the normalized source, the language pair, the model
+name and the prompt version, so changing any of those never serves a stale
+conversion.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_ENABLED = os.getenv("CONVERT_CACHE", "1") == "1"
+MEMORY_MAX_BYTES = int(os.getenv("CONVERT_CACHE_MEMORY_BYTES", str(16 * 1024 * 1024)))
+DISK_DIR = os.getenv("CONVERT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "code_converter_cache"))
+DISK_MAX_BYTES = int(os.getenv("CONVERT_CACHE_DISK_BYTES", str(256 * 1024 * 1024)))
+DISK_TTL = int(os.getenv("CONVERT_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+PRUNE_EVERY = 200  # disk stores between size checks
+
+
+def normalize_source(source_code: str) -> str:
+    """Normalize line endings and trailing whitespace; indentation is kept."""
+    lines = source_code.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip("\n")
+
+
+def make_key(source_code: str, source_lang: str, target_lang: str, model: str, prompt_version: str) -> str:
+    h = hashlib.sha256()
+    for part in (prompt_version, model, source_lang.lower().strip(), target_lang.lower().strip()):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    h.update(normalize_source(source_code).encode("utf-8"))
+    return h.hexdigest()
+
+
+class ConversionCache:
+    def __init__(self, memory_max_bytes=MEMORY_MAX_BYTES, disk_dir=DISK_DIR,
+                 disk_max_bytes=DISK_MAX_BYTES, disk_ttl=DISK_TTL):
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.disk_ttl = disk_ttl
+        self._lru = OrderedDict()  # key -> (size, value)
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._stores_since_prune = 0
+        self.counters = {
+            "memory_hits": 0, "disk_hits": 0, "misses": 0,
+            "bypasses": 0, "stores": 0, "evictions": 0,
+        }
+
+    # ---- public API -------------------------------------------------------
+
+    def get(self, key: str, count: bool = True):
+        """Return (value, tier) where tier is 'memory', 'disk' or None on a miss.
+
+        count=False keeps auxiliary lookups out of the hit/miss counters.
+        """
+        value = self._memory_get(key, count)
+        if value is not None:
+            return value, "memory"
+        return self._disk_lookup(key, count)
+
+    def set(self, key: str, value: dict, count: bool = True):
+        self._memory_put(key, value)
+        self._disk_put(key, value)
+        if count:
+            self._count("stores")
+
+    async def aget(self, key: str, count: bool = True):
+        """get() for the event loop: a memory hit is served inline, only the disk tier runs in a thread."""
+        value = self._memory_get(key, count)
+        if value is not None:
+            return value, "memory"
+        return await asyncio.to_thread(self._disk_lookup, key, count)
+
+    async def aset(self, key: str, value: dict, count: bool = True):
+        """set() for the event loop: the disk write runs in a thread."""
+        self._memory_put(key, value)
+        await asyncio.to_thread(self._disk_put, key, value)
+        if count:
+            self._count("stores")
+
+    def note_bypass(self):
+        self._count("bypasses")
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self.counters)
+            data["memory_entries"] = len(self._lru)
+            data["memory_bytes"] = self._memory_bytes
+        lookups = data["memory_hits"] + data["disk_hits"] + data["misses"]
+        data["hit_rate"] = round((data["memory_hits"] + data["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return data
+
+    def clear_memory(self):
+        with self._lock:
+            self._lru.clear()
+            self._memory_bytes = 0
+
+    # ---- memory tier ------------------------------------------------------
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _memory_get(self, key, count):
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is None:
+                return None
+            self._lru.move_to_end(key)
+            if count:
+                self.counters["memory_hits"] += 1
+            return entry[1]
+
+    def _memory_put(self, key, value):
+        size = len(json.dumps(value))
+        if size > self.memory_max_bytes:
+            return
+        with self._lock:
+            old = self._lru.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= old[0]
+            self._lru[key] = (size, value)
+            self._memory_bytes += size
+            while self._memory_bytes > self.memory_max_bytes and self._lru:
+                _, (evicted_size, _) = self._lru.popitem(last=False)
+                self._memory_bytes -= evicted_size
+                self.counters["evictions"] += 1
+
+    # ---- disk tier --------------------------------------------------------
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key + ".json")
+
+    def _disk_lookup(self, key, count):
+        value = self._disk_get(key)
+        if value is not None:
+            self._memory_put(key, value)
+            if count:
+                self._count("disk_hits")
+            return value, "disk"
+        if count:
+            self._count("misses")
+        return None, None
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            if self.disk_ttl and time.time() - os.path.getmtime(path) > self.disk_ttl:
+                os.remove(path)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _disk_put(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # write-then-rename so concurrent readers never see a partial file
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+            os.replace(tmp, path)
+        except OSError:
+            return
+
+        with self._lock:
+            self._stores_since_prune += 1
+            due = self._stores_since_prune >= PRUNE_EVERY
+            if due:
+                self._stores_since_prune = 0
+        if due:
+            self._disk_prune()
+
+    def _disk_prune(self):
+        """Drop expired entries, then the oldest ones until under the byte budget."""
+        entries = []
+        total = 0
+        now = time.time()
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if self.disk_ttl and now - st.st_mtime > self.disk_ttl:
+                    _silent_remove(path)
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.disk_max_bytes:
+                break
+            _silent_remove(path)
+            total -= size
+
+
+def _silent_remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+conversion_cache = ConversionCache() if CACHE_ENABLED else None
@@ -0,0 +1,211 @@
+# backend/converter_app/capture.py
+"""
+Bounded capture of program output for the run endpoints.
+
+Each stream (stdout, stderr) is read in chunks into an OutputCapture that
+keeps only the first CAPTURE_HEAD_BYTES and the last CAPTURE_TAIL_BYTES in
+memory. As soon as a stream outgrows that, everything it printed is also
+written to a spill file on local disk (at most CAPTURE_SPILL_BYTES), which
+/api/run_output/<run_id>/ serves by byte range. Spill files expire after
+CAPTURE_TTL seconds and the directory is pruned to CAPTURE_DIR_BYTES, at
+most every CAPTURE_PRUNE_INTERVAL seconds; being plain files, they can be
+served by any worker on the machine.
+
+On an event loop use afeed(): only the memory part runs inline, opening and
+writing the spill file (and pruning) happen in a worker thread, so a noisy
+run does not stall the other runs' I/O on that loop.
+"""
+
+import asyncio
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+
+CAPTURE_HEAD_BYTES = int(os.getenv("CAPTURE_HEAD_BYTES", str(32 * 1024)))
+CAPTURE_TAIL_BYTES = int(os.getenv("CAPTURE_TAIL_BYTES", str(32 * 1024)))
+CAPTURE_SPILL_BYTES = int(os.getenv("CAPTURE_SPILL_BYTES", str(16 * 1024 * 1024)))  # per stream
+CAPTURE_DIR = os.getenv("CAPTURE_DIR", os.path.join(tempfile.gettempdir(), "code_converter_output"))
+CAPTURE_DIR_BYTES = int(os.getenv("CAPTURE_DIR_BYTES", str(512 * 1024 * 1024)))
+CAPTURE_TTL = int(os.getenv("CAPTURE_TTL", "3600"))
+CAPTURE_PRUNE_INTERVAL = float(os.getenv("CAPTURE_PRUNE_INTERVAL", "60"))
+
+STREAMS = ("stdout", "stderr")
+_RUN_ID_RE = re.compile(r"[0-9a-f]{32}")
+_prune_lock = threading.Lock()
+_last_prune = float("-inf")
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex
+
+
+def spill_path(run_id: str, stream: str):
+    """Path of a run's spill file, or None for ids/streams that cannot be ours."""
+    if not _RUN_ID_RE.fullmatch(run_id or "") or stream not in STREAMS:
+        return None
+    return os.path.join(CAPTURE_DIR, f"{run_id}.{stream}")
+
+
+class OutputCapture:
+    """Head + tail of one stream in memory, the whole of it (up to a cap) on disk."""
+
+    def __init__(self, run_id, stream):
+        self.run_id = run_id
+        self.stream = stream
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+        self.spilled = 0
+        self._spilling = False
+        self._spill = None
+        self._opened = False
+
+    @property
+    def truncated(self) -> bool:
+        return self.total > len(self.head) + len(self.tail)
+
+    def feed(self, chunk: bytes):
+        data = self._keep(chunk)
+        if data:
+            self._store(data)
+
+    async def afeed(self, chunk: bytes):
+        """feed() for an event loop: the spill file is opened and written in a worker thread."""
+        data = self._keep(chunk)
+        if data and (self._spill is not None or not self._opened):
+            await asyncio.to_thread(self._store, data)
+
+    def _keep(self, chunk):
+        """Update head and tail; returns the bytes that have to go to the spill file."""
+        self.total += len(chunk)
+        if len(self.head) < CAPTURE_HEAD_BYTES:
+            room = CAPTURE_HEAD_BYTES - len(self.head)
+            self.head += chunk[:room]
+            rest = chunk[room:]
+        else:
+            rest = chunk
+        if not rest:
+            return b""
+        self.tail += rest
+        data = b""
+        if self._spilling:
+            data = rest
+        elif len(self.tail) > CAPTURE_TAIL_BYTES:
+            # about to drop bytes for the first time: everything so far is still in memory
+            self._spilling = True
+            data = bytes(self.head + self.tail)
+        if len(self.tail) > CAPTURE_TAIL_BYTES:
+            del self.tail[:len(self.tail) - CAPTURE_TAIL_BYTES]
+        return data
+
+    def _store(self, data):
+        if not self._opened:
+            self._opened = True
+            self._open_spill()
+        self._write(data)
+
+    def _open_spill(self):
+        try:
+            os.makedirs(CAPTURE_DIR, exist_ok=True)
+            _prune_now_and_then()
+            # unbuffered: writes are whole chunks already, and close() stays cheap on an event loop
+            self._spill = open(spill_path(self.run_id, self.stream), "wb", buffering=0)
+        except OSError:
+            self._spill = None
+
+    def _write(self, data):
+        if self._spill is None:
+            return
+        data = data[:CAPTURE_SPILL_BYTES - self.spilled]
+        try:
+            self._spill.write(data)
+        except OSError:
+            self.close()
+            return
+        self.spilled += len(data)
+        if self.spilled >= CAPTURE_SPILL_BYTES:
+            self.close()
+
+    def close(self):
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+    def preview(self) -> str:
+        """All of the output if it fit in memory, otherwise head + omission marker + tail."""
+        decode = lambda b: bytes(b).decode("utf-8", errors="replace")
+        if not self.truncated:
+            return decode(self.head + self.tail)
+        omitted = self.total - len(self.head) - len(self.tail)
+        return f"{decode(self.head)}\n[... {omitted} bytes omitted ...]\n{decode(self.tail)}"
+
+    def info(self) -> dict:
+        return {"bytes": self.total, "truncated": self.truncated, "stored_bytes": self.spilled}
+
+
+def stored_size(run_id: str, stream: str):
+    """Size of a run's spilled stream, or None when it is unknown or expired."""
+    path = spill_path(run_id, stream)
+    if path is None:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return None if time.time() - st.st_mtime > CAPTURE_TTL else st.st_size
+
+
+def read_range(run_id: str, stream: str, start: int, end: int):
+    """Bytes [start, end] (inclusive, like HTTP ranges) of a spilled stream, or None if it is gone."""
+    try:
+        with open(spill_path(run_id, stream), "rb") as f:
+            f.seek(start)
+            return f.read(max(0, end - start + 1))
+    except (OSError, TypeError):
+        return None
+
+
+def _prune_now_and_then():
+    global _last_prune
+    now = time.monotonic()
+    with _prune_lock:
+        if now - _last_prune < CAPTURE_PRUNE_INTERVAL:
+            return
+        _last_prune = now
+    prune()
+
+
+def prune():
+    """Drop expired spill files, then the oldest ones until the directory fits CAPTURE_DIR_BYTES."""
+    now = time.time()
+    entries = []
+    try:
+        names = os.listdir(CAPTURE_DIR)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(CAPTURE_DIR, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if now - st.st_mtime > CAPTURE_TTL:
+            _unlink(path)
+        else:
+            entries.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= CAPTURE_DIR_BYTES:
+            break
+        _unlink(path)
+        total -= size
+
+
+def _unlink(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,367 @@
+# backend/converter_app/chunking.py
+"""
+Split source files into top-level units (imports, functions, classes, loose
+statements) so large inputs can be converted piece by piece.
+
+Python is split with `ast`; the C-family languages and Go/JS go through a
+small brace-aware scanner that skips strings and comments. Every unit keeps
+its exact source text, so joining the units in order gives back the file.
+
+Lines that only prefix a declaration (C++ `template <...>`, `[[attributes]]`,
+Java annotations) stay with the definition below them, like comments do.
+Class bodies are not split: a Java file, normally one `public class Main`,
+is a single definition, so chunked mode converts it in one request and
+incremental mode re-converts the whole class on any change to it.
+"""
+
+import ast
+import re
+
+UNIT_HEADER = "header"  # imports, package, #include, using ...
+UNIT_DEF = "def"        # function / method / class / struct / type
+UNIT_CODE = "code"      # any other top-level statements
+
+BRACE_LANGS = ("go", "java", "js", "javascript", "c", "cpp", "c++")
+
+_HEADER_RE = re.compile(r"^\s*(import\b|package\b|#\s*include\b|#\s*define\b|#\s*pragma\b|using\b|from\s+\S+\s+import\b|'use strict'|\"use strict\"|(?:const|let|var)\s+\w+\s*=\s*require\()")
+_BRACE_NAME_RES = [
+    re.compile(r"^\s*func\s+(?:\([^)]*\)\s*)?([A-Za-z_]\w*)"),                    # go
+    re.compile(r"^\s*type\s+([A-Za-z_]\w*)"),                                     # go
+    re.compile(r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)"),  # js
+    re.compile(r"^\s*(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=\s*(?:async\s*)?(?:function|\()"),
+    re.compile(r"^\s*(?:[\w<>\[\],]+\s+)*(?:class|interface|enum|struct|record)\s+([A-Za-z_]\w*)"),
+    re.compile(r"^\s*(?:[\w:<>\*&,\[\]]+\s+)+\**&?([A-Za-z_][\w:]*)\s*\([^;]*$"),  # c/c++/java function
+]
+
+
+# a segment made only of these is a prefix of the next declaration
+_PREFIX_RE = re.compile(r"^(?:\s*(?:template\s*<[^;{}]*>|\[\[.*?\]\]|@(?!interface\b)[\w.]+(?:\s*\(.*?\))?))+\s*$", re.S)
+_GO_RECEIVER_RE = re.compile(r"^\s*func\s+\(\s*\w*\s*\*?\s*([A-Za-z_]\w*)")
+
+
+def _unit(kind, name, text, signature="", owner=""):
+    return {"kind": kind, "name": name, "text": text, "signature": signature or name, "owner": owner}
+
+
+def split_units(source: str, lang: str) -> list:
+    """Return the top-level units of `source`, or [] when it cannot be split."""
+    lang = (lang or "").lower().strip()
+    if lang in ("python", "py"):
+        return _split_python(source)
+    if lang in BRACE_LANGS:
+        return _split_braces(source)
+    return []
+
+
+def join_units(units) -> str:
+    return "".join(u["text"] for u in units)
+
+
+def group_units(units, budget) -> list:
+    """
+    Merge runs of adjacent units so a file of many small definitions does not
+    cost one request each. A group takes units until it holds at least
+    `budget` characters, so there are never more than ceil(total / budget)
+    groups. Groups look like units: their name lists the names inside and
+    their text is the joined texts.
+    """
+    groups = []
+    for u in units:
+        last = groups[-1] if groups else None
+        if last is not None and len(last["text"]) < budget:
+            last["text"] += u["text"]
+            last["names"] += [u["name"]] if u["name"] else []
+            if u["kind"] == UNIT_DEF:
+                last["kind"] = UNIT_DEF
+        else:
+            groups.append(dict(u, names=[u["name"]] if u["name"] else []))
+    for g in groups:
+        g["name"] = ", ".join(g.pop("names"))
+    return groups
+
+
+def shared_context(units) -> str:
+    """Header lines plus one signature per definition: what every unit may need to see."""
+    lines = [u["text"].strip() for u in units if u["kind"] == UNIT_HEADER]
+    lines += [u["signature"] for u in units if u["kind"] == UNIT_DEF]
+    return "\n".join(line for line in lines if line)
+
+
+# ---- Python ---------------------------------------------------------------
+
+def _split_python(source):
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return []
+    lines = source.splitlines(keepends=True)
+    if not tree.body:
+        return []
+
+    units = []
+    # start each node at its first decorator; leading comments stick to the node below
+    starts = []
+    for node in tree.body:
+        first = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+        starts.append(first - 1)
+    starts[0] = 0
+
+    for i, node in enumerate(tree.body):
+        end = starts[i + 1] if i + 1 < len(tree.body) else len(lines)
+        text = "".join(lines[starts[i]:end])
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            kind, name, sig = UNIT_HEADER, "", ""
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            kind, name = UNIT_DEF, node.name
+            sig = lines[node.lineno - 1].strip()
+        else:
+            kind, name, sig = UNIT_CODE, "", ""
+
+        # merge runs of the same non-definition kind into one unit
+        if units and kind != UNIT_DEF and units[-1]["kind"] == kind:
+            units[-1]["text"] += text
+        else:
+            units.append(_unit(kind, name, text, sig))
+    return units
+
+
+# ---- brace languages ------------------------------------------------------
+
+def _split_braces(source):
+    """Cut the file wherever bracket depth returns to zero at the end of a line."""
+    segments = []
+    current = []
+    depth = 0
+    state = None  # None, "block", or the quote character we are inside
+    for line in source.splitlines(keepends=True):
+        current.append(line)
+        depth, state = _scan_line(line, depth, state)
+        if depth <= 0 and state is None:
+            depth = 0
+            segments.append("".join(current))
+            current = []
+    if current:
+        segments.append("".join(current))
+
+    # Allman style: a signature line whose body starts on the next line
+    merged = []
+    for seg in segments:
+        if merged and _strip_comments(seg).lstrip().startswith("{"):
+            merged[-1] += seg
+        else:
+            merged.append(seg)
+    segments = merged
+
+    units = []
+    carry = ""  # blank lines, comments and declaration prefixes attach to the next real segment
+    for seg in segments:
+        code = _strip_comments(seg).strip()
+        if not code or _is_prefix(_strip_comments(carry + seg).strip()):
+            carry += seg
+            continue
+        kind, name, sig = _classify(code)
+        prefix = " ".join(_strip_comments(carry).split())
+        if kind == UNIT_DEF and prefix:
+            sig = f"{prefix} {sig}"
+        text = carry + seg
+        carry = ""
+        if units and kind != UNIT_DEF and units[-1]["kind"] == kind:
+            units[-1]["text"] += text
+        else:
+            m = _GO_RECEIVER_RE.match(code)
+            units.append(_unit(kind, name, text, sig, owner=m.group(1) if m else ""))
+    if carry:
+        if units:
+            units[-1]["text"] += carry
+        else:
+            units.append(_unit(UNIT_CODE, "", carry))
+    return units
+
+
+def _is_prefix(code):
+    # angle brackets are not counted by the scanner, so a template header may span segments
+    return bool(_PREFIX_RE.match(code)) or (code.startswith("template") and code.count("<") > code.count(">"))
+
+
+def _scan_line(line, depth, state):
+    i, n = 0, len(line)
+    while i < n:
+        ch = line[i]
+        if state == "block":
+            if line.startswith("*/", i):
+                state = None
+                i += 2
+                continue
+        elif state is not None:
+            if ch == "\\" and state != "`":
+                i += 2
+                continue
+            if ch == state:
+                state = None
+        elif line.startswith("//", i):
+            break
+        elif line.startswith("/*", i):
+            state = "block"
+            i += 2
+            continue
+        elif ch in "\"'`":
+            state = ch
+        elif ch in "{([":
+            depth += 1
+        elif ch in "})]":
+            depth -= 1
+        i += 1
+    # plain string literals cannot span lines; only block comments and `raw` strings do
+    if state in ("\"", "'"):
+        state = None
+    return depth, state
+
+
+def _strip_comments(text):
+    text = re.sub(r"/\*.*?\*/", "", text, flags=re.S)
+    return re.sub(r"//[^\n]*", "", text)
+
+
+def _classify(code):
+    first = code.splitlines()[0]
+    if _HEADER_RE.match(first):
+        return UNIT_HEADER, "", ""
+    if "{" in code and code.rstrip().rstrip(";").rstrip().endswith("}"):
+        for regex in _BRACE_NAME_RES:
+            m = regex.match(first)
+            if m:
+                return UNIT_DEF, m.group(1), first.split("{")[0].strip()
+    return UNIT_CODE, "", ""
+
+
+# ---- incremental re-conversion ---------------------------------------------
+
+def match_key(name: str) -> str:
+    """Name key that survives common renames across languages (snake_case -> camelCase)."""
+    return name.replace("_", "").lower()
+
+
+def _fingerprint(units, kinds):
+    return "\n".join("\n".join(line.rstrip() for line in u["text"].strip().splitlines())
+                     for u in units if u["kind"] in kinds)
+
+
+def plan_incremental(old_units, new_units, target_units):
+    """
+    Work out which definitions changed between two versions of a source file
+    and where they live in the previous translation.
+
+    Returns (plan, None) or (None, reason) when the edit cannot be spliced
+    safely. plan["convert"] lists the new units to translate; "replace" maps
+    target index -> new unit, "insert" is a list of (after_target_index, unit),
+    "delete" the target indexes to drop.
+    """
+    if not old_units or not new_units or not target_units:
+        return None, "could not split the sources into definitions"
+    if _fingerprint(old_units, (UNIT_HEADER, UNIT_CODE)) != _fingerprint(new_units, (UNIT_HEADER, UNIT_CODE)):
+        return None, "imports or top-level statements changed"
+
+    old_defs = {}
+    for u in old_units:
+        if u["kind"] == UNIT_DEF:
+            if match_key(u["name"]) in old_defs:
+                return None, f"duplicate definition {u['name']}"
+            old_defs[match_key(u["name"])] = u
+
+    # a target unit belongs to a name directly or via its Go method receiver
+    targets = {}
+    for i, u in enumerate(target_units):
+        if u["kind"] != UNIT_DEF:
+            continue
+        for name in {u["name"], u["owner"]}:
+            if name:
+                targets.setdefault(match_key(name), []).append(i)
+
+    plan = {"convert": [], "replace": {}, "insert": [], "delete": set(), "reused": 0,
+            "changed": [], "added": [], "removed": []}
+    headers = [i for i, u in enumerate(target_units) if u["kind"] == UNIT_HEADER]
+    anchor = headers[-1] if headers else -1
+    seen = set()
+    for u in new_units:
+        if u["kind"] != UNIT_DEF:
+            continue
+        key = match_key(u["name"])
+        if key in seen:
+            return None, f"duplicate definition {u['name']}"
+        seen.add(key)
+        old = old_defs.get(key)
+        if old is not None and _fingerprint([old], (UNIT_DEF,)) == _fingerprint([u], (UNIT_DEF,)):
+            plan["reused"] += 1
+        elif old is not None:
+            if key not in targets:
+                return None, f"{u['name']} not found in the previous translation"
+            first, *rest = targets[key]
+            plan["replace"][first] = u
+            plan["delete"].update(rest)
+            plan["convert"].append(u)
+            plan["changed"].append(u["name"])
+        else:
+            plan["insert"].append((anchor, u))
+            plan["convert"].append(u)
+            plan["added"].append(u["name"])
+        if key in targets:
+            anchor = max(anchor, targets[key][-1])
+
+    for key, old in old_defs.items():
+        if key not in seen:
+            plan["delete"].update(targets.get(key, []))
+            plan["removed"].append(old["name"])
+    return plan, None
+
+
+# comment and blank lines (not preprocessor directives) at the top of a unit
+_COMMENT_LINE_RE = re.compile(r"^\s*(?:$|//|/\*|\*|#(?!\s*(?:include|define|pragma|import)\b))")
+
+
+def _leading_comments(text):
+    lines = text.splitlines(keepends=True)
+    n = 0
+    while n < len(lines) and _COMMENT_LINE_RE.match(lines[n]):
+        n += 1
+    return "".join(lines[:n])
+
+
+def apply_incremental(target_units, plan, converted, header=None) -> str:
+    """
+    Splice converted unit texts (keyed by id(unit)) into the previous translation.
+
+    With `header` (the target's regenerated imports, package line ...) the old
+    header units are replaced by it: it goes where the first one was, after
+    any comments that opened it, or at the top when there was none.
+    """
+    def fit(text, like=None):
+        # keep the blank lines that surrounded the unit being replaced;
+        # new units get one blank line before them, like the scanner produces
+        if like is None:
+            lead, trail = "\n", "\n"
+        else:
+            lead = like[:len(like) - len(like.lstrip("\n"))]
+            trail = like[len(like.rstrip("\n")):] or "\n"
+        return lead + text.strip("\n") + trail
+
+    inserts = {}
+    for after, unit in plan["insert"]:
+        inserts.setdefault(after, []).append(unit)
+
+    headers = [i for i, u in enumerate(target_units) if u["kind"] == UNIT_HEADER]
+    out = []
+    if header is not None and header.strip() and not headers:
+        out.append(header.strip("\n") + "\n")
+    out += [fit(converted[id(u)]) for u in inserts.get(-1, [])]
+    for i, u in enumerate(target_units):
+        if header is not None and i in headers:
+            if i == headers[0]:
+                text = _leading_comments(u["text"]) + header.strip("\n")
+                out.append(text + "\n" if text.strip() else "")
+        elif i in plan["replace"]:
+            out.append(fit(converted[id(plan["replace"][i])], u["text"]))
+        elif i not in plan["delete"]:
+            out.append(u["text"])
+        for added in inserts.get(i, []):
+            out.append(fit(converted[id(added)]))
+    return "".join(out).rstrip("\n") + "\n"
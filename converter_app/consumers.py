@@ -1,26 +1,63 @@
+import codecs
+import functools
 import json
-import tempfile
 import os
 import asyncio
+import time
+from contextlib import aclosing
 from channels.generic.websocket import AsyncWebsocketConsumer
+from .mcp_connector import astream_convert, astream_incremental, load_history, save_history
+from .limiter import LimiterBusy
+from .build_cache import BUILD_METRICS, normalize_lang, prepare
+from .warm_pool import astart_process
+from .execution import execution_engine
+from .workspaces import workspace_pool
+from .utils import LIMIT_SIGNALS
+
+# an interactive run holds an execution slot; cap how long it may keep it
+RUN_INTERACTIVE_TIMEOUT = float(os.getenv("RUN_INTERACTIVE_TIMEOUT", "300"))
+# after its output ends a program gets this long to exit on its own before it is killed
+RUN_EXIT_GRACE = float(os.getenv("RUN_EXIT_GRACE", "2"))
+# run output is coalesced into frames of at most STREAM_FRAME_BYTES, one per STREAM_WINDOW_MS
+STREAM_WINDOW_MS = float(os.getenv("STREAM_WINDOW_MS", "30"))
+STREAM_FRAME_BYTES = int(os.getenv("STREAM_FRAME_BYTES", "16384"))
+STREAM_MAX_BYTES = int(os.getenv("STREAM_MAX_BYTES", str(1024 * 1024)))  # per run; the rest is only counted
+# runs one connection may have going at once (queued ones included)
+WS_MAX_RUNS = int(os.getenv("WS_MAX_RUNS", "4"))
+# frames for a run started without a run_id carry this one; such runs replace each other as before
+DEFAULT_RUN_ID = "default"
+
+
+def _run_id(data):
+    run_id = data.get("run_id")
+    return DEFAULT_RUN_ID if run_id in (None, "") else str(run_id)[:64]
 
 
 class CodeRunnerConsumer(AsyncWebsocketConsumer):
+    """
+    Converts and runs code over one socket.
+
+    Any number of runs share the connection, each addressed by the client's
+    run_id: {"action": "run" | "stdin" | "cancel", "run_id": ...}, and every
+    frame a run produces carries its run_id. A run started with the id of one
+    still going replaces it; at most WS_MAX_RUNS run at once.
+    """
+
     async def connect(self):
         await self.accept()
-        self.process = None
-        self.tmpdir = None
+        self.convert_task = None
+        self.runs = {}  # run_id -> {"task": ..., "process": ...}
 
     async def disconnect(self, close_code):
-        if self.process and self.process.returncode is None:
-            self.process.kill()
-        if self.tmpdir and os.path.exists(self.tmpdir):
-            try:
-                for f in os.listdir(self.tmpdir):
-                    os.remove(os.path.join(self.tmpdir, f))
-                os.rmdir(self.tmpdir)
-            except Exception:
-                pass
+        if self.convert_task and not self.convert_task.done():
+            self.convert_task.cancel()
+        runs = list(self.runs.values())
+        for run in runs:
+            run["task"].cancel()
+            if run["process"] and run["process"].returncode is None:
+                run["process"].kill()
+        # each run reaps its process and gives back its workspace on the way out
+        await asyncio.gather(*(run["task"] for run in runs), return_exceptions=True)
 
     async def receive(self, text_data):
         data = json.loads(text_data)
@@ -30,128 +67,252 @@ class CodeRunnerConsumer(AsyncWebsocketConsumer):
             await self.handle_run(data)
         elif action == "stdin":
             await self.handle_stdin(data)
+        elif action == "cancel":
+            await self.handle_cancel(data)
+        elif action == "convert":
+            if self.convert_task and not self.convert_task.done():
+                self.convert_task.cancel()
+            self.convert_task = asyncio.create_task(self.handle_convert(data))
+
+    async def handle_convert(self, data):
+        """Streams a conversion to the client chunk by chunk as Groq generates it.
+
+        When the previous round trip is supplied (inline or as history_id) only
+        the changed definitions are re-converted and sent as a single chunk.
+        """
+        source_code = data.get("source_code", "")
+        source_lang = data.get("source_lang", "")
+        target_lang = data.get("target_lang", "")
+        if not source_code or not source_lang or not target_lang:
+            await self.send(json.dumps({"type": "convert_error", "error": "Missing fields"}))
+            return
+
+        started = time.monotonic()
+        first_chunk_ms = None
+        try:
+            await self.send(json.dumps({"type": "convert_start"}))
+            use_cache = not data.get("bypass_cache", False)
+            previous_source = data.get("previous_source")
+            previous_converted = data.get("previous_converted")
+            if data.get("history_id") and not (previous_source and previous_converted):
+                previous_source, previous_converted = await asyncio.to_thread(load_history, data["history_id"])
+            if previous_source and previous_converted:
+                stream = astream_incremental(source_code, source_lang, target_lang,
+                                             previous_source, previous_converted, use_cache=use_cache)
+            else:
+                stream = astream_convert(source_code, source_lang, target_lang, use_cache=use_cache)
+            # aclosing: a cancelled run must release coalesced waiters right away
+            async with aclosing(stream):
+                async for event in stream:
+                    if event["type"] == "chunk":
+                        if first_chunk_ms is None:
+                            first_chunk_ms = round((time.monotonic() - started) * 1000)
+                        await self.send(json.dumps({"type": "convert_chunk", "text": event["text"]}))
+                    elif event["type"] == "reset":
+                        await self.send(json.dumps({"type": "convert_reset"}))
+                    elif event.get("status") == "error":
+                        await self.send(json.dumps({"type": "convert_error", "error": event.get("message", "MCP error")}))
+                    else:
+                        history_id = await asyncio.to_thread(save_history, event, source_code, source_lang,
+                                                             target_lang)
+                        await self.send(json.dumps({
+                            "type": "convert_done",
+                            "converted_code": event.get("converted_code", ""),
+                            "notes": event.get("notes", ""),
+                            "cache": event.get("cache", "disabled"),
+                            "coalesced": event.get("coalesced", False),
+                            "model": event.get("model"),
+                            "escalated": event.get("escalated", False),
+                            "truncated": event.get("truncated", False),
+                            "incremental": event.get("incremental", False),
+                            "history_id": history_id,
+                            "first_chunk_ms": first_chunk_ms,
+                            "total_ms": round((time.monotonic() - started) * 1000),
+                        }))
+        except LimiterBusy as e:
+            await self.send(json.dumps({"type": "convert_error", "error": str(e), "retry_after": e.retry_after}))
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            await self.send(json.dumps({"type": "convert_error", "error": f"Conversion failed: {e}"}))
+
+    async def send_run(self, run_id, frame):
+        """Sends a frame belonging to one run."""
+        await self.send(json.dumps(dict(frame, run_id=run_id)))
 
     async def handle_stdin(self, data):
         """Handles user input for stdin during interactive execution."""
-        if not self.process or self.process.returncode is not None:
-            await self.send(json.dumps({"output": "[⚠ Process not running]\n"}))
+        run_id = _run_id(data)
+        run = self.runs.get(run_id)
+        user_input = data.get("input", "") + "\n"
+        if run is not None and run["process"] is None:
+            run["stdin"].append(user_input)  # queued, compiling or starting: handed over once it runs
+            return
+        process = run and run["process"]
+        if not process or process.returncode is not None:
+            await self.send_run(run_id, {"output": "[⚠ Process not running]\n"})
             return
 
-        user_input = data.get("input", "") + "\n"
         try:
-            self.process.stdin.write(user_input.encode())
-            await self.process.stdin.drain()
+            process.stdin.write(user_input.encode())
+            await process.stdin.drain()
         except Exception as e:
-            await self.send(json.dumps({"output": f"[❌ Failed to send input: {e}]\n"}))
+            await self.send_run(run_id, {"output": f"[❌ Failed to send input: {e}]\n"})
+
+    async def handle_cancel(self, data):
+        """Stops a run (queued, compiling or running) and waits until its process is gone."""
+        run_id = _run_id(data)
+        run = self.runs.get(run_id)
+        if run is None:
+            await self.send_run(run_id, {"type": "run_cancelled", "running": False})
+            return
+        run["task"].cancel()
+        await asyncio.gather(run["task"], return_exceptions=True)
+        await self.send_run(run_id, {"type": "run_cancelled", "running": True,
+                                     "output": "\n[⏹ Run cancelled]\n"})
 
     async def handle_run(self, data):
-        """Compiles and runs code interactively with stdout/stderr streaming."""
+        """Starts an interactive run in the background; it replaces a run with the same id."""
+        run_id = _run_id(data)
+        previous = self.runs.get(run_id)
+        if previous is None and len(self.runs) >= WS_MAX_RUNS:
+            await self.send_run(run_id, {"type": "run_busy", "retry_after": None,
+                                         "output": f"[❌ At most {WS_MAX_RUNS} runs per connection]\n"})
+            return
+        if previous is not None:
+            previous["task"].cancel()
+            # the old program must be gone before its replacement can take its id
+            await asyncio.gather(previous["task"], return_exceptions=True)
+        run = self.runs[run_id] = {"task": None, "process": None, "stdin": []}
+        run["task"] = asyncio.create_task(self.run_session(run_id, data, run))
+
+        def forget(_):
+            # a done callback also covers a task cancelled before it got to start
+            if self.runs.get(run_id) is run:
+                del self.runs[run_id]
+
+        run["task"].add_done_callback(forget)
+
+    async def run_session(self, run_id, data, run):
+        """Waits for an execution slot, compiles and runs code with stdout/stderr streaming."""
         code = data.get("code", "")
         lang = (data.get("lang") or "").lower().strip()
+        send = functools.partial(self.send_run, run_id)
 
-        ext_map = {
-            "python": "py", "py": "py",
-            "go": "go",
-            "java": "java",
-            "js": "js", "javascript": "js",
-            "c": "c",
-            "cpp": "cpp", "c++": "cpp"
-        }
-        ext = ext_map.get(lang, "txt")
-
-        self.tmpdir = tempfile.mkdtemp(prefix="code_run_")
-        filename = os.path.join(self.tmpdir, f"Main.{ext}")
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write(code)
-
-        # Prepare language commands
-        cmd = None
+        async def queued(position, eta):
+            await send({"type": "run_queued", "position": position + 1, "eta_seconds": eta,
+                        "output": f"⏳ Waiting for a free runner (#{position + 1}, ~{eta:g}s)...\n"})
+
+        workspace = process = None
         try:
-            if lang in ("python", "py"):
-                cmd = ["python3", filename]
-
-            elif lang == "go":
-                cmd = ["go", "run", filename]
-
-            elif lang in ("js", "javascript"):
-                cmd = ["node", filename]
-
-            elif lang == "java":
-                compile_proc = await asyncio.create_subprocess_exec(
-                    "javac", filename,
-                    cwd=self.tmpdir,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                _, err = await compile_proc.communicate()
-                if compile_proc.returncode != 0:
-                    await self.send(json.dumps({"output": err.decode()}))
-                    return
-                cmd = ["java", "-cp", self.tmpdir, "Main"]
-
-            elif lang == "c":
-                exe = os.path.join(self.tmpdir, "a.out")
-                compile_proc = await asyncio.create_subprocess_exec(
-                    "gcc", filename, "-o", exe,
-                    cwd=self.tmpdir,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                _, err = await compile_proc.communicate()
-                if compile_proc.returncode != 0:
-                    await self.send(json.dumps({"output": err.decode()}))
+            async with execution_engine.slot(lang, on_position=queued):
+                workspace = workspace_pool.acquire("websocket")
+
+                # Prepare language commands; compiled languages reuse cached builds
+                build = await asyncio.to_thread(prepare, lang, code, workspace.path)
+                if build["compile_error"]:
+                    await send({"output": build["compile_error"], "compile_cache": build["compile_cache"]})
                     return
-                cmd = [exe]
-
-            elif lang in ("cpp", "c++"):
-                exe = os.path.join(self.tmpdir, "a.out")
-                compile_proc = await asyncio.create_subprocess_exec(
-                    "g++", filename, "-o", exe,
-                    cwd=self.tmpdir,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                _, err = await compile_proc.communicate()
-                if compile_proc.returncode != 0:
-                    await self.send(json.dumps({"output": err.decode()}))
+                if build["cmd"] is None:
+                    await send({"output": f"[❌ Unsupported language: {lang}]\n"})
                     return
-                cmd = [exe]
-
-            else:
-                await self.send(json.dumps({"output": f"[❌ Unsupported language: {lang}]\n"}))
-                return
 
-            await self.send(json.dumps({"output": f"▶ Running {lang} code...\n"}))
+                cached = " (cached build)" if build["compile_cache"] == "hit" else ""
+                await send({"output": f"▶ Running {lang} code{cached}...\n", "compile_cache": build["compile_cache"]})
 
-            # Start async process
-            self.process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdin=asyncio.subprocess.PIPE,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.STDOUT,
-                cwd=self.tmpdir
-            )
+                # Start async process (Python/JS on a warm interpreter when one is ready)
+                process = run["process"] = await astart_process(build, workspace.path)
+                if run["stdin"]:
+                    process.stdin.write("".join(run["stdin"]).encode())
+                    run["stdin"].clear()
+                counters = {"output_bytes": 0, "output_truncated": False}
+                try:
+                    await asyncio.wait_for(self.stream_output(process, counters, send), RUN_INTERACTIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    process.kill()
+                    await send({"output": f"\n[⏱ Stopped after {RUN_INTERACTIVE_TIMEOUT:g}s]\n"})
+                else:
+                    # stdout is closed, but the program may still be exiting: keep its own exit status
+                    try:
+                        await asyncio.wait_for(process.wait(), RUN_EXIT_GRACE)
+                    except asyncio.TimeoutError:
+                        process.kill()
 
-            # Start reading output asynchronously
-            asyncio.create_task(self.stream_output())
+                await process.wait()
+                metrics = dict(process.usage, compile_ms=build["compile_ms"], **counters)
+                metrics.update((key, build[key]) for key in BUILD_METRICS if key in build)
+                execution_engine.record_usage(normalize_lang(lang), metrics)
+                limit = LIMIT_SIGNALS.get(metrics["signal"])
+                note = f"\n[{limit} exceeded]" if limit else ""
+                await send({"type": "run_done", "metrics": metrics, "output": f"{note}\n💡 Execution finished.\n"})
 
+        except LimiterBusy as e:
+            await send({"type": "run_busy", "retry_after": e.retry_after, "output": f"[❌ {e}]\n"})
+        except asyncio.CancelledError:
+            pass
         except Exception as e:
-            await self.send(json.dumps({"output": f"[❌ Runtime error: {e}]\n"}))
+            await send({"output": f"[❌ Runtime error: {e}]\n"})
+        finally:
+            if workspace is not None:
+                # the directory is recycled, so the program must be gone first
+                if process and process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                workspace.release()
+
+    async def stream_output(self, process, counters, send):
+        """
+        Stream the program's output in coalesced frames.
+
+        Bytes are gathered for up to STREAM_WINDOW_MS or STREAM_FRAME_BYTES,
+        whichever comes first, and frames go out no faster than one per
+        window; while a full frame waits we stop reading, so the pipe fills
+        and the program blocks instead of the socket buffering without end.
+        After STREAM_MAX_BYTES the rest is only counted.
+        """
+        loop = asyncio.get_running_loop()
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        window = STREAM_WINDOW_MS / 1000
+        pending = bytearray()
+        deadline = None
+
+        async def flush(final=False):
+            nonlocal deadline
+            text = decoder.decode(bytes(pending), final)
+            pending.clear()
+            deadline = None
+            if text:
+                await send({"output": text})
 
-    async def stream_output(self):
-        """Continuously stream output to the frontend while process runs."""
         try:
             while True:
-                if not self.process:
+                timeout = None if deadline is None else max(0.0, deadline - loop.time())
+                try:
+                    chunk = await asyncio.wait_for(process.stdout.read(STREAM_FRAME_BYTES - len(pending)), timeout)
+                except asyncio.TimeoutError:
+                    await flush()
+                    continue
+                if not chunk:
                     break
+                counters["output_bytes"] += len(chunk)
+                if counters["output_truncated"]:
+                    continue  # keep draining so the program is not blocked on a full pipe
 
-                line = await self.process.stdout.readline()
-                if not line:
-                    break
-                await self.send(json.dumps({"output": line.decode()}))
+                room = STREAM_MAX_BYTES - (counters["output_bytes"] - len(chunk))
+                if len(chunk) >= room:
+                    pending += chunk[:room]
+                    await flush(final=True)
+                    counters["output_truncated"] = True
+                    await send({"type": "output_truncated",
+                                "output": f"\n[✂ Output truncated after {STREAM_MAX_BYTES // 1024} KB]\n"})
+                    continue
 
-            await self.send(json.dumps({"output": "\n💡 Execution finished.\n"}))
-        except asyncio.CancelledError:
-            pass
+                if deadline is None:
+                    deadline = loop.time() + window
+                pending += chunk
+                if len(pending) >= STREAM_FRAME_BYTES:
+                    await asyncio.sleep(max(0.0, deadline - loop.time()))
+                    await flush()
+            await flush(final=True)
         except Exception as e:
-            await self.send(json.dumps({"output": f"[Stream error: {e}]\n"}))
+            await send({"output": f"[Stream error: {e}]\n"})
@@ -0,0 +1,215 @@
+# backend/converter_app/difftest.py
+"""
+Differential testing: run the original and the converted program on the
+same list of stdin vectors and compare what they print.
+
+Each side is compiled once (ExecutionEngine.program()); every vector then
+runs on both sides in parallel through the execution engine, at most
+DIFFTEST_CONCURRENCY runs at a time so a large suite does not flood the
+engine's queue. A vector passes when both sides finish the same way (same
+exit code and, for a failure, both or neither reporting on stderr) and
+mcp_tools.deep_compare_outputs() finds their stdout consistent
+under the requested mode (exact / whitespace / numeric, optionally ignoring
+line order). Output too long for the preview is compared from its capture
+spill file. With early_exit the vectors still pending after the first
+failure are cancelled and reported as skipped.
+"""
+
+import asyncio
+import os
+import re
+import time
+from contextlib import ExitStack
+
+from . import capture
+from .build_cache import normalize_lang
+from .execution import execution_engine
+from .limiter import LimiterBusy
+from .mcp_tools import DEFAULT_FLOAT_TOLERANCE, MODES, deep_compare_outputs
+
+DIFFTEST_MAX_VECTORS = int(os.getenv("DIFFTEST_MAX_VECTORS", "200"))
+DIFFTEST_MAX_STDIN_BYTES = int(os.getenv("DIFFTEST_MAX_STDIN_BYTES", str(64 * 1024)))
+DIFFTEST_CONCURRENCY = int(os.getenv("DIFFTEST_CONCURRENCY", str(execution_engine.max_concurrency)))
+DIFFTEST_MAX_TIMEOUT = float(os.getenv("DIFFTEST_MAX_TIMEOUT", "10"))  # seconds per run a client may ask for
+DIFFTEST_OUTPUT_PREVIEW = 2000  # characters of each side's output kept per vector
+
+# calls that read standard input, by language (a heuristic: comments and strings are not skipped)
+_C_STDIN = r"\b(?:scanf|getchar|getline|fgets|fgetc|getc|fread)\s*\(|\bstdin\b"
+_STDIN_RES = {
+    "python": re.compile(r"\binput\s*\(|\bsys\.stdin\b|\bfileinput\b"),
+    "js": re.compile(r"\bprocess\.stdin\b|\breadline\b|readFileSync\(\s*(?:0|['\"]/dev/stdin['\"])"),
+    "java": re.compile(r"\bSystem\.in\b"),
+    "c": re.compile(_C_STDIN),
+    "cpp": re.compile(_C_STDIN + r"|\bcin\b"),
+    "go": re.compile(r"\bos\.Stdin\b|\bfmt\.Scan"),
+}
+
+
+class DiffTestError(ValueError):
+    """Malformed test vectors; reported to the client as a 400."""
+
+
+def vectors_from_json(items):
+    """Accept a list of stdin strings or {"stdin": ...} objects."""
+    if not isinstance(items, list) or not items:
+        raise DiffTestError("'vectors' must be a non-empty list")
+    if len(items) > DIFFTEST_MAX_VECTORS:
+        raise DiffTestError(f"Too many vectors (max {DIFFTEST_MAX_VECTORS})")
+    vectors = []
+    for i, item in enumerate(items):
+        stdin = item.get("stdin", "") if isinstance(item, dict) else item
+        if not isinstance(stdin, str):
+            raise DiffTestError(f"vectors[{i}] must be a string or an object with 'stdin'")
+        if len(stdin.encode("utf-8")) > DIFFTEST_MAX_STDIN_BYTES:
+            raise DiffTestError(f"vectors[{i}] is larger than {DIFFTEST_MAX_STDIN_BYTES} bytes")
+        vectors.append(stdin)
+    return vectors
+
+
+def _side(res):
+    return {
+        "stdout": res["stdout"][:DIFFTEST_OUTPUT_PREVIEW],
+        "stderr": res["stderr"][:DIFFTEST_OUTPUT_PREVIEW],
+        "exit_code": res["returncode"],
+        "timed_out": res["timed_out"],
+        "wall_ms": res["metrics"].get("wall_ms"),
+        "queue_ms": res.get("queue_ms"),
+        "run_id": res["run_id"],
+    }
+
+
+def comparison_options(data) -> dict:
+    """deep_compare_outputs() keyword arguments from request JSON (mode, float_tolerance, ignore_order)."""
+    mode = data.get("mode") or "exact"
+    if mode not in MODES:
+        raise DiffTestError(f"'mode' must be one of {', '.join(MODES)}")
+    try:
+        tolerance = float(data.get("float_tolerance", DEFAULT_FLOAT_TOLERANCE))
+    except (TypeError, ValueError):
+        raise DiffTestError("'float_tolerance' must be a number") from None
+    return {"mode": mode, "float_tolerance": max(0.0, tolerance), "ignore_order": bool(data.get("ignore_order"))}
+
+
+def run_timeout(data, default=10.0) -> float:
+    """Per-run timeout in seconds from request JSON, capped at DIFFTEST_MAX_TIMEOUT."""
+    value = data.get("timeout")
+    if value in (None, ""):
+        return min(default, DIFFTEST_MAX_TIMEOUT)
+    try:
+        timeout = float(value)
+    except (TypeError, ValueError):
+        timeout = None
+    # bools pass float(); "not > 0" also catches NaN
+    if timeout is None or isinstance(value, bool) or not timeout > 0:
+        raise DiffTestError("'timeout' must be a positive number of seconds")
+    return min(timeout, DIFFTEST_MAX_TIMEOUT)
+
+
+def _stdout_lines(res, stack):
+    """The run's whole stdout: the preview when it is complete, else its spill file read lazily."""
+    info = res["streams"].get("stdout") or {}
+    if not info.get("truncated"):
+        return res["stdout"]
+    if info["stored_bytes"] < info["bytes"]:
+        return None  # more than capture.CAPTURE_SPILL_BYTES
+    try:
+        return stack.enter_context(open(capture.spill_path(res["run_id"], "stdout"), encoding="utf-8",
+                                        errors="replace", newline=""))
+    except OSError:
+        return None
+
+
+def reads_stdin(lang, code) -> bool:
+    """Whether the program looks like it reads standard input; unknown languages are assumed to."""
+    regex = _STDIN_RES.get(normalize_lang(lang))
+    return regex is None or bool(regex.search(code))
+
+
+def _outcome(res):
+    """How a run ended: exit code, plus whether a failing run said anything on stderr."""
+    if res["returncode"] == 0:
+        return 0, False
+    return res["returncode"], bool(res["stderr"].strip())
+
+
+def compare_runs(source, converted, **options) -> dict:
+    """Verdict for one vector: {"status": "pass"|"fail"|"error", "reason", "diff_preview"}."""
+    if source["timed_out"] or converted["timed_out"]:
+        return {"status": "fail", "reason": "timed out", "diff_preview": ""}
+    (src_code, src_err), (conv_code, conv_err) = _outcome(source), _outcome(converted)
+    if src_code != conv_code:
+        return {"status": "fail", "reason": f"exit status differs ({src_code} vs {conv_code})", "diff_preview": ""}
+    if src_err != conv_err:
+        which = "original" if src_err else "converted program"
+        return {"status": "fail", "reason": f"only the {which} reported an error on stderr", "diff_preview": ""}
+    with ExitStack() as stack:
+        original, output = _stdout_lines(source, stack), _stdout_lines(converted, stack)
+        if original is None or output is None:
+            return {"status": "error", "reason": "output too large to compare", "diff_preview": ""}
+        cmp = deep_compare_outputs(original, output, **options)
+    if not cmp["consistent"]:
+        return {"status": "fail", "reason": "output differs", "diff_preview": cmp["diff_preview"],
+                "first_difference": cmp["first_difference"]}
+    return {"status": "pass", "reason": "", "diff_preview": ""}
+
+
+def _compile_info(program):
+    res = program.result
+    return {"ok": program.ok, "compile_cache": res["compile_cache"], "compile_ms": res["metrics"]["compile_ms"],
+            "compile_error": res["compile_error"], "unsupported": res["unsupported"],
+            "timed_out": res["timed_out"]}
+
+
+async def adiff_test(source_lang, source_code, target_lang, converted_code, vectors,
+                     timeout=10, early_exit=True, concurrency=DIFFTEST_CONCURRENCY, compare=None) -> dict:
+    """
+    Returns {"all_passed", "passed", "failed", "errors", "skipped", "compile", "compare",
+    "vectors": [{"index", "status", "reason", "source", "converted", ...}], "total_ms"}.
+    compare holds deep_compare_outputs() options, see comparison_options().
+    Raises LimiterBusy if the programs cannot even be compiled for lack of capacity.
+    """
+    started = time.monotonic()
+    compare = compare or {}
+    async with execution_engine.program(source_lang, source_code) as source, \
+            execution_engine.program(target_lang, converted_code) as converted:
+        report = {"compile": {"source": _compile_info(source), "converted": _compile_info(converted)},
+                  "early_exit": early_exit, "compare": compare}
+        if not (source.ok and converted.ok):
+            report.update(all_passed=False, passed=0, failed=0, errors=0, skipped=len(vectors), vectors=[],
+                          total_ms=round((time.monotonic() - started) * 1000, 1))
+            return report
+
+        gate = asyncio.Semaphore(max(1, concurrency))
+
+        async def run(program, stdin):
+            async with gate:
+                return await program.run(stdin, timeout)
+
+        async def check(index, stdin):
+            try:
+                src, conv = await asyncio.gather(run(source, stdin), run(converted, stdin))
+            except LimiterBusy as e:
+                return {"index": index, "status": "error", "reason": str(e)}
+            # spill files are read off the loop
+            verdict = await asyncio.to_thread(compare_runs, src, conv, **compare)
+            return dict(verdict, index=index, source=_side(src), converted=_side(conv))
+
+        tasks = [asyncio.create_task(check(i, stdin)) for i, stdin in enumerate(vectors)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                outcome = await next_done
+                if early_exit and outcome["status"] != "pass":
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+            outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+        results = [outcome if isinstance(outcome, dict) else {"index": i, "status": "skipped"}
+                   for i, outcome in enumerate(outcomes)]
+
+    counts = {status: sum(1 for r in results if r["status"] == status)
+              for status in ("pass", "fail", "error", "skipped")}
+    report.update(all_passed=counts["pass"] == len(vectors), passed=counts["pass"], failed=counts["fail"],
+                  errors=counts["error"], skipped=counts["skipped"], vectors=results,
+                  total_ms=round((time.monotonic() - started) * 1000, 1))
+    return report
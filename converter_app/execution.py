@@ -0,0 +1,415 @@
+# backend/converter_app/execution.py
+"""
+Execution engine for every "run this code" path.
+
+All runs are admitted by one engine per worker process:
+  * a global concurrency cap (RUN_MAX_CONCURRENCY) plus optional
+    per-language caps (RUN_LANG_LIMITS="java=2,cpp=3")
+  * a bounded FIFO queue; when it is full callers are rejected at once with
+    ExecutionBusy (a LimiterBusy, so the views answer 429 + Retry-After)
+  * queue position and an ETA reported to waiting callers
+
+Jobs run on the engine's own event loop thread with asyncio subprocesses,
+so a slow program costs a pipe and a timer, not a daphne worker thread.
+Sync callers block on the job's future, async callers await it, and the
+WebSocket consumer holds an admission slot for its interactive runs.
+
+Each run comes back with "metrics" (wall/CPU time, peak RSS, compile time,
+exit code and signal, see sandbox.py); stats() sums them per language.
+Output is read through capture.py, so a run holds a bounded head/tail of
+stdout/stderr in memory and the full text is fetched by run_id.
+"""
+
+import asyncio
+import os
+import subprocess
+import threading
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+
+from .build_cache import BUILD_METRICS, normalize_lang, prepare
+from .capture import STREAMS, OutputCapture, new_run_id
+from .limiter import LimiterBusy
+from .warm_pool import astart_process
+from .workspaces import workspace_pool
+
+RUN_MAX_CONCURRENCY = int(os.getenv("RUN_MAX_CONCURRENCY", str(os.cpu_count() or 4)))
+RUN_MAX_QUEUE = int(os.getenv("RUN_MAX_QUEUE", "64"))
+RUN_QUEUE_TIMEOUT = float(os.getenv("RUN_QUEUE_TIMEOUT", "30"))  # seconds a run may wait for a slot
+RUN_COMPILE_TIMEOUT = float(os.getenv("RUN_COMPILE_TIMEOUT", "30"))
+
+
+def _parse_limits(spec):
+    limits = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        lang, _, value = part.partition("=")
+        limits[normalize_lang(lang)] = max(1, int(value))
+    return limits
+
+
+RUN_LANG_LIMITS = _parse_limits(os.getenv("RUN_LANG_LIMITS", ""))
+
+
+class ExecutionBusy(LimiterBusy):
+    """No execution slot could be granted (queue full or waited too long)."""
+
+
+class _Job:
+    __slots__ = ("lang", "future", "on_position", "position")
+
+    def __init__(self, lang, future, on_position):
+        self.lang = lang
+        self.future = future
+        self.on_position = on_position
+        self.position = None
+
+
+class ExecutionEngine:
+    def __init__(self, max_concurrency=RUN_MAX_CONCURRENCY, max_queue=RUN_MAX_QUEUE,
+                 queue_timeout=RUN_QUEUE_TIMEOUT, lang_limits=None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.lang_limits = dict(RUN_LANG_LIMITS if lang_limits is None else lang_limits)
+        # touched only on the engine loop
+        self._active = 0
+        self._active_by_lang = Counter()
+        self._queue = deque()
+        self._avg_run = 1.0  # seconds, moving average of slot hold time
+        self._loop = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.counters = {"admitted": 0, "queued": 0, "rejected": 0, "timeouts": 0, "completed": 0}
+        self._usage = {}  # lang -> totals, see record_usage()
+        self._usage_lock = threading.Lock()
+
+    # ---- engine loop ------------------------------------------------------
+
+    def _ensure_loop(self):
+        with self._start_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="execution-engine",
+                                                daemon=True)
+                self._thread.start()
+        return self._loop
+
+    async def _on_engine(self, coro):
+        """Await coro on the engine loop from any loop (cancellation is forwarded)."""
+        loop = self._ensure_loop()
+        if asyncio.get_running_loop() is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    async def _admission(self, lang, notify):
+        loop = self._ensure_loop()
+        if asyncio.get_running_loop() is loop:
+            return await self._acquire(lang, notify)
+        # Admitted on the engine loop just as we were cancelled: the slot must go back.
+        # The cancelled future drops the engine task's result (and wait_for() may even
+        # swallow the cancellation there), so both sides record what they did on the
+        # engine loop and whichever comes second releases.
+        state = {"admitted": False, "abandoned": False}
+
+        async def acquire():
+            await self._acquire(lang, notify)
+            if state["abandoned"]:
+                self._release(lang, 0.0)
+            else:
+                state["admitted"] = True
+
+        def abandon():
+            state["abandoned"] = True
+            if state["admitted"]:
+                self._release(lang, 0.0)
+
+        future = asyncio.run_coroutine_threadsafe(acquire(), loop)
+        try:
+            await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            loop.call_soon_threadsafe(abandon)
+            raise
+
+    # ---- admission (engine loop only) -------------------------------------
+
+    def _has_room(self, lang):
+        limit = self.lang_limits.get(lang, self.max_concurrency)
+        return self._active < self.max_concurrency and self._active_by_lang[lang] < limit
+
+    def _admit(self, lang):
+        self._active += 1
+        self._active_by_lang[lang] += 1
+        self.counters["admitted"] += 1
+
+    def eta(self, position):
+        """Rough seconds until the job at `position` (0 = next) starts."""
+        return round((position // self.max_concurrency + 1) * self._avg_run, 1)
+
+    async def _acquire(self, lang, on_position=None):
+        # queued jobs never have room (they are dispatched as soon as they do),
+        # so room for this language means nobody eligible is ahead of us
+        if self._has_room(lang):
+            self._admit(lang)
+            return
+        if len(self._queue) >= self.max_queue:
+            self.counters["rejected"] += 1
+            raise ExecutionBusy("Execution queue is full, try again shortly",
+                                retry_after=self.eta(len(self._queue)))
+        job = _Job(lang, asyncio.get_running_loop().create_future(), on_position)
+        self._queue.append(job)
+        self.counters["queued"] += 1
+        self._report_positions()
+        try:
+            await asyncio.wait_for(asyncio.shield(job.future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if job.future.done() and not job.future.cancelled():
+                self._release(lang, 0.0)  # admitted just as we gave up
+            elif job in self._queue:
+                self._queue.remove(job)
+                self._report_positions()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.counters["timeouts"] += 1
+            raise ExecutionBusy("Timed out waiting for an execution slot",
+                                retry_after=self.eta(len(self._queue))) from None
+
+    def _release(self, lang, held_for):
+        self._active -= 1
+        self._active_by_lang[lang] -= 1
+        if held_for:
+            self.counters["completed"] += 1
+            self._avg_run = 0.8 * self._avg_run + 0.2 * held_for
+        self._dispatch()
+
+    def _dispatch(self):
+        # first fit: a saturated language does not hold up the others
+        for job in list(self._queue):
+            if self._active >= self.max_concurrency:
+                break
+            if self._has_room(job.lang):
+                self._queue.remove(job)
+                self._admit(job.lang)
+                job.future.set_result(None)
+        self._report_positions()
+
+    def _report_positions(self):
+        for position, job in enumerate(self._queue):
+            if job.on_position is not None and job.position != position:
+                job.position = position
+                try:
+                    job.on_position(position, self.eta(position))
+                except Exception:
+                    pass
+
+    # ---- public API -------------------------------------------------------
+
+    @asynccontextmanager
+    async def slot(self, lang, on_position=None):
+        """
+        Hold an execution slot from any event loop, e.g. for an interactive run.
+
+        on_position(position, eta_seconds) is called in the caller's loop
+        whenever the caller's place in the queue changes.
+        """
+        lang = normalize_lang(lang)
+        caller = asyncio.get_running_loop()
+        notify = None
+        if on_position is not None:
+            notify = lambda pos, eta: caller.call_soon_threadsafe(_invoke, on_position, pos, eta)
+        await self._admission(lang, notify)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._loop.call_soon_threadsafe(self._release, lang, time.monotonic() - started)
+
+    async def arun(self, lang, code, stdin="", timeout=10, on_position=None):
+        """Compile (or reuse a build) and run `code`; returns a result dict, see _run_job()."""
+        lang = normalize_lang(lang)
+        queued = time.monotonic()
+        async with self.slot(lang, on_position):
+            waited = time.monotonic() - queued
+            result = await self._on_engine(self._run_job(lang, code, stdin, timeout))
+        return dict(result, queue_ms=round(waited * 1000, 1))
+
+    def run(self, lang, code, stdin="", timeout=10):
+        """Blocking form of arun() for sync callers; must not be called on the engine loop."""
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("ExecutionEngine.run() called from the engine loop")
+        return asyncio.run_coroutine_threadsafe(self.arun(lang, code, stdin, timeout), loop).result()
+
+    @asynccontextmanager
+    async def program(self, lang, code, on_position=None):
+        """
+        Compile `code` once and run it many times, e.g. against a list of test inputs:
+
+            async with execution_engine.program("cpp", code) as program:
+                if program.ok:
+                    result = await program.run(stdin)
+
+        program.result holds the compile outcome in the arun() result format.
+        """
+        lang = normalize_lang(lang)
+        workspace = workspace_pool.acquire("program")
+        try:
+            result = _new_result()
+            async with self.slot(lang, on_position):
+                build = await self._on_engine(self._build(lang, code, workspace.path, RUN_COMPILE_TIMEOUT, result))
+            yield Program(self, lang, build, result)
+        finally:
+            workspace.release()
+
+    async def _run_job(self, lang, code, stdin, timeout):
+        """
+        Returns {"returncode", "stdout", "stderr", "timed_out", "compile_error",
+        "compile_cache", "unsupported", "metrics", "run_id", "streams"}; stdout/stderr
+        are previews and streams holds capture.OutputCapture.info() per stream.
+        """
+        result = _new_result()
+        workspace = workspace_pool.acquire("engine")
+        try:
+            build = await self._build(lang, code, workspace.path, max(timeout, RUN_COMPILE_TIMEOUT), result)
+            if build is not None:
+                await self._execute(lang, build, workspace.path, stdin, timeout, result)
+        finally:
+            workspace.release()
+        return result
+
+    async def _build(self, lang, code, workdir, timeout, result):
+        """prepare() off the loop; records the compile outcome in `result`, returns the build or None."""
+        started = time.monotonic()
+        try:
+            build = await asyncio.to_thread(prepare, lang, code, workdir, timeout)
+        except subprocess.TimeoutExpired:
+            result["timed_out"] = True  # compiler ran too long
+            result["metrics"]["compile_ms"] = round((time.monotonic() - started) * 1000, 1)
+            return None
+        result["metrics"]["compile_ms"] = build["compile_ms"]
+        for key in BUILD_METRICS:
+            if key in build:
+                result["metrics"][key] = build[key]
+        result.update(compile_cache=build["compile_cache"], compile_error=build["compile_error"])
+        if build["compile_error"]:
+            return None
+        if build["cmd"] is None:
+            result["unsupported"] = True
+            return None
+        return build
+
+    async def _execute(self, lang, build, cwd, stdin, timeout, result):
+        run_id = result["run_id"]
+        captures = {name: OutputCapture(run_id, name) for name in STREAMS}
+        proc = await astart_process(build, cwd, merge_stderr=False)
+        try:
+            await asyncio.wait_for(_communicate(proc, stdin, captures), timeout)
+        except asyncio.TimeoutError:
+            result["timed_out"] = True
+            proc.kill()
+            await proc.wait()
+        except BaseException:
+            proc.kill()
+            raise
+        finally:
+            for capture in captures.values():
+                capture.close()
+        result.update(returncode=proc.returncode, stdout=captures["stdout"].preview(),
+                      stderr=captures["stderr"].preview(),
+                      streams={name: c.info() for name, c in captures.items()})
+        result["metrics"].update(proc.usage)
+        self.record_usage(lang, result["metrics"])
+
+    def record_usage(self, lang, metrics):
+        """Add one finished run to the per-language totals in stats()."""
+        with self._usage_lock:
+            totals = self._usage.setdefault(lang, {"runs": 0, "cpu_ms": 0.0, "wall_ms": 0.0,
+                                                   "peak_rss_kb_max": 0, "signals": Counter()})
+            totals["runs"] += 1
+            totals["cpu_ms"] += metrics.get("cpu_ms") or 0
+            totals["wall_ms"] += metrics.get("wall_ms") or 0
+            totals["peak_rss_kb_max"] = max(totals["peak_rss_kb_max"], metrics.get("peak_rss_kb") or 0)
+            if metrics.get("signal"):
+                totals["signals"][metrics["signal"]] += 1
+
+    def stats(self) -> dict:
+        data = dict(self.counters, active=self._active, waiting=len(self._queue),
+                    active_by_lang={k: v for k, v in self._active_by_lang.items() if v},
+                    max_concurrency=self.max_concurrency, lang_limits=self.lang_limits)
+        data["avg_run_seconds"] = round(self._avg_run, 3)
+        with self._usage_lock:
+            data["usage"] = {
+                lang: dict(t, cpu_ms=round(t["cpu_ms"], 1), wall_ms=round(t["wall_ms"], 1),
+                           avg_cpu_ms=round(t["cpu_ms"] / t["runs"], 1), signals=dict(t["signals"]))
+                for lang, t in self._usage.items()
+            }
+        return data
+
+
+class Program:
+    """A compiled program from ExecutionEngine.program(); each run gets a fresh working directory."""
+
+    def __init__(self, engine, lang, build, result):
+        self.engine = engine
+        self.lang = lang
+        self.build = build
+        self.result = result
+
+    @property
+    def ok(self) -> bool:
+        return self.build is not None
+
+    async def run(self, stdin="", timeout=10, on_position=None):
+        """Run once; same result format as ExecutionEngine.arun() (compile_ms is 0: nothing is rebuilt)."""
+        queued = time.monotonic()
+        async with self.engine.slot(self.lang, on_position):
+            waited = time.monotonic() - queued
+            result = await self.engine._on_engine(self._run(stdin, timeout))
+        return dict(result, queue_ms=round(waited * 1000, 1))
+
+    async def _run(self, stdin, timeout):
+        result = _new_result()
+        result.update(compile_cache=self.result["compile_cache"])
+        result["metrics"]["compile_ms"] = 0.0
+        if "jvm" in self.build:
+            result["metrics"]["jvm"] = dict(self.build["jvm"], compiled_by=None, compile_saved_ms=0.0)
+        workspace = workspace_pool.acquire("program-run")
+        try:
+            await self.engine._execute(self.lang, self.build, workspace.path, stdin, timeout, result)
+        finally:
+            workspace.release()
+        return result
+
+
+def _new_result():
+    return {"returncode": None, "stdout": "", "stderr": "", "timed_out": False,
+            "compile_error": None, "compile_cache": None, "unsupported": False,
+            "run_id": new_run_id(), "streams": {}, "metrics": {"compile_ms": None}}
+
+
+async def _communicate(proc, stdin, captures):
+    """Feed stdin and read stdout/stderr chunk by chunk into their captures until exit."""
+    async def feed():
+        if stdin:
+            proc.stdin.write(stdin.encode("utf-8"))
+            try:
+                await proc.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+        proc.stdin.close()
+
+    async def drain(stream, capture):
+        while chunk := await stream.read(65536):
+            await capture.afeed(chunk)
+
+    await asyncio.gather(feed(), drain(proc.stdout, captures["stdout"]), drain(proc.stderr, captures["stderr"]))
+    await proc.wait()
+
+
+def _invoke(callback, position, eta):
+    result = callback(position, eta)
+    if asyncio.iscoroutine(result):
+        asyncio.ensure_future(result)
+
+
+execution_engine = ExecutionEngine()
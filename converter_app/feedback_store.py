@@ -0,0 +1,130 @@
+# backend/converter_app/feedback_store.py
+"""
+Feedback persistence off the request path.
+
+Rows are queued and written by a background thread with bulk_create, either
+every FEEDBACK_FLUSH_ROWS rows or FEEDBACK_FLUSH_SECONDS, whichever comes
+first. Lookups check the rows still waiting in the queue before hitting the
+indexed (previous_code_hash, feedback_hash, source_lang, target_lang) columns,
+so a refinement can be reused even before it has been committed.
+"""
+
+import atexit
+import os
+import queue
+import threading
+
+from django.db import close_old_connections
+
+from .models import Feedback, code_hash, feedback_hash
+
+FLUSH_ROWS = int(os.getenv("FEEDBACK_FLUSH_ROWS", "50"))
+FLUSH_SECONDS = float(os.getenv("FEEDBACK_FLUSH_SECONDS", "0.5"))
+MAX_PENDING = int(os.getenv("FEEDBACK_MAX_PENDING", "10000"))
+
+
+def _lookup_key(previous_code, feedback_text, source_lang, target_lang):
+    return (code_hash(previous_code), feedback_hash(feedback_text), source_lang, target_lang)
+
+
+class FeedbackWriter:
+    def __init__(self, flush_rows=FLUSH_ROWS, flush_seconds=FLUSH_SECONDS, max_pending=MAX_PENDING):
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._pending = {}  # lookup key -> refined_code, until committed
+        self._lock = threading.Lock()
+        self._thread = None
+        self.counters = {"queued": 0, "written": 0, "batches": 0, "dropped": 0, "errors": 0}
+
+    def submit(self, source_lang, target_lang, previous_code, feedback_text, refined_code):
+        """Queue a Feedback row; never blocks the caller on the database."""
+        row = Feedback(source_lang=source_lang, target_lang=target_lang, previous_code=previous_code,
+                       feedback_text=feedback_text, refined_code=refined_code).fill_hashes()
+        key = (row.previous_code_hash, row.feedback_hash, source_lang, target_lang)
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait((key, row))
+        except queue.Full:
+            with self._lock:
+                self.counters["dropped"] += 1
+            return
+        with self._lock:
+            self._pending[key] = refined_code
+            self.counters["queued"] += 1
+
+    def pending_refinement(self, key):
+        with self._lock:
+            return self._pending.get(key)
+
+    def flush(self):
+        """Write everything queued so far (used at exit and in tests)."""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        self._write(batch)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters, pending=len(self._pending))
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="feedback-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < self.flush_rows:
+                    batch.append(self._queue.get(timeout=self.flush_seconds))
+            except queue.Empty:
+                pass
+            self._write(batch)
+
+    def _write(self, batch):
+        if not batch:
+            return
+        close_old_connections()
+        try:
+            Feedback.objects.bulk_create([row for _, row in batch])
+        except Exception:
+            with self._lock:
+                self.counters["errors"] += 1
+        else:
+            with self._lock:
+                self.counters["written"] += len(batch)
+                self.counters["batches"] += 1
+        finally:
+            with self._lock:
+                for key, row in batch:
+                    if self._pending.get(key) == row.refined_code:
+                        del self._pending[key]
+            close_old_connections()
+
+
+feedback_writer = FeedbackWriter()
+atexit.register(feedback_writer.flush)
+
+
+def find_refinement(previous_code, feedback_text, source_lang, target_lang):
+    """Return a stored refined_code for this exact code + feedback pair, or None."""
+    key = _lookup_key(previous_code, feedback_text, source_lang, target_lang)
+    pending = feedback_writer.pending_refinement(key)
+    if pending:
+        return pending
+
+    prev_hash, fb_hash, source_lang, target_lang = key
+    row = (Feedback.objects
+           .filter(previous_code_hash=prev_hash, feedback_hash=fb_hash,
+                   source_lang=source_lang, target_lang=target_lang)
+           .exclude(refined_code="")
+           .order_by("-created_at")
+           .only("refined_code")
+           .first())
+    return row.refined_code if row else None
@@ -0,0 +1,43 @@
+import java.io.BufferedOutputStream;
+import java.io.BufferedReader;
+import java.io.ByteArrayOutputStream;
+import java.io.IOException;
+import java.io.InputStreamReader;
+import java.io.OutputStream;
+import java.nio.charset.StandardCharsets;
+import javax.tools.JavaCompiler;
+import javax.tools.ToolProvider;
+
+/**
+ * Resident javac for java_runtime.py.
+ *
+ * Each request is one line of tab-separated javac arguments (absolute paths);
+ * the reply is "<exit status>\t<byte count>\n" followed by that many bytes of
+ * compiler diagnostics. Every request gets a fresh compilation context, but the
+ * compiler's classes stay loaded and JIT-compiled between requests.
+ */
+public class CompileServer {
+    public static void main(String[] args) throws IOException {
+        JavaCompiler javac = ToolProvider.getSystemJavaCompiler();
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+        OutputStream out = new BufferedOutputStream(System.out);
+        String line;
+        while ((line = in.readLine()) != null) {
+            if (line.isEmpty()) {
+                continue;
+            }
+            ByteArrayOutputStream diagnostics = new ByteArrayOutputStream();
+            int status;
+            try {
+                status = javac.run(null, diagnostics, diagnostics, line.split("\t"));
+            } catch (RuntimeException e) {
+                status = 3;
+                diagnostics.write(e.toString().getBytes(StandardCharsets.UTF_8));
+            }
+            byte[] text = diagnostics.toByteArray();
+            out.write((status + "\t" + text.length + "\n").getBytes(StandardCharsets.US_ASCII));
+            out.write(text);
+            out.flush();
+        }
+    }
+}
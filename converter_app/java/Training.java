@@ -0,0 +1,55 @@
+import java.io.BufferedReader;
+import java.io.IOException;
+import java.io.InputStreamReader;
+import java.util.ArrayDeque;
+import java.util.ArrayList;
+import java.util.Arrays;
+import java.util.Collections;
+import java.util.HashMap;
+import java.util.HashSet;
+import java.util.LinkedList;
+import java.util.List;
+import java.util.Map;
+import java.util.PriorityQueue;
+import java.util.Scanner;
+import java.util.TreeMap;
+import java.util.stream.Collectors;
+import java.util.stream.IntStream;
+
+/**
+ * What a typical converted program does, for java_runtime.py: the classes it
+ * loads (stdin parsing, collections, streams, lambdas, formatting) go into the
+ * class-data-sharing archive, and timing it measures JVM start-up savings.
+ */
+public class Training {
+    public static void main(String[] args) throws IOException {
+        BufferedReader reader = new BufferedReader(new InputStreamReader(System.in));
+        String first = reader.readLine();
+        Scanner scanner = new Scanner(first == null ? "3 1 2" : first);
+        List<Integer> numbers = new ArrayList<>();
+        while (scanner.hasNextInt()) {
+            numbers.add(scanner.nextInt());
+        }
+        Collections.sort(numbers);
+        int[] array = numbers.stream().mapToInt(Integer::intValue).toArray();
+        Arrays.sort(array);
+
+        Map<String, Integer> counts = new HashMap<>();
+        TreeMap<Integer, String> ordered = new TreeMap<>();
+        for (int n : array) {
+            counts.merge(n % 2 == 0 ? "even" : "odd", 1, Integer::sum);
+            ordered.put(n, Integer.toString(n));
+        }
+        PriorityQueue<Integer> heap = new PriorityQueue<>(Collections.reverseOrder());
+        heap.addAll(numbers);
+        ArrayDeque<Integer> deque = new ArrayDeque<>(new LinkedList<>(numbers));
+        HashSet<Integer> seen = new HashSet<>(deque);
+
+        String joined = IntStream.rangeClosed(1, 5).mapToObj(String::valueOf).collect(Collectors.joining(","));
+        StringBuilder out = new StringBuilder();
+        out.append(String.format("%d %.2f %s%n", heap.peek() == null ? 0 : heap.peek(), Math.sqrt(seen.size()), joined));
+        out.append(counts).append(' ').append(ordered.firstEntry()).append(System.lineSeparator());
+        System.out.print(out);
+        System.out.printf("%s%n", Long.parseLong("42") + Double.parseDouble("0.5"));
+    }
+}
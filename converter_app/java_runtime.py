@@ -0,0 +1,305 @@
+# backend/converter_app/java_runtime.py
+"""
+Cheaper Java builds and launches.
+
+Compiling: a resident helper JVM (java/CompileServer.java, javax.tools) keeps
+javac loaded and JIT-compiled, so a build no longer pays a JVM start-up. One
+compile runs at a time; while the server is starting, busy for more than
+JAVA_COMPILE_SERVER_WAIT seconds or gone, builds fall back to a cold `javac`.
+It is replaced after JAVA_COMPILE_SERVER_MAX_COMPILES compiles.
+
+Launching: every `java` gets JAVA_RUN_FLAGS (serial GC and C1 only, which
+suit short programs) and a static class-data-sharing archive of the JDK
+classes a typical program loads, dumped from the run of java/Training.java.
+
+Both are set up in a background thread the first time Java is used (like
+warm_pool.py, the first runs take the plain path meanwhile) under
+JAVA_RUNTIME_DIR, per JDK. Savings are measured once while setting up:
+cold vs server compile of Training.java, plain vs tuned start-up of
+Training; every Java build reports them in metrics["jvm"].
+"""
+
+import hashlib
+import os
+import select
+import shlex
+import shutil
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+
+JAVA_CDS = os.getenv("JAVA_CDS", "1") == "1"
+JAVA_COMPILE_SERVER = os.getenv("JAVA_COMPILE_SERVER", "1") == "1"
+JAVA_RUN_FLAGS = shlex.split(os.getenv("JAVA_RUN_FLAGS", "-XX:+UseSerialGC -XX:TieredStopAtLevel=1"))
+JAVA_COMPILE_SERVER_FLAGS = shlex.split(os.getenv("JAVA_COMPILE_SERVER_FLAGS", "-XX:+UseSerialGC -Xmx512m"))
+JAVA_COMPILE_SERVER_MAX_COMPILES = int(os.getenv("JAVA_COMPILE_SERVER_MAX_COMPILES", "500"))
+JAVA_COMPILE_SERVER_WAIT = float(os.getenv("JAVA_COMPILE_SERVER_WAIT", "2"))
+JAVA_RUNTIME_DIR = os.getenv("JAVA_RUNTIME_DIR", os.path.join(tempfile.gettempdir(), "code_converter_java"))
+
+HELPERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "java")
+SETUP_TIMEOUT = 120
+PROBE_RUNS = 3
+PROBE_STDIN = b"5 3 9 1 7\n"
+# unified logging writes warnings (e.g. an unusable archive) to stdout; keep them out of program output
+QUIET_LOGGING = ["-Xlog:disable", "-Xlog:all=warning:stderr"]
+
+
+def _jdk_id():
+    """Name of the directory for helpers and archives built by the installed JDK, or None without one."""
+    h = hashlib.sha256()
+    for tool in ("java", "javac"):
+        path = shutil.which(tool)
+        if path is None:
+            return None
+        real = os.path.realpath(path)
+        h.update(f"{real} {os.stat(real).st_mtime}\0".encode("utf-8"))
+    for name in sorted(os.listdir(HELPERS_DIR)):
+        with open(os.path.join(HELPERS_DIR, name), "rb") as f:
+            h.update(f.read())
+    h.update("\0".join(JAVA_RUN_FLAGS).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def _timed(argv, stdin=None, cwd=None):
+    started = time.monotonic()
+    proc = subprocess.run(argv, input=stdin, cwd=cwd, capture_output=True, timeout=SETUP_TIMEOUT)
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, argv, proc.stdout, proc.stderr)
+    return (time.monotonic() - started) * 1000
+
+
+class JavaRuntime:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._server_lock = threading.Lock()
+        self._setup_started = False
+        self._server = None
+        self._server_compiles = 0
+        self.base = None
+        self.archive = None
+        self.compile_saved_ms = None
+        self.startup_saved_ms = None
+        self.error = None
+        self.counters = {"server_compiles": 0, "cold_compiles": 0, "server_busy": 0, "server_restarts": 0,
+                         "server_failures": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    # -- setup --
+
+    def warm_up(self):
+        """Start building the helpers, the compile server and the archive (once, in the background)."""
+        with self._lock:
+            if self._setup_started or not (JAVA_CDS or JAVA_COMPILE_SERVER):
+                return
+            self._setup_started = True
+        threading.Thread(target=self._setup, name="java-runtime-setup", daemon=True).start()
+
+    def _setup(self):
+        try:
+            jdk = _jdk_id()
+            if jdk is None:
+                self.error = "no JDK: java and javac must both be on PATH"
+                return
+            self.base = os.path.join(JAVA_RUNTIME_DIR, jdk)
+            self._build_helpers()
+            if JAVA_COMPILE_SERVER:
+                self._start_server()
+                self._measure_compile()
+            if JAVA_CDS:
+                self._build_archive()
+                self._measure_startup()
+        except (OSError, subprocess.SubprocessError) as e:
+            self.error = str(e)[:500]
+
+    def _classes(self):
+        return os.path.join(self.base, "classes")
+
+    def _build_helpers(self):
+        if os.path.exists(os.path.join(self._classes(), "CompileServer.class")):
+            return
+        os.makedirs(self.base, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=self.base)
+        try:
+            sources = [os.path.join(HELPERS_DIR, name) for name in ("CompileServer.java", "Training.java")]
+            _timed(["javac", "-d", staging] + sources)
+            try:
+                os.rename(staging, self._classes())
+            except OSError:
+                pass  # another worker got there first
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def _build_archive(self):
+        path = os.path.join(self.base, "jdk.jsa")
+        if not os.path.exists(path):
+            fd, class_list = tempfile.mkstemp(dir=self.base, suffix=".lst")
+            os.close(fd)
+            staging = path + f".{os.getpid()}"
+            try:
+                _timed(["java", f"-XX:DumpLoadedClassList={class_list}"] + JAVA_RUN_FLAGS
+                       + ["-cp", self._classes(), "Training"], stdin=PROBE_STDIN)
+                # JDK classes only: with no application classes in it the archive fits any -cp
+                with open(class_list, encoding="utf-8") as f:
+                    lines = [line for line in f if "Training" not in line]
+                with open(class_list, "w", encoding="utf-8") as f:
+                    f.writelines(lines)
+                _timed(["java", "-Xshare:dump", f"-XX:SharedClassListFile={class_list}",
+                        f"-XX:SharedArchiveFile={staging}"] + JAVA_RUN_FLAGS + QUIET_LOGGING)
+                os.replace(staging, path)
+            finally:
+                for leftover in (class_list, staging):
+                    try:
+                        os.remove(leftover)
+                    except OSError:
+                        pass
+        # -Xshare:on fails outright when the archive cannot be mapped (auto would just ignore it)
+        _timed(["java"] + JAVA_RUN_FLAGS + [f"-XX:SharedArchiveFile={path}", "-Xshare:on", "-version"])
+        self.archive = path
+
+    def _measure_startup(self):
+        def median(flags):
+            argv = ["java"] + flags + ["-cp", self._classes(), "Training"]
+            return statistics.median(_timed(argv, stdin=PROBE_STDIN) for _ in range(PROBE_RUNS))
+
+        # the "before" is what build_cache used to launch: plain `java -cp dir Main`
+        self.startup_saved_ms = round(max(0.0, median([]) - median(self.launch_flags())), 1)
+
+    def _measure_compile(self):
+        source = os.path.join(HELPERS_DIR, "Training.java")
+        with tempfile.TemporaryDirectory(dir=self.base) as outdir:
+            cold = _timed(["javac", "-d", outdir, source])
+            warm = []
+            for _ in range(PROBE_RUNS):
+                started = time.monotonic()
+                if self.compile(["-d", outdir, source], outdir, SETUP_TIMEOUT) is None:
+                    return
+                warm.append((time.monotonic() - started) * 1000)
+        self.compile_saved_ms = round(max(0.0, cold - statistics.median(warm)), 1)
+
+    # -- launching --
+
+    def launch_flags(self):
+        """JVM options for running a user program."""
+        if self.archive is None:
+            return list(JAVA_RUN_FLAGS)
+        return JAVA_RUN_FLAGS + [f"-XX:SharedArchiveFile={self.archive}", "-Xshare:auto"] + QUIET_LOGGING
+
+    # -- compile server --
+
+    def _start_server(self):
+        proc = subprocess.Popen(["java"] + JAVA_COMPILE_SERVER_FLAGS + ["-cp", self._classes(), "CompileServer"],
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                bufsize=0, start_new_session=True)
+        with self._server_lock:
+            old, self._server, self._server_compiles = self._server, proc, 0
+        if old is not None:
+            _stop(old)
+
+    def _restart_server(self):
+        self._count("server_restarts")
+        try:
+            self._start_server()
+        except OSError as e:
+            self.error = str(e)[:500]
+
+    def compile(self, args, outdir, timeout):
+        """
+        Run javac `args` (absolute paths) on the compile server.
+
+        Returns (returncode, diagnostics) with outdir stripped from paths, or None
+        when the server is unavailable and the caller should run javac itself.
+        Raises subprocess.TimeoutExpired (after killing the server) past `timeout`.
+        """
+        served = self._compile_on_server(args, outdir, timeout)
+        if served is None:
+            self._count("cold_compiles")
+        return served
+
+    def _compile_on_server(self, args, outdir, timeout):
+        if any("\t" in a or "\n" in a for a in args):
+            return None
+        if not self._server_lock.acquire(timeout=min(timeout, JAVA_COMPILE_SERVER_WAIT)):
+            self._count("server_busy")
+            return None
+        restart = False
+        try:
+            proc = self._server
+            if proc is None or proc.poll() is not None:
+                return None
+            try:
+                proc.stdin.write(("\t".join(args) + "\n").encode("utf-8"))
+                status, text = _read_reply(proc.stdout.fileno(), timeout)
+            except subprocess.TimeoutExpired:
+                _stop(proc)
+                self._server, restart = None, True
+                raise
+            except (OSError, ValueError, EOFError):
+                _stop(proc)
+                self._server, restart = None, True
+                self._count("server_failures")
+                return None
+            self._server_compiles += 1
+            restart = self._server_compiles >= JAVA_COMPILE_SERVER_MAX_COMPILES
+        finally:
+            self._server_lock.release()
+            if restart:
+                threading.Thread(target=self._restart_server, name="java-compile-server", daemon=True).start()
+        self._count("server_compiles")
+        return status, text.replace(outdir.rstrip(os.sep) + os.sep, "")
+
+    def server_running(self):
+        proc = self._server
+        return proc is not None and proc.poll() is None
+
+    # -- reporting --
+
+    def build_metrics(self, compiled_by):
+        """metrics["jvm"] for one Java build; compiled_by is "server", "javac" or None (cache hit)."""
+        return {"compiled_by": compiled_by, "cds": self.archive is not None,
+                "compile_saved_ms": self.compile_saved_ms if compiled_by == "server" else 0.0,
+                "startup_saved_ms": self.startup_saved_ms if self.archive is not None else 0.0}
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self.counters)
+        data.update(compile_server=self.server_running(), cds=self.archive is not None,
+                    compile_saved_ms=self.compile_saved_ms, startup_saved_ms=self.startup_saved_ms,
+                    error=self.error)
+        return data
+
+
+def _read_reply(fd, timeout):
+    """One "<status>\\t<length>\\n<diagnostics>" reply from the compile server."""
+    deadline = time.monotonic() + timeout
+    buf = b""
+    header = None
+    while True:
+        if header is None and b"\n" in buf:
+            line, buf = buf.split(b"\n", 1)
+            status, length = line.decode("ascii").split("\t")
+            header = int(status), int(length)
+        if header is not None and len(buf) >= header[1]:
+            return header[0], buf[:header[1]].decode("utf-8", errors="replace")
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+            raise subprocess.TimeoutExpired("javac (compile server)", timeout)
+        chunk = os.read(fd, 65536)
+        if not chunk:
+            raise EOFError("compile server exited")
+        buf += chunk
+
+
+def _stop(proc):
+    try:
+        proc.kill()
+    except OSError:
+        pass
+    proc.wait()
+
+
+java_runtime = JavaRuntime()
@@ -0,0 +1,208 @@
+# backend/converter_app/limiter.py
+"""
+Global admission control for upstream LLM calls.
+
+A single limiter instance is shared by the sync and async call paths of a
+worker process. It combines:
+  * a concurrency cap (max requests in flight to Groq)
+  * a token bucket matching the account's requests-per-minute limit
+  * a bounded wait queue; callers beyond it are rejected immediately with
+    LimiterBusy, which the views turn into an HTTP 429
+
+State is guarded by a threading lock and async waiters are woken through
+their own event loop, so it works from daphne's loop, from thread-pool
+sync views and from async_to_sync helpers alike.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "10"))  # seconds a caller may wait
+LLM_RATE_PER_MINUTE = float(os.getenv("LLM_RATE_PER_MINUTE", "30"))  # 0 disables the bucket
+LLM_BURST = int(os.getenv("LLM_BURST", str(LLM_MAX_CONCURRENCY)))
+
+
+class LimiterBusy(Exception):
+    """Raised when a request cannot be admitted in time."""
+
+    def __init__(self, message, retry_after=1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("loop", "future", "event")
+
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+        self.event = None if loop else threading.Event()
+
+    def wake(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+        else:
+            self.event.set()
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class ConcurrencyLimiter:
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY, max_queue=LLM_MAX_QUEUE,
+                 queue_timeout=LLM_QUEUE_TIMEOUT, rate_per_minute=LLM_RATE_PER_MINUTE,
+                 burst=LLM_BURST):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.rate = rate_per_minute / 60.0
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._active = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+        self.counters = {"admitted": 0, "queued": 0, "rejected": 0, "timeouts": 0}
+
+    # ---- bookkeeping (call with lock held) --------------------------------
+
+    def _refill(self):
+        if not self.rate:
+            return
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _token_wait(self):
+        """Seconds until a token is available (0 when one is ready)."""
+        if not self.rate:
+            return 0.0
+        self._refill()
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def _try_admit(self):
+        if self._active >= self.max_concurrency or self._token_wait() > 0:
+            return False
+        self._active += 1
+        if self.rate:
+            self._tokens -= 1
+        self.counters["admitted"] += 1
+        return True
+
+    def _enqueue(self, waiter):
+        if len(self._waiters) >= self.max_queue:
+            self.counters["rejected"] += 1
+            raise LimiterBusy("LLM queue is full, try again shortly", retry_after=self._retry_after())
+        self._waiters.append(waiter)
+        self.counters["queued"] += 1
+
+    def _retry_after(self):
+        return round(max(self._token_wait(), 1.0), 1)
+
+    def _next_delay(self, deadline):
+        remaining = max(0.0, deadline - time.monotonic())
+        token_wait = self._token_wait()
+        return min(remaining, token_wait) if token_wait else remaining
+
+    def _give_up(self, waiter):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        self.counters["timeouts"] += 1
+        self._wake_head()
+        return LimiterBusy("Timed out waiting for an LLM slot", retry_after=self._retry_after())
+
+    # ---- sync API ---------------------------------------------------------
+
+    def acquire_sync(self):
+        deadline = time.monotonic() + self.queue_timeout
+        with self._lock:
+            if not self._waiters and self._try_admit():
+                return
+            waiter = _Waiter()
+            self._enqueue(waiter)
+        while True:
+            with self._lock:
+                if self._waiters and self._waiters[0] is waiter and self._try_admit():
+                    self._waiters.popleft()
+                    self._wake_head()
+                    return
+                if time.monotonic() >= deadline:
+                    raise self._give_up(waiter)
+                delay = self._next_delay(deadline)
+                waiter.event.clear()
+            waiter.event.wait(delay)
+
+    # ---- async API --------------------------------------------------------
+
+    async def acquire(self):
+        deadline = time.monotonic() + self.queue_timeout
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not self._waiters and self._try_admit():
+                return
+            waiter = _Waiter(loop)
+            self._enqueue(waiter)
+        while True:
+            with self._lock:
+                if self._waiters and self._waiters[0] is waiter and self._try_admit():
+                    self._waiters.popleft()
+                    self._wake_head()
+                    return
+                if time.monotonic() >= deadline:
+                    raise self._give_up(waiter)
+                delay = self._next_delay(deadline)
+                waiter.future = loop.create_future()
+            try:
+                await asyncio.wait_for(waiter.future, timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                with self._lock:
+                    self._give_up(waiter)
+                raise
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+            self._wake_head()
+
+    def _wake_head(self):
+        if self._waiters:
+            self._waiters[0].wake()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @contextmanager
+    def sync_slot(self):
+        self.acquire_sync()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._refill()
+            return dict(self.counters, active=self._active, waiting=len(self._waiters),
+                        tokens=round(self._tokens, 2) if self.rate else None)
+
+
+llm_limiter = ConcurrencyLimiter()
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from converter_app.mock_groq import MockGroqConfig, make_server
+
+
+class Command(BaseCommand):
+    help = "Run a local Groq/OpenAI-compatible stand-in server for offline load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8088)
+        parser.add_argument("--latency", default="fixed:0",
+                            help='time to first token in ms: "fixed:200", "uniform:100,400", '
+                                 '"normal:250,50" or "lognormal:250,0.5"')
+        parser.add_argument("--tokens-per-second", type=float, default=0.0,
+                            help="generation speed; 0 returns the whole reply at once")
+        parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of requests rejected with 429")
+        parser.add_argument("--rate-timeout", type=float, default=0.0, help="fraction of requests that hang")
+        parser.add_argument("--hang-seconds", type=float, default=120.0)
+        parser.add_argument("--replay", help="JSONL recordings written by GROQ_RECORD_FILE")
+        parser.add_argument("--verbose", action="store_true", help="log every request")
+
+    def handle(self, *args, **opts):
+        try:
+            config = MockGroqConfig(latency=opts["latency"], tokens_per_second=opts["tokens_per_second"],
+                                    rate_429=opts["rate_429"], rate_timeout=opts["rate_timeout"],
+                                    hang_seconds=opts["hang_seconds"], replay=opts["replay"])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        server = make_server(opts["host"], opts["port"], config, verbose=opts["verbose"])
+        self.stdout.write(f"Mock Groq listening on http://{opts['host']}:{opts['port']} "
+                          f"({len(config.recordings)} recordings)")
+        self.stdout.write(f"Use GROQ_BASE_URL=http://{opts['host']}:{opts['port']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -3,47 +3,575 @@ import os
 import json
 import time
 import re
-from groq import Groq
+import asyncio
+import threading
+import weakref
+import httpx
+from asgiref.sync import async_to_sync
+from groq import Groq, AsyncGroq
+from .cache import conversion_cache, make_key, normalize_source
+from .difftest import adiff_test, reads_stdin
+from .limiter import LimiterBusy, llm_limiter
+from .singleflight import LeaderGone, conversions_in_flight
+from .mock_groq import record_completion
+from .chunking import UNIT_HEADER, apply_incremental, group_units, plan_incremental, shared_context, split_units
+from .model_router import (
+    FAST_MODEL, ROUTING_ENABLED, compact_source, estimate_tokens, looks_valid, note_escalation, route_model,
+)
 
 # Optional mock testing mode
 MOCK_MCP = os.getenv("MOCK_MCP", "0") == "1"
 
 # Groq client setup
 GROQ_KEY = os.getenv("GROQ_API_KEY")
-client = Groq(api_key=GROQ_KEY)
+# e.g. http://127.0.0.1:8088 for the local stand-in (python manage.py mock_groq)
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+# append every real completion here so mock_groq can replay it later
+GROQ_RECORD_FILE = os.getenv("GROQ_RECORD_FILE")
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "30"))
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "2"))
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "20"))
+GROQ_KEEPALIVE = int(os.getenv("GROQ_KEEPALIVE_CONNECTIONS", "10"))
+GROQ_MAX_TOKENS = int(os.getenv("GROQ_MAX_TOKENS", "1024"))
+GROQ_MAX_TOKENS_CAP = int(os.getenv("GROQ_MAX_TOKENS_CAP", "8192"))  # ceiling for truncation retries
+
+# Large-input mode: sources above this many lines are converted per top-level unit
+CHUNK_MIN_LINES = int(os.getenv("CONVERT_CHUNK_MIN_LINES", "150"))
+CHUNK_CONCURRENCY = int(os.getenv("CONVERT_CHUNK_CONCURRENCY", "4"))
+CHUNK_RETRIES = int(os.getenv("CONVERT_CHUNK_RETRIES", "2"))
+# adjacent units are sent together up to this many estimated tokens per request ...
+CHUNK_TOKENS = int(os.getenv("CONVERT_CHUNK_TOKENS", "600"))
+# ... and the groups grow so one file needs at most this many requests (plus its header),
+# which by default the limiter's burst admits at once
+CHUNK_MAX_REQUESTS = int(os.getenv("CONVERT_CHUNK_MAX_REQUESTS", str(max(1, llm_limiter.burst - 1))))
+
+# validate_logic_with_mcp: per-run timeout of the execution tier
+VALIDATE_RUN_TIMEOUT = float(os.getenv("VALIDATE_RUN_TIMEOUT", "5"))
 
 # Choose your default Groq model
 # (Recommended: llama-3.1-70b or mixtral-8x7b)
 MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
 
-def _call_llm_system(messages, timeout=30):
-    """Call Groq chat model or return mock output."""
+# Bump whenever the conversion prompt changes so cached results are not reused
+PROMPT_VERSION = "convert-v2"
+# cache keys name every model a conversion may come from
+MODEL_TAG = MODEL + ("|" + FAST_MODEL if ROUTING_ENABLED and FAST_MODEL != MODEL else "")
+
+# Clients are created lazily and keep their HTTP connections alive between
+# calls. httpx async pools are bound to an event loop, so there is one
+# AsyncGroq per running loop (normally just daphne's).
+_client = None
+_client_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _pool_limits():
+    return httpx.Limits(max_connections=GROQ_MAX_CONNECTIONS,
+                        max_keepalive_connections=GROQ_KEEPALIVE)
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = Groq(
+                api_key=GROQ_KEY,
+                base_url=GROQ_BASE_URL,
+                max_retries=GROQ_MAX_RETRIES,
+                http_client=httpx.Client(limits=_pool_limits(), timeout=GROQ_TIMEOUT),
+            )
+        return _client
+
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncGroq(
+            api_key=GROQ_KEY,
+            base_url=GROQ_BASE_URL,
+            max_retries=GROQ_MAX_RETRIES,
+            http_client=httpx.AsyncClient(limits=_pool_limits(), timeout=GROQ_TIMEOUT),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def _record(messages, text, model=MODEL):
+    if GROQ_RECORD_FILE:
+        try:
+            record_completion(GROQ_RECORD_FILE, messages, model, text)
+        except OSError:
+            pass
+
+
+def _call_llm_system(messages, timeout=GROQ_TIMEOUT, max_tokens=GROQ_MAX_TOKENS, model=MODEL):
+    """Call Groq chat model or return mock output.
+
+    "truncated" is set when the reply stopped at max_tokens.
+    Raises LimiterBusy when the global LLM limiter cannot admit the call.
+    """
     if MOCK_MCP or not GROQ_KEY:
         time.sleep(0.2)
         return {"mock": True, "text": "MOCK: LLM placeholder"}
 
-    try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            temperature=0.0,
-            max_tokens=1024,
-        )
-        return {"mock": False, "text": response.choices[0].message.content.strip()}
-    except Exception as e:
-        return {"mock": True, "text": f"// Groq API error: {e}"}
+    with llm_limiter.sync_slot():
+        try:
+            response = get_client().chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0.0,
+                max_tokens=max_tokens,
+                timeout=timeout,
+            )
+            choice = response.choices[0]
+            _record(messages, choice.message.content, model)
+            return {"mock": False, "text": choice.message.content.strip(),
+                    "truncated": choice.finish_reason == "length", "model": model}
+        except Exception as e:
+            return {"mock": True, "text": f"// Groq API error: {e}", "error": str(e)}
 
 
-def convert_with_mcp(source_code: str, source_lang: str, target_lang: str):
-    """Convert source code between languages using Groq LLM."""
+async def _acall_llm_system(messages, timeout=GROQ_TIMEOUT, max_tokens=GROQ_MAX_TOKENS, model=MODEL):
+    """Async twin of _call_llm_system; never blocks the event loop."""
+    if MOCK_MCP or not GROQ_KEY:
+        await asyncio.sleep(0.2)
+        return {"mock": True, "text": "MOCK: LLM placeholder"}
+
+    async with llm_limiter.slot():
+        try:
+            response = await get_async_client().chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0.0,
+                max_tokens=max_tokens,
+                timeout=timeout,
+            )
+            choice = response.choices[0]
+            _record(messages, choice.message.content, model)
+            return {"mock": False, "text": choice.message.content.strip(),
+                    "truncated": choice.finish_reason == "length", "model": model}
+        except Exception as e:
+            return {"mock": True, "text": f"// Groq API error: {e}", "error": str(e)}
+
+
+def convert_with_mcp(source_code: str, source_lang: str, target_lang: str, use_cache: bool = True):
+    """Convert source code between languages using Groq LLM.
+
+    Results are cached by content (see cache.py); pass use_cache=False to
+    force a fresh upstream call. The returned dict carries a "cache" field
+    with "memory", "disk", "miss" or "bypass".
+    """
     if MOCK_MCP:
-        return {
-            "converted_code": f"// Mock: {source_lang} -> {target_lang} conversion",
-            "confidence": 0.7,
-            "notes": "mock conversion"
-        }
+        return _mock_conversion(source_lang, target_lang)
 
-    messages = [
+    key = make_key(source_code, source_lang, target_lang, MODEL_TAG, PROMPT_VERSION)
+    cached = _cache_lookup(key, use_cache)
+    if cached is not None:
+        return cached
+
+    def convert():
+        messages = _conversion_messages(source_code, source_lang, target_lang)
+        model, reason = route_model(source_code, source_lang, MODEL)
+        out = _call_llm_system(messages, model=model)
+        if _should_escalate(out, model, target_lang):
+            out = dict(_call_llm_system(messages), escalated=True)
+        out = _extend_truncated(messages, out)
+        return _finish_conversion(key, out, use_cache, route=reason)
+
+    # identical conversions already in flight share one upstream call
+    result, shared = conversions_in_flight.do(key, convert)
+    return dict(result, coalesced=shared)
+
+
+async def aconvert_with_mcp(source_code: str, source_lang: str, target_lang: str, use_cache: bool = True,
+                            chunked=None):
+    """Async version of convert_with_mcp used by the async views.
+
+    chunked=True forces large-input mode, False disables it and None picks it
+    automatically for sources longer than CHUNK_MIN_LINES, or for any source
+    whose reply is still truncated at GROQ_MAX_TOKENS_CAP.
+    """
+    if MOCK_MCP:
+        return _mock_conversion(source_lang, target_lang)
+
+    may_chunk = chunked is not False
+    if chunked is None:
+        chunked = source_code.count("\n") + 1 >= CHUNK_MIN_LINES
+    units = split_units(source_code, source_lang) if chunked else []
+    if sum(1 for u in units if u["kind"] != UNIT_HEADER) < 2:
+        units = []  # nothing worth splitting; one request is cheaper
+
+    version = PROMPT_VERSION + ("/chunked" if units else "")
+    key = make_key(source_code, source_lang, target_lang, MODEL_TAG, version)
+    cached = await _acache_lookup(key, use_cache)
+    if cached is not None:
+        return cached
+
+    async def convert():
+        if units:
+            return await _aconvert_units(key, units, source_lang, target_lang, use_cache)
+        messages = _conversion_messages(source_code, source_lang, target_lang)
+        model, reason = route_model(source_code, source_lang, MODEL)
+        out = await _acall_llm_system(messages, model=model)
+        if _should_escalate(out, model, target_lang):
+            out = dict(await _acall_llm_system(messages), escalated=True)
+        out = await _aextend_truncated(messages, out)
+        if out.get("truncated") and may_chunk:
+            # too long for one reply even at the cap: convert it piece by piece instead
+            parts = split_units(source_code, source_lang)
+            if sum(1 for u in parts if u["kind"] != UNIT_HEADER) >= 2:
+                return await _aconvert_units(key, parts, source_lang, target_lang, use_cache)
+        return await _afinish_conversion(key, out, use_cache, route=reason)
+
+    result, shared = await conversions_in_flight.ado(key, convert)
+    return dict(result, coalesced=shared)
+
+
+async def aconvert_incremental(source_code: str, source_lang: str, target_lang: str,
+                               previous_source: str, previous_converted: str, use_cache: bool = True):
+    """Re-convert only the definitions that changed since previous_source.
+
+    Changed and new definitions are translated and spliced into
+    previous_converted; unchanged ones are reused as-is. The target's header
+    (imports, package line ...) is then regenerated for the spliced code, so
+    a new definition's imports are added and a removed one's dropped. Falls
+    back to a full aconvert_with_mcp when the edit cannot be mapped onto the
+    previous translation (the reason is returned in "incremental_fallback").
+    """
+    if normalize_source(source_code) == normalize_source(previous_source):
+        return {"converted_code": previous_converted, "confidence": None, "notes": "unchanged since previous conversion",
+                "cache": "history", "incremental": {"changed": [], "added": [], "removed": [], "reused": "all"}}
+
+    new_units = split_units(source_code, source_lang)
+    plan, reason = plan_incremental(split_units(previous_source, source_lang), new_units,
+                                    split_units(previous_converted, target_lang)) if not MOCK_MCP else (None, "mock mode")
+    if plan is None:
+        result = await aconvert_with_mcp(source_code, source_lang, target_lang, use_cache=use_cache)
+        return dict(result, incremental=False, incremental_fallback=reason)
+
+    context = shared_context(new_units)
+    gate = asyncio.Semaphore(CHUNK_CONCURRENCY)
+
+    async def run(unit):
+        async with gate:
+            return await _aconvert_unit(unit, context, source_lang, target_lang, use_cache)
+
+    outcomes = await asyncio.gather(*(run(u) for u in plan["convert"]))
+    failed = [u["name"] for u, o in zip(plan["convert"], outcomes) if o["error"]]
+    if failed:
+        return {"status": "error", "message": "Groq API error: could not convert " + ", ".join(failed),
+                "converted_code": previous_converted, "notes": "incremental conversion failed"}
+
+    converted = {id(u): o["text"] for u, o in zip(plan["convert"], outcomes)}
+    target_units = split_units(previous_converted, target_lang)
+    header = None
+    if plan["convert"] or plan["delete"]:
+        body = apply_incremental(target_units, plan, converted, header="")
+        header_model, _ = route_model(context, source_lang, MODEL)
+        out = await _acall_llm_system(_header_messages(body, context, source_lang, target_lang), model=header_model)
+        if out.get("error"):
+            return {"status": "error", "message": f"Groq API error: {out['error']}",
+                    "converted_code": previous_converted, "notes": "incremental conversion failed"}
+        header = _strip_fences(out["text"])
+    return {
+        "converted_code": apply_incremental(target_units, plan, converted, header=header),
+        "confidence": None,
+        "notes": f"re-converted {len(plan['convert'])} changed definition(s), reused {plan['reused']}",
+        "cache": "incremental",
+        "incremental": {k: plan[k] for k in ("changed", "added", "removed", "reused")},
+    }
+
+
+async def astream_incremental(source_code, source_lang, target_lang, previous_source, previous_converted,
+                              use_cache=True):
+    """aconvert_incremental shaped like astream_convert's event stream."""
+    result = await aconvert_incremental(source_code, source_lang, target_lang,
+                                        previous_source, previous_converted, use_cache=use_cache)
+    if result.get("status") != "error":
+        yield {"type": "chunk", "text": result["converted_code"]}
+    yield dict(result, type="done")
+
+
+def _history_key(history_id):
+    return make_key(history_id, "history", "", "", "")
+
+
+def save_history(result, source_code, source_lang, target_lang):
+    """Remember a finished conversion so the client can refer back to it by history_id."""
+    if conversion_cache is None or result.get("status") == "error":
+        return None
+    history_id = make_key(source_code + "\0" + result.get("converted_code", ""), source_lang, target_lang,
+                          MODEL, "history")
+    conversion_cache.set(_history_key(history_id), {"source_code": source_code,
+                                                    "converted_code": result.get("converted_code", "")}, count=False)
+    return history_id
+
+
+def load_history(history_id):
+    """Return (previous_source, previous_converted) for a history_id, or (None, None)."""
+    if conversion_cache is None or not history_id:
+        return None, None
+    entry, _ = conversion_cache.get(_history_key(history_id), count=False)
+    if entry is None:
+        return None, None
+    return entry["source_code"], entry["converted_code"]
+
+
+async def _aconvert_units(key, units, source_lang, target_lang, use_cache):
+    """Large-input mode: convert groups of units in parallel, stitch them, then add a header."""
+    context = shared_context(units)
+    body = [u for u in units if u["kind"] != UNIT_HEADER]
+    size = sum(len(u["text"]) for u in body)
+    # estimate_tokens() counts four characters per token
+    body_units = group_units(body, max(CHUNK_TOKENS * 4, -(-size // max(1, CHUNK_MAX_REQUESTS))))
+    gate = asyncio.Semaphore(CHUNK_CONCURRENCY)
+
+    async def run(unit):
+        async with gate:
+            return await _aconvert_unit(unit, context, source_lang, target_lang, use_cache)
+
+    outcomes = await asyncio.gather(*(run(u) for u in body_units))
+    failed = [u["name"] or f"unit {i + 1}" for i, (u, o) in enumerate(zip(body_units, outcomes)) if o["error"]]
+    if failed:
+        error = "could not convert " + ", ".join(failed)
+        return await _afinish_conversion(key, {"mock": True, "text": "", "error": error}, use_cache)
+
+    body = "\n\n".join(o["text"] for o in outcomes if o["text"])
+    # the header is a short, mechanical list of imports: the fast model is enough
+    header_model, _ = route_model(context, source_lang, MODEL)
+    header = await _acall_llm_system(_header_messages(body, context, source_lang, target_lang), model=header_model)
+    if header.get("error"):
+        return await _afinish_conversion(key, header, use_cache)
+    header_text = _strip_fences(header["text"])
+
+    retried = sum(o["attempts"] - 1 for o in outcomes)
+    return await _afinish_conversion(key, {"mock": False, "text": (header_text + "\n\n" + body).strip()}, use_cache,
+                                     notes=f"converted via Groq/OpenAI in {len(body_units)} chunks ({retried} retried)",
+                                     chunks=len(body_units), model=_summarize_models(o["model"] for o in outcomes),
+                                     escalated=sum(o["escalated"] for o in outcomes))
+
+
+async def _aconvert_unit(unit, context, source_lang, target_lang, use_cache):
+    """Convert one unit, retrying only when it fails or comes back truncated.
+
+    Units routed to the fast model move to the large one on the first
+    failure or when the reply does not pass looks_valid().
+    """
+    key = make_key(context + "\0" + unit["text"], source_lang, target_lang, MODEL_TAG, PROMPT_VERSION + "/unit")
+    cached = await _acache_lookup(key, use_cache)
+    if cached is not None:
+        return {"text": cached["converted_code"], "error": None, "attempts": 1,
+                "model": cached.get("model", MODEL), "escalated": False}
+
+    model, _ = route_model(unit["text"], source_lang, MODEL)
+    escalated = False
+    # room for a reply somewhat longer than the part itself
+    max_tokens = min(GROQ_MAX_TOKENS_CAP, max(GROQ_MAX_TOKENS, 2 * estimate_tokens(unit["text"])))
+    messages = _unit_messages(unit, context, source_lang, target_lang)
+    out = {}
+    attempt = 0
+    while attempt <= CHUNK_RETRIES:
+        out = await _acall_llm_system(messages, max_tokens=max_tokens, model=model)
+        if _should_escalate(out, model, target_lang):
+            model, escalated = MODEL, True  # does not use up a retry
+            continue
+        attempt += 1
+        if not out.get("error") and not out.get("truncated"):
+            text = _strip_fences(out["text"])
+            if conversion_cache is not None and not out["mock"]:
+                await conversion_cache.aset(key, {"converted_code": text, "model": model})
+            return {"text": text, "error": None, "attempts": attempt, "model": model, "escalated": escalated}
+        if out.get("truncated"):
+            max_tokens = min(max_tokens * 2, GROQ_MAX_TOKENS_CAP)
+    return {"text": "", "error": out.get("error") or "truncated", "attempts": CHUNK_RETRIES + 1,
+            "model": model, "escalated": escalated}
+
+
+def _unit_messages(unit, context, source_lang, target_lang):
+    return [
+        {"role": "system", "content": (
+            "You are a professional code translator. "
+            "You convert one part of a larger file at a time, "
+            "preserving logic, structure, and names. "
+            "Return only the converted code."
+        )},
+        {"role": "user", "content": (
+            f"This is one part of a larger {source_lang} file being converted to {target_lang}.\n"
+            f"Imports and top-level signatures of the whole file, for reference:\n"
+            f"```{source_lang}\n{context}\n```\n\n"
+            f"Convert ONLY the part below. Do not repeat imports, package declarations "
+            f"or definitions from other parts.\n\n"
+            f"```{source_lang}\n{compact_source(unit['text'], source_lang).strip()}\n```"
+        )}
+    ]
+
+
+def _header_messages(body, context, source_lang, target_lang):
+    return [
+        {"role": "system", "content": "You are a professional code translator. Return only code."},
+        {"role": "user", "content": (
+            f"The {target_lang} code below was converted from a {source_lang} file with this header:\n"
+            f"```{source_lang}\n{context}\n```\n\n"
+            f"Return ONLY the lines that must appear at the top of the {target_lang} file "
+            f"(package declaration, imports, includes, using directives), nothing else. "
+            f"Return an empty code block if none are needed.\n\n"
+            f"```{target_lang}\n{body}\n```"
+        )}
+    ]
+
+
+async def astream_convert(source_code: str, source_lang: str, target_lang: str, use_cache: bool = True):
+    """Stream a conversion as it is generated.
+
+    Yields {"type": "chunk", "text": ...} events with fence-stripped code as
+    Groq produces it, then one {"type": "done", ...} event carrying the same
+    fields convert_with_mcp returns. Cache hits arrive as a single chunk.
+    A {"type": "reset"} event means the fast model's draft was rejected and
+    the chunks that follow replace everything streamed so far.
+    """
+    if MOCK_MCP or not GROQ_KEY:
+        result = await aconvert_with_mcp(source_code, source_lang, target_lang, use_cache=use_cache)
+        yield {"type": "chunk", "text": result["converted_code"]}
+        yield dict(result, type="done")
+        return
+
+    key = make_key(source_code, source_lang, target_lang, MODEL_TAG, PROMPT_VERSION)
+    cached = await _acache_lookup(key, use_cache)
+    if cached is not None:
+        yield {"type": "chunk", "text": cached["converted_code"]}
+        yield dict(cached, type="done")
+        return
+
+    # join an identical conversion that is already running, streamed or not
+    while True:
+        call, leader = conversions_in_flight.join(key)
+        if leader:
+            break
+        try:
+            result = await conversions_in_flight.wait(call)
+        except LeaderGone:
+            continue
+        yield {"type": "chunk", "text": result["converted_code"]}
+        yield dict(result, type="done", coalesced=True)
+        return
+
+    try:
+        model, reason = route_model(source_code, source_lang, MODEL)
+        escalated = False
+        result = None
+        while result is None:
+            async for event in _astream_completion(source_code, source_lang, target_lang, model):
+                if event["type"] == "chunk":
+                    yield event
+                elif _should_escalate(event, model, target_lang):
+                    # the fast model's attempt did not hold up; start over on the large one
+                    model, escalated = MODEL, True
+                    yield {"type": "reset"}
+                else:
+                    out = dict(event, escalated=escalated)
+                    if out.get("truncated"):
+                        # cut off at max_tokens: redo it with a larger budget and resend it whole
+                        out = await _aextend_truncated(_conversion_messages(source_code, source_lang, target_lang),
+                                                       out)
+                        yield {"type": "reset"}
+                        yield {"type": "chunk", "text": _strip_fences(out["text"])}
+                    result = await _afinish_conversion(key, out, use_cache, route=reason)
+    except BaseException as e:
+        conversions_in_flight.fail(key, call, e)
+        raise
+    conversions_in_flight.finish(key, call, result)
+    yield dict(result, type="done", coalesced=False)
+
+
+async def _astream_completion(source_code, source_lang, target_lang, model=MODEL):
+    """Yield fence-stripped chunks, then a final {"type": "done", ...} like _call_llm_system's reply."""
+    stripper = FenceStripper()
+    parts = []
+    error = None
+    truncated = False
+    async with llm_limiter.slot():
+        try:
+            stream = await get_async_client().chat.completions.create(
+                model=model,
+                messages=_conversion_messages(source_code, source_lang, target_lang),
+                temperature=0.0,
+                max_tokens=GROQ_MAX_TOKENS,
+                stream=True,
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content or ""
+                truncated = truncated or chunk.choices[0].finish_reason == "length"
+                parts.append(delta)
+                visible = stripper.feed(delta)
+                if visible:
+                    yield {"type": "chunk", "text": visible}
+        except Exception as e:
+            error = e
+
+    if error is not None:
+        text = f"// Groq API error: {error}"
+        yield {"type": "chunk", "text": text}
+        yield {"type": "done", "mock": True, "text": text, "error": str(error) or type(error).__name__,
+               "model": model}
+        return
+
+    tail = stripper.finish()
+    if tail:
+        yield {"type": "chunk", "text": tail}
+    _record(_conversion_messages(source_code, source_lang, target_lang), "".join(parts), model)
+    yield {"type": "done", "mock": False, "text": "".join(parts).strip(), "truncated": truncated, "model": model}
+
+
+class FenceStripper:
+    """Incremental version of _strip_fences for streamed completions.
+
+    Text is released as soon as it cannot be part of the opening fence line
+    or a closing fence; only a short whitespace/backtick tail is held back.
+    Concatenating every feed() and the finish() output gives the same result
+    as _strip_fences() on the whole reply.
+    """
+
+    _HOLD = re.compile(r"\s*`{0,3}\s*$")
+
+    def __init__(self):
+        self._pending = ""
+        self._started = False
+
+    def feed(self, text: str) -> str:
+        self._pending += text
+        if not self._started:
+            head = self._pending.lstrip()
+            # still possibly inside an opening ```lang line
+            if "\n" not in head and re.match(r"^(`{0,2}|```[a-zA-Z]*)$", head):
+                return ""
+            self._pending = re.sub(r"^```[a-zA-Z]*\n", "", head)
+            self._started = True
+
+        cut = self._HOLD.search(self._pending).start()
+        out, self._pending = self._pending[:cut], self._pending[cut:]
+        return out
+
+    def finish(self) -> str:
+        tail, self._pending = self._pending, ""
+        if not self._started:
+            return _strip_fences(tail)
+        tail = re.sub(r"```$", "", tail.rstrip()).rstrip()
+        return tail if tail.strip() else ""
+
+
+def _mock_conversion(source_lang, target_lang):
+    return {
+        "converted_code": f"// Mock: {source_lang} -> {target_lang} conversion",
+        "confidence": 0.7,
+        "notes": "mock conversion"
+    }
+
+
+def _conversion_messages(source_code, source_lang, target_lang):
+    return [
         {"role": "system", "content": (
             "You are a professional code translator. "
             "Convert the user's code from one language to another "
@@ -53,29 +581,208 @@ def convert_with_mcp(source_code: str, source_lang: str, target_lang: str):
         {"role": "user", "content": (
             f"Convert this {source_lang} code into {target_lang}. "
             f"Ensure logical equivalence and runnable syntax.\n\n"
-            f"```{source_lang}\n{source_code}\n```"
+            f"```{source_lang}\n{compact_source(source_code, source_lang)}\n```"
         )}
     ]
 
-    out = _call_llm_system(messages)
-    text = out["text"]
 
-    cleaned = re.sub(r"^```[a-zA-Z]*\n", "", text.strip())   # remove ```go or ```python at start
+def _should_escalate(out, model, target_lang):
+    """True when a fast-model reply should be redone on the large model."""
+    if model == MODEL or (out.get("mock") and not out.get("error")):
+        return False
+    if out.get("error") or out.get("truncated") or not looks_valid(_strip_fences(out["text"]), target_lang):
+        note_escalation()
+        return True
+    return False
+
+
+def _extend_truncated(messages, out):
+    """Redo a reply cut off at max_tokens with twice the budget each time, up to GROQ_MAX_TOKENS_CAP."""
+    max_tokens = GROQ_MAX_TOKENS
+    while out.get("truncated") and max_tokens < GROQ_MAX_TOKENS_CAP:
+        max_tokens = min(max_tokens * 2, GROQ_MAX_TOKENS_CAP)
+        out = dict(_call_llm_system(messages, max_tokens=max_tokens, model=out.get("model", MODEL)),
+                   escalated=out.get("escalated", False))
+    return out
+
+
+async def _aextend_truncated(messages, out):
+    """Async twin of _extend_truncated."""
+    max_tokens = GROQ_MAX_TOKENS
+    while out.get("truncated") and max_tokens < GROQ_MAX_TOKENS_CAP:
+        max_tokens = min(max_tokens * 2, GROQ_MAX_TOKENS_CAP)
+        out = dict(await _acall_llm_system(messages, max_tokens=max_tokens, model=out.get("model", MODEL)),
+                   escalated=out.get("escalated", False))
+    return out
+
+
+def _summarize_models(models):
+    models = set(models)
+    return models.pop() if len(models) == 1 else "mixed"
+
+
+def _cache_lookup(key, use_cache):
+    if conversion_cache is None:
+        return None
+    if not use_cache:
+        conversion_cache.note_bypass()
+        return None
+    cached, tier = conversion_cache.get(key)
+    if cached is None:
+        return None
+    return dict(cached, cache=tier)
+
+
+async def _acache_lookup(key, use_cache):
+    """_cache_lookup for the event loop: only a memory miss leaves it, to read the disk tier."""
+    if conversion_cache is None:
+        return None
+    if not use_cache:
+        conversion_cache.note_bypass()
+        return None
+    cached, tier = await conversion_cache.aget(key)
+    if cached is None:
+        return None
+    return dict(cached, cache=tier)
+
+
+async def _afinish_conversion(key, out, use_cache, notes="converted via Groq/OpenAI", **extra):
+    """_finish_conversion off the event loop: storing a result writes the disk tier."""
+    return await asyncio.to_thread(_finish_conversion, key, out, use_cache, notes, **extra)
+
+
+def _finish_conversion(key, out, use_cache, notes="converted via Groq/OpenAI", **extra):
+    result = dict({"converted_code": _strip_fences(out["text"]), "confidence": None, "notes": notes}, **extra)
+    result.setdefault("model", out.get("model", MODEL))
+    result.setdefault("escalated", bool(out.get("escalated")))
+    if out.get("error"):
+        result.update(status="error", message=f"Groq API error: {out['error']}")
+    if out.get("truncated"):
+        result.update(truncated=True,
+                      notes=f"{notes}; the reply was cut off at {GROQ_MAX_TOKENS_CAP} tokens, the code is incomplete")
+
+    # only complete, real completions are cached; errors and placeholders come back as mock
+    if conversion_cache is not None and not out["mock"] and not out.get("truncated"):
+        conversion_cache.set(key, result)
+
+    if conversion_cache is None:
+        return dict(result, cache="disabled")
+    return dict(result, cache="miss" if use_cache else "bypass")
+
+
+def _strip_fences(text: str) -> str:
+    """Remove a surrounding markdown code fence from an LLM reply."""
+    cleaned = re.sub(r"^```[a-zA-Z]*(\n|$)", "", text.strip())   # remove ```go or ```python at start
     cleaned = re.sub(r"```$", "", cleaned).strip()            # remove ending ```
-    
-    return {"converted_code": cleaned, "confidence": None, "notes": "converted via Groq/OpenAI"}
+    return cleaned
+
+
+async def avalidate_logic_with_mcp(original_code, converted_code, original_lang, converted_lang,
+                                   inputs=None, mode="exact", **compare):
+    """Check that original and converted code are logically equivalent, cheapest evidence first.
+
+    Tier 1 runs both programs on `inputs` (stdin strings; without them only
+    a program that does not read stdin is run, on empty input) through
+    difftest.adiff_test and compares exit codes and outputs with mcp_tools
+    (mode / float_tolerance / ignore_order). Identical results decide
+    "consistent"; a difference that the original reproduces on a second run
+    decides "inconsistent", as does a converted program that does not build.
+    Only when execution is impossible or inconclusive (language not runnable
+    here, no inputs for a program that needs them, original does not build,
+    fails or times out, no capacity, nondeterministic output) is the LLM
+    asked.
+
+    Returns {"logic_consistent", "tier": "execution"|"llm", "original_output",
+    "converted_output", "notes", "execution"}, plus "escalation_reason" when
+    the LLM decided; logic_consistent is None if its reply could not be read.
+    """
+    compare = dict(compare, mode=mode)
+    try:
+        verdict, reason, execution = await _execution_verdict(original_code, converted_code, original_lang,
+                                                              converted_lang, inputs, compare)
+    except LimiterBusy as e:
+        verdict, reason, execution = None, f"no execution capacity: {e}", None
+    except Exception as e:
+        # e.g. a toolchain missing on this host
+        verdict, reason, execution = None, f"execution failed: {e}", None
+    if reason is None:
+        return dict(verdict, tier="execution", execution=execution)
+    verdict = await _llm_verdict(original_code, converted_code, original_lang, converted_lang)
+    return dict(verdict, tier="llm", escalation_reason=reason, execution=execution)
+
+
+def validate_logic_with_mcp(original_code, converted_code, original_lang, converted_lang, inputs=None,
+                            mode="exact", **compare):
+    """Blocking form of avalidate_logic_with_mcp for sync callers."""
+    return async_to_sync(avalidate_logic_with_mcp)(original_code, converted_code, original_lang, converted_lang,
+                                                   inputs=inputs, mode=mode, **compare)
 
 
-def validate_logic_with_mcp(original_code, converted_code, original_lang, converted_lang):
-    """Validate if original and converted code are logically equivalent."""
+async def _execution_verdict(original_code, converted_code, original_lang, converted_lang, inputs, compare):
+    """(verdict, None, summary) when running the programs settles it, else (None, reason, summary)."""
+    if not inputs:
+        if reads_stdin(original_lang, original_code):
+            return None, "original program reads stdin and no inputs were given", None
+        inputs = [""]
+    report = await adiff_test(original_lang, original_code, converted_lang, converted_code, inputs,
+                              timeout=VALIDATE_RUN_TIMEOUT, early_exit=True, compare=compare)
+    source, converted = report["compile"]["source"], report["compile"]["converted"]
+    summary = {key: report[key] for key in ("passed", "failed", "errors", "skipped", "total_ms")}
+    if source["unsupported"] or converted["unsupported"]:
+        return None, "language cannot be run here", summary
+    if not source["ok"]:
+        return None, "original program does not build", summary
+    if not converted["ok"]:
+        if converted["timed_out"]:
+            return None, "converted program build timed out", summary
+        return _decided(False, "", "", "converted program does not build:\n"
+                        + (converted["compile_error"] or "")[:512]), None, summary
+
+    # the original must run cleanly for its behaviour to be the reference
+    for vector in sorted(report["vectors"], key=lambda v: v["index"]):
+        if vector["status"] == "error":
+            return None, f"input {vector['index']}: {vector['reason']}", summary
+        original = vector.get("source")
+        if original is None:
+            continue  # skipped after an earlier failure
+        if original["timed_out"]:
+            return None, f"input {vector['index']}: original program timed out", summary
+        if original["exit_code"] != 0:
+            reason = f"input {vector['index']}: original program exited with status {original['exit_code']}"
+            return None, reason, summary
+
+    if report["all_passed"]:
+        first = report["vectors"][0]
+        return _decided(True, first["source"]["stdout"], first["converted"]["stdout"],
+                        f"identical output on {len(inputs)} input(s)"), None, summary
+    bad = min((v for v in report["vectors"] if v["status"] not in ("pass", "skipped")), key=lambda v: v["index"])
+    if bad["reason"] == "timed out":
+        return None, f"input {bad['index']}: {bad['reason']}", summary
+
+    # a difference only counts if the original reproduces its own output
+    try:
+        probe = await adiff_test(original_lang, original_code, original_lang, original_code,
+                                 [inputs[bad["index"]]], timeout=VALIDATE_RUN_TIMEOUT, compare=compare)
+    except LimiterBusy as e:
+        return None, f"no execution capacity: {e}", summary
+    if not probe["all_passed"]:
+        return None, "original program output is not deterministic", summary
+    notes = f"input {bad['index']}: {bad['reason']}"
+    if bad.get("diff_preview"):
+        notes += "\n" + bad["diff_preview"]
+    return _decided(False, bad["source"]["stdout"], bad["converted"]["stdout"], notes), None, summary
+
+
+def _decided(consistent, original_output, converted_output, notes):
+    return {"logic_consistent": consistent, "original_output": original_output,
+            "converted_output": converted_output, "notes": notes}
+
+
+async def _llm_verdict(original_code, converted_code, original_lang, converted_lang):
+    """Ask the LLM to judge equivalence from the source alone."""
     if MOCK_MCP:
         ok = "print" in original_code or "println" in converted_code
-        return {
-            "logic_consistent": bool(ok),
-            "original_output": "mock output",
-            "converted_output": "mock output",
-            "notes": "mock validation"
-        }
+        return _decided(bool(ok), "mock output", "mock output", "mock validation")
 
     messages = [
         {"role": "system", "content": (
@@ -90,27 +797,44 @@ def validate_logic_with_mcp(original_code, converted_code, original_lang, conver
         )}
     ]
 
-    out = _call_llm_system(messages)
-    text = out["text"]
+    out = await _acall_llm_system(messages)
+    return _decided(_parse_judgement(out["text"]), "not executed", "not executed", out["text"][:512])
+
 
+def _parse_judgement(text):
+    """logic_consistent from the LLM reply (JSON, possibly fenced or wrapped in prose), or None."""
+    cleaned = _strip_fences(text)
+    match = re.search(r"\{.*\}", cleaned, re.S)
     try:
-        parsed = json.loads(text)
-        return parsed
-    except Exception:
-        return {
-            "logic_consistent": "true" in text.lower(),
-            "original_output": "execution simulated",
-            "converted_output": "execution simulated",
-            "notes": text[:512],
-        }
+        value = json.loads(match.group(0) if match else cleaned).get("logic_consistent")
+    except (ValueError, AttributeError):
+        value = None
+    if isinstance(value, bool):
+        return value
+    match = re.search(r"logic_consistent\W*(true|false)", text, re.I)
+    return match.group(1).lower() == "true" if match else None
 
 
 def refine_with_feedback(converted_code: str, feedback: str, source_lang: str, target_lang: str):
     """Refine converted code based on user feedback."""
     if MOCK_MCP:
-        return {"converted_code": converted_code + "\n// Refined (mock feedback)", "notes": "mock refine"}
+        return {"converted_code": converted_code + "\n// Refined (mock feedback)", "notes": "mock refine", "mock": True}
 
-    messages = [
+    out = _call_llm_system(_refine_messages(converted_code, feedback, target_lang))
+    return {"converted_code": out["text"].strip(), "notes": "refined via Groq LLM", "mock": out["mock"]}
+
+
+async def arefine_with_feedback(converted_code: str, feedback: str, source_lang: str, target_lang: str):
+    """Async version of refine_with_feedback."""
+    if MOCK_MCP:
+        return {"converted_code": converted_code + "\n// Refined (mock feedback)", "notes": "mock refine", "mock": True}
+
+    out = await _acall_llm_system(_refine_messages(converted_code, feedback, target_lang))
+    return {"converted_code": out["text"].strip(), "notes": "refined via Groq LLM", "mock": out["mock"]}
+
+
+def _refine_messages(converted_code, feedback, target_lang):
+    return [
         {"role": "system", "content": "You are a precise code editor that refines code based on user feedback."},
         {"role": "user", "content": (
             f"Here is the {target_lang} code that needs refining based on feedback.\n\n"
@@ -119,6 +843,3 @@ def refine_with_feedback(converted_code: str, feedback: str, source_lang: str, t
             "Return the full corrected code."
         )}
     ]
-
-    out = _call_llm_system(messages)
-    return {"converted_code": out["text"].strip(), "notes": "refined via Groq LLM"}
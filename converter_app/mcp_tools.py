@@ -1,52 +1,151 @@
 """
 MCP Logic Validation Tool
-Performs multi-step verification of two code outputs and ensures logic consistency.
+Compares two program outputs line by line in a single pass and stops at the
+first divergence; a short diff preview is built only on mismatch.
+
+Modes:
+  exact      - lines must match, ignoring line endings, trailing whitespace
+               and trailing blank lines
+  whitespace - lines are compared as whitespace-separated tokens, blank lines ignored
+  numeric    - like whitespace, but numeric tokens may differ by float_tolerance
+               (relative, or absolute below 1)
+ignore_order compares the lines as a multiset instead; that needs every line
+in memory, so it does not stop early.
+
+Outputs may be strings or any iterable of lines (e.g. an open file), so
+large captured outputs are never copied whole.
 """
 
-import difflib
-import time
+import io
+import itertools
+import math
+from collections import deque
 
+MODES = ("exact", "whitespace", "numeric")
+DEFAULT_FLOAT_TOLERANCE = 1e-6
+DIFF_PREVIEW_CHARS = 400
+CONTEXT_LINES = 2
+_LINE_PREVIEW = 120
+
+
+def _lines(output):
+    """(line number, text) without line endings; trailing blank lines are dropped lazily."""
+    source = io.StringIO(output) if isinstance(output, str) else output
+    blanks = []
+    for number, line in enumerate(source, 1):
+        line = line.rstrip()
+        if not line:
+            blanks.append((number, line))
+            continue
+        yield from blanks
+        blanks.clear()
+        yield number, line
+
+
+def _keyed(output, mode):
+    for number, line in _lines(output):
+        if mode == "exact":
+            yield number, line, line
+            continue
+        tokens = line.split()
+        if tokens:
+            yield number, line, tokens
+
+
+def _number(token):
+    try:
+        value = float(token)
+    except ValueError:
+        return None
+    return value if math.isfinite(value) else None
 
-def deep_compare_outputs(output1: str, output2: str) -> dict:
-    """
-    Compares outputs twice to ensure stability.
-    """
-    # Pass 1: direct comparison
-    match_direct = output1.strip() == output2.strip()
 
-    # Pass 2: normalized comparison (remove spaces, newlines)
-    norm1 = output1.replace(" ", "").replace("\n", "")
-    norm2 = output2.replace(" ", "").replace("\n", "")
-    match_normalized = norm1 == norm2
+def _same(key_a, key_b, mode, tolerance):
+    if mode != "numeric":
+        return key_a == key_b
+    if len(key_a) != len(key_b):
+        return False
+    for a, b in zip(key_a, key_b):
+        if a == b:
+            continue
+        x, y = _number(a), _number(b)
+        if x is None or y is None or abs(x - y) > tolerance * max(1.0, abs(x), abs(y)):
+            return False
+    return True
 
-    # Optional: semantic diff (for debugging)
-    diff = "\n".join(difflib.unified_diff(
-        output1.splitlines(), output2.splitlines(),
-        lineterm="", fromfile="original", tofile="converted"
-    ))
 
-    consistent = match_direct and match_normalized
+def _sort_key(key, mode, tolerance):
+    if mode != "numeric":
+        return key
+    digits = max(1, round(-math.log10(tolerance))) if tolerance > 0 else 17
+    return [f"{v:.{digits}g}" if (v := _number(t)) is not None else t for t in key]
 
-    return {
-        "match_direct": match_direct,
-        "match_normalized": match_normalized,
-        "consistent": consistent,
-        "diff_preview": diff[:400]
-    }
 
+def _clip(text):
+    return text if len(text) <= _LINE_PREVIEW else text[:_LINE_PREVIEW] + "…"
 
-def verify_logic(original_output: str, converted_output: str) -> bool:
+
+def _preview(lines):
+    preview = "\n".join(lines)
+    return preview if len(preview) <= DIFF_PREVIEW_CHARS else preview[:DIFF_PREVIEW_CHARS] + "…"
+
+
+def deep_compare_outputs(output1, output2, mode: str = "exact", float_tolerance: float = DEFAULT_FLOAT_TOLERANCE,
+                         ignore_order: bool = False) -> dict:
     """
-    Performs multiple passes of validation to ensure correctness.
+    Compare original (output1) and converted (output2) output.
+
+    Returns {"consistent", "mode", "ignore_order", "lines_compared",
+    "first_difference": None or {"line", "original", "converted"}, "diff_preview"}.
     """
-    print("[MCP] Starting multi-pass verification...")
-    results = []
+    if mode not in MODES:
+        raise ValueError(f"Unknown comparison mode: {mode}")
+    result = {"consistent": True, "mode": mode, "ignore_order": ignore_order, "lines_compared": 0,
+              "first_difference": None, "diff_preview": ""}
+    if ignore_order:
+        return _compare_unordered(output1, output2, mode, float_tolerance, result)
+
+    context = deque(maxlen=CONTEXT_LINES)
+    for a, b in itertools.zip_longest(_keyed(output1, mode), _keyed(output2, mode)):
+        if a is not None and b is not None and _same(a[2], b[2], mode, float_tolerance):
+            result["lines_compared"] += 1
+            context.append(a[1])
+            continue
+        number = (a or b)[0]
+        original = None if a is None else a[1]
+        converted = None if b is None else b[1]
+        diff = ["--- original", "+++ converted", f"@@ line {number} @@"]
+        diff += [f" {_clip(line)}" for line in context]
+        diff.append("-" + (_clip(original) if original is not None else " <end of output>"))
+        diff.append("+" + (_clip(converted) if converted is not None else " <end of output>"))
+        result.update(consistent=False, diff_preview=_preview(diff),
+                      first_difference={"line": number, "original": original, "converted": converted})
+        break
+    return result
 
-    for i in range(2):
-        res = deep_compare_outputs(original_output, converted_output)
-        results.append(res)
-        print(f"[MCP] Pass {i+1}: consistent={res['consistent']}")
-        time.sleep(0.2)
 
-    # Require both passes to agree on consistency
-    return all(r["consistent"] for r in results)
+def _compare_unordered(output1, output2, mode, tolerance, result):
+    lines_a = sorted(_keyed(output1, mode), key=lambda item: _sort_key(item[2], mode, tolerance))
+    lines_b = sorted(_keyed(output2, mode), key=lambda item: _sort_key(item[2], mode, tolerance))
+    for a, b in itertools.zip_longest(lines_a, lines_b):
+        if a is not None and b is not None and _same(a[2], b[2], mode, tolerance):
+            result["lines_compared"] += 1
+            continue
+        original = None if a is None else a[1]
+        converted = None if b is None else b[1]
+        diff = ["--- original (sorted)", "+++ converted (sorted)",
+                "-" + (_clip(original) if original is not None else " <no more lines>"),
+                "+" + (_clip(converted) if converted is not None else " <no more lines>")]
+        result.update(consistent=False, diff_preview=_preview(diff),
+                      first_difference={"line": None, "original": original, "converted": converted})
+        break
+    return result
+
+
+def verify_logic(original_output, converted_output, mode: str = "exact", **options) -> bool:
+    """
+    Verifies that the converted program printed what the original did.
+    """
+    res = deep_compare_outputs(original_output, converted_output, mode=mode, **options)
+    print(f"[MCP] Verification ({mode}): consistent={res['consistent']}")
+    return res["consistent"]
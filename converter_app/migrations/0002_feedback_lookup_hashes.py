@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:17
+
+import hashlib
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+# frozen copies of converter_app.models.code_hash / feedback_hash as of this migration
+def code_hash(code):
+    lines = (code or "").replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return hashlib.sha256("\n".join(line.rstrip() for line in lines).strip("\n").encode("utf-8")).hexdigest()
+
+
+def feedback_hash(text):
+    return hashlib.sha256(" ".join((text or "").split()).encode("utf-8")).hexdigest()
+
+
+def fill_hashes(apps, schema_editor):
+    Feedback = apps.get_model('converter_app', 'Feedback')
+    batch = []
+    for row in Feedback.objects.only('id', 'previous_code', 'feedback_text').iterator(chunk_size=BATCH_SIZE):
+        row.previous_code_hash = code_hash(row.previous_code)
+        row.feedback_hash = feedback_hash(row.feedback_text)
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            Feedback.objects.bulk_update(batch, ['previous_code_hash', 'feedback_hash'])
+            batch = []
+    if batch:
+        Feedback.objects.bulk_update(batch, ['previous_code_hash', 'feedback_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('converter_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedback',
+            name='feedback_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='feedback',
+            name='previous_code_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['previous_code_hash', 'feedback_hash', 'source_lang', 'target_lang'], name='feedback_lookup_idx'),
+        ),
+        migrations.RunPython(fill_hashes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,225 @@
+# backend/converter_app/mock_groq.py
+"""
+Local stand-in for the Groq (OpenAI-compatible) chat completions API.
+
+Point the connector at it with GROQ_BASE_URL=http://127.0.0.1:8088 and any
+GROQ_API_KEY to load-test conversion, validation and refinement offline:
+
+    python manage.py mock_groq --port 8088 --latency lognormal:250,0.5 \
+        --tokens-per-second 300 --rate-429 0.05 --replay recordings.jsonl
+
+Replies come from a recordings file when a request's messages match one
+(GROQ_RECORD_FILE makes the connector write such a file from real traffic);
+otherwise the last fenced code block of the prompt is echoed back, which is
+a realistic size and shape for conversions. Latency, streaming pace,
+injected 429s and hung requests are all configurable.
+"""
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CODE_BLOCK_RE = re.compile(r"```[\w+#-]*\n(.*?)```", re.S)
+
+
+def message_key(messages) -> str:
+    """Stable hash of a chat request's messages, shared by recorder and replayer."""
+    payload = json.dumps([[m.get("role", ""), m.get("content", "")] for m in messages], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+_record_lock = threading.Lock()
+
+
+def record_completion(path, messages, model, text):
+    """Append one completion to a JSONL recordings file."""
+    line = json.dumps({"key": message_key(messages), "model": model, "text": text}, ensure_ascii=False)
+    with _record_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class Latency:
+    """Samples delays in seconds from a spec like "fixed:200", "uniform:100,400",
+    "normal:250,50" or "lognormal:250,0.5" (milliseconds; lognormal takes the
+    median and sigma)."""
+
+    def __init__(self, spec="fixed:0"):
+        kind, _, args = spec.partition(":")
+        self.kind = kind.strip().lower()
+        self.args = [float(a) for a in args.split(",") if a.strip()] or [0.0]
+        if self.kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {kind}")
+
+    def sample(self) -> float:
+        a = self.args
+        if self.kind == "uniform":
+            ms = random.uniform(a[0], a[1] if len(a) > 1 else a[0])
+        elif self.kind == "normal":
+            ms = random.gauss(a[0], a[1] if len(a) > 1 else 0.0)
+        elif self.kind == "lognormal":
+            ms = random.lognormvariate(0.0, a[1] if len(a) > 1 else 0.0) * a[0]
+        else:
+            ms = a[0]
+        return max(0.0, ms) / 1000.0
+
+
+class MockGroqConfig:
+    def __init__(self, latency="fixed:0", tokens_per_second=0.0, rate_429=0.0, rate_timeout=0.0,
+                 hang_seconds=120.0, replay=None):
+        self.latency = Latency(latency)
+        self.tokens_per_second = tokens_per_second
+        self.rate_429 = rate_429
+        self.rate_timeout = rate_timeout
+        self.hang_seconds = hang_seconds
+        self.recordings = {}
+        if replay:
+            with open(replay, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.recordings[entry["key"]] = entry["text"]
+        self.counters = {"requests": 0, "replayed": 0, "echoed": 0, "rejected_429": 0, "hung": 0}
+        self._lock = threading.Lock()
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def reply_for(self, messages) -> str:
+        text = self.recordings.get(message_key(messages))
+        if text is not None:
+            self.count("replayed")
+            return text
+        self.count("echoed")
+        prompt = messages[-1].get("content", "") if messages else ""
+        blocks = CODE_BLOCK_RE.findall(prompt)
+        code = blocks[-1] if blocks else prompt
+        return f"```\n{code.rstrip()}\n```"
+
+    def generation_delay(self, tokens) -> float:
+        return tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+
+
+class MockGroqHandler(BaseHTTPRequestHandler):
+    server_version = "MockGroq/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def config(self) -> MockGroqConfig:
+        return self.server.config
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            return self._json(200, {"object": "list", "data": [{"id": "mock", "object": "model"}]})
+        if self.path.rstrip("/").endswith("/stats"):
+            return self._json(200, self.config.counters)
+        self._json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._json(404, {"error": {"message": "not found"}})
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._json(400, {"error": {"message": "invalid JSON"}})
+
+        cfg = self.config
+        cfg.count("requests")
+        roll = random.random()
+        if roll < cfg.rate_429:
+            cfg.count("rejected_429")
+            return self._json(429, {"error": {"message": "Rate limit reached (mock)", "type": "tokens",
+                                              "code": "rate_limit_exceeded"}},
+                              headers={"retry-after": "1"})
+        if roll < cfg.rate_429 + cfg.rate_timeout:
+            cfg.count("hung")
+            time.sleep(cfg.hang_seconds)
+            self.close_connection = True
+            return
+
+        messages = body.get("messages") or []
+        model = body.get("model", "mock")
+        text = cfg.reply_for(messages)
+        finish = "stop"
+        max_tokens = body.get("max_tokens")
+        if max_tokens and estimate_tokens(text) > max_tokens:
+            text = text[:max_tokens * 4]
+            finish = "length"
+
+        time.sleep(cfg.latency.sample())  # time to first token
+        if body.get("stream"):
+            return self._stream(model, text, finish)
+
+        time.sleep(cfg.generation_delay(estimate_tokens(text)))
+        prompt_tokens = sum(estimate_tokens(m.get("content", "")) for m in messages)
+        self._json(200, {
+            "id": "chatcmpl-" + uuid.uuid4().hex,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                         "finish_reason": finish, "logprobs": None}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": estimate_tokens(text),
+                      "total_tokens": prompt_tokens + estimate_tokens(text)},
+        })
+
+    def _stream(self, model, text, finish):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        chunk_id = "chatcmpl-" + uuid.uuid4().hex
+        pieces = [text[i:i + 16] for i in range(0, len(text), 16)] or [""]
+        delay = self.config.generation_delay(estimate_tokens(text)) / len(pieces)
+        try:
+            for i, piece in enumerate(pieces):
+                if i and delay:
+                    time.sleep(delay)
+                self._event({"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                             "model": model, "choices": [{"index": 0, "delta": {"content": piece},
+                                                          "finish_reason": None}]})
+            self._event({"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": finish}]})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _event(self, payload):
+        self.wfile.write(b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n")
+        self.wfile.flush()
+
+    def _json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def make_server(host="127.0.0.1", port=8088, config=None, verbose=False) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), MockGroqHandler)
+    server.daemon_threads = True
+    server.config = config or MockGroqConfig()
+    server.verbose = verbose
+    return server
@@ -0,0 +1,211 @@
+# backend/converter_app/model_router.py
+"""
+Local, zero-cost decisions made before and after an LLM call:
+
+  * route_model()      pick the fast model for small/simple inputs and the
+                       large model otherwise
+  * looks_valid()      cheap syntax sanity check of a conversion; a failure
+                       on the fast model triggers escalation to the large one
+  * compact_source()   drop comments and blank-line runs from the prompt
+                       where the language makes that safe
+"""
+
+import ast
+import io
+import os
+import re
+import threading
+import tokenize
+
+from .chunking import _scan_line
+
+FAST_MODEL = os.getenv("GROQ_FAST_MODEL", "llama-3.1-8b-instant")
+ROUTING_ENABLED = os.getenv("GROQ_ROUTING", "1") == "1" and bool(FAST_MODEL)
+FAST_MAX_TOKENS = int(os.getenv("GROQ_FAST_MAX_TOKENS", "400"))    # estimated input tokens
+FAST_MAX_COMPLEXITY = int(os.getenv("GROQ_FAST_MAX_COMPLEXITY", "12"))
+COMPACT_PROMPTS = os.getenv("CONVERT_COMPACT_PROMPTS", "1") == "1"
+
+# constructs small models tend to get wrong when translating
+_HARD_FEATURES = [
+    r"\btemplate\s*<", r"\bgo\s+func\b", r"\bchan\b", r"\bselect\s*\{", r"\bsync\.",
+    r"\basync\b", r"\bawait\b", r"\byield\b", r"\blambda\b", r"@\w+",
+    r"\bimplements\b", r"\bextends\b", r"\binterface\b", r"\bunion\b", r"\bgoto\b",
+    r"\bmalloc\b", r"\bfree\s*\(", r"->", r"\*\*\w", r"\bThread\b", r"\bsuper\(",
+    r"\bPromise\b", r"\bstd::(?:unique_ptr|shared_ptr|move|function)\b", r"#define\b",
+]
+_HARD_RE = re.compile("|".join(_HARD_FEATURES))
+_DEF_RE = re.compile(r"^\s*(def|class|func|function|public|private|protected|static|struct|type)\b", re.M)
+_PROSE_RE = re.compile(r"^(here is|here's|sure|the following|below is|this code)\b", re.I)
+
+_stats_lock = threading.Lock()
+_counters = {"fast": 0, "large": 0, "escalated": 0}
+
+
+def _count(name):
+    with _stats_lock:
+        _counters[name] += 1
+
+
+def note_escalation():
+    _count("escalated")
+
+
+def stats() -> dict:
+    with _stats_lock:
+        data = dict(_counters)
+    data.update(enabled=ROUTING_ENABLED, fast_model=FAST_MODEL, compact_prompts=COMPACT_PROMPTS)
+    return data
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def complexity(source: str, lang: str) -> int:
+    """Rough score: definitions, nesting depth and hard-to-translate constructs."""
+    lines = [line for line in source.splitlines() if line.strip()]
+    score = len(_DEF_RE.findall(source)) * 2
+    score += len(_HARD_RE.findall(source)) * 3
+    score += _max_depth(lines, lang)
+    score += len(lines) // 20
+    return score
+
+
+def _max_depth(lines, lang):
+    if (lang or "").lower() in ("python", "py"):
+        widths = [len(line) - len(line.lstrip()) for line in lines]
+        step = min([w for w in widths if w] or [4])
+        return max(widths or [0]) // step
+    depth = deepest = 0
+    state = None
+    for line in lines:
+        depth, state = _scan_line(line, depth, state)
+        deepest = max(deepest, depth)
+    return deepest
+
+
+def route_model(source: str, lang: str, large_model: str):
+    """Return (model, reason) for a conversion of `source`."""
+    if not ROUTING_ENABLED or FAST_MODEL == large_model:
+        return large_model, "routing disabled"
+    tokens = estimate_tokens(source)
+    if tokens > FAST_MAX_TOKENS:
+        _count("large")
+        return large_model, f"~{tokens} tokens"
+    score = complexity(source, lang)
+    if score > FAST_MAX_COMPLEXITY:
+        _count("large")
+        return large_model, f"complexity {score}"
+    _count("fast")
+    return FAST_MODEL, f"~{tokens} tokens, complexity {score}"
+
+
+def looks_valid(code: str, lang: str) -> bool:
+    """Cheap post-conversion check; False means 'ask the large model instead'."""
+    code = (code or "").strip()
+    if not code or _PROSE_RE.match(code) or code.startswith("// Groq API error"):
+        return False
+    lang = (lang or "").lower()
+    if lang in ("python", "py"):
+        try:
+            ast.parse(code)
+        except (SyntaxError, ValueError):
+            return False
+        return True
+    depth = 0
+    state = None
+    for line in code.splitlines(keepends=True):
+        depth, state = _scan_line(line, depth, state)
+        if depth < 0:
+            return False
+    return depth == 0 and state is None
+
+
+def compact_source(source: str, lang: str) -> str:
+    """Strip comments and collapse blank-line runs when it cannot change meaning."""
+    if not COMPACT_PROMPTS:
+        return source
+    lang = (lang or "").lower()
+    if lang in ("python", "py"):
+        stripped = _strip_python_comments(source)
+    elif lang in ("go", "java", "c", "cpp", "c++"):
+        stripped = _strip_c_comments(source, lang)
+    else:
+        # JS regex literals can contain "//"; only blank runs are safe there
+        stripped = source
+    if stripped is None:
+        stripped = source
+    return re.sub(r"\n\s*\n(\s*\n)+", "\n\n", stripped)
+
+
+def _strip_python_comments(source):
+    try:
+        tokens = list(tokenize.generate_tokens(io.StringIO(source).readline))
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return None
+    lines = source.splitlines(keepends=True)
+    cuts = {}
+    for tok in tokens:
+        if tok.type == tokenize.COMMENT:
+            row, col = tok.start
+            cuts[row - 1] = col
+    out = []
+    for i, line in enumerate(lines):
+        if i in cuts:
+            kept = line[:cuts[i]].rstrip()
+            if not kept:
+                continue  # comment-only line
+            line = kept + "\n"
+        out.append(line)
+    return "".join(out)
+
+
+def _strip_c_comments(source, lang):
+    if lang == "go" and ('import "C"' in source or "//go:" in source):
+        return None  # cgo preambles and compiler directives live in comments
+    if lang in ("cpp", "c++") and 'R"' in source:
+        return None  # raw string literals would confuse the scanner
+    out = []
+    state = None
+    for line in source.splitlines(keepends=True):
+        kept = []
+        i, n = 0, len(line)
+        while i < n:
+            ch = line[i]
+            if state == "block":
+                if line.startswith("*/", i):
+                    state = None
+                    i += 2
+                    continue
+                i += 1
+                continue
+            if state is not None:
+                kept.append(ch)
+                if ch == "\\" and state != "`" and i + 1 < n:
+                    kept.append(line[i + 1])
+                    i += 2
+                    continue
+                if ch == state:
+                    state = None
+                i += 1
+                continue
+            if line.startswith("//", i):
+                break
+            if line.startswith("/*", i):
+                state = "block"
+                i += 2
+                continue
+            if ch in "\"'`":
+                state = ch
+            kept.append(ch)
+            i += 1
+        if state in ("\"", "'"):
+            state = None
+        if state == "`":
+            out.append("".join(kept))  # inside a raw string: keep the line verbatim
+            continue
+        text = "".join(kept).rstrip()
+        if text or not line.strip():
+            out.append(text + "\n")
+        # otherwise the line held only a comment
+    return "".join(out)
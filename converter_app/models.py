@@ -1,5 +1,18 @@
 # models.py
+import hashlib
 from django.db import models
+from .cache import normalize_source
+
+
+def code_hash(code: str) -> str:
+    """sha256 of code with line endings and trailing whitespace normalized."""
+    return hashlib.sha256(normalize_source(code or "").encode("utf-8")).hexdigest()
+
+
+def feedback_hash(text: str) -> str:
+    """sha256 of feedback text with runs of whitespace collapsed."""
+    return hashlib.sha256(" ".join((text or "").split()).encode("utf-8")).hexdigest()
+
 
 class Feedback(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
@@ -8,6 +21,24 @@ class Feedback(models.Model):
     previous_code = models.TextField(blank=True)
     feedback_text = models.TextField()
     refined_code = models.TextField(blank=True)
+    # lookup keys for reusing a refinement; filled by fill_hashes()
+    previous_code_hash = models.CharField(max_length=64, blank=True, default="")
+    feedback_hash = models.CharField(max_length=64, blank=True, default="")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["previous_code_hash", "feedback_hash", "source_lang", "target_lang"],
+                         name="feedback_lookup_idx"),
+        ]
+
+    def fill_hashes(self):
+        self.previous_code_hash = code_hash(self.previous_code)
+        self.feedback_hash = feedback_hash(self.feedback_text)
+        return self
+
+    def save(self, *args, **kwargs):
+        self.fill_hashes()
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Feedback {self.id} {self.created_at}"
@@ -0,0 +1,145 @@
+# backend/converter_app/pch.py
+"""
+Precompiled headers for C and C++ builds.
+
+Converted C++ nearly always opens with <bits/stdc++.h> or a pile of STL
+headers, and parsing those is most of a g++ run. A few header sets are
+compiled once per toolchain and flags (the first time the language is used,
+in the background) into BUILD_PCH_DIR; a build whose <...> includes are all
+covered by a set gets `-include <set>.h` and GCC loads the .gch instead of
+re-parsing. The smallest covering set wins; "bits" covers anything.
+
+A set may pull in more than the program asked for, which can in rare cases
+clash with the program's own names, so build_cache retries a failed PCH
+compile without it.
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+BUILD_PCH_ENABLED = os.getenv("BUILD_PCH", "1") == "1"
+BUILD_PCH_DIR = os.getenv("BUILD_PCH_DIR", os.path.join(tempfile.gettempdir(), "code_converter_pch"))
+PCH_BUILD_TIMEOUT = 120
+
+_CPP_COMMON = (
+    "algorithm array bitset cassert cctype chrono climits cmath cstdint cstdio cstdlib cstring deque "
+    "functional iomanip iostream iterator limits list map memory numeric optional queue random set "
+    "sstream stack string tuple unordered_map unordered_set utility vector"
+).split()
+_C_COMMON = ("assert.h ctype.h limits.h math.h stdbool.h stddef.h stdint.h stdio.h stdlib.h string.h "
+             "time.h").split()
+
+# (name, headers) from smallest to largest; None = covers any header
+PCH_SETS = {
+    "cpp": [("stl", _CPP_COMMON), ("bits", None)],
+    "c": [("libc", _C_COMMON)],
+}
+
+_INCLUDE_RE = re.compile(r'^\s*#\s*include\s*([<"])([^>"]+)[>"]', re.M)
+
+
+def _includes(code):
+    """The program's <...> includes, or None if it has a "..." one (then no set can stand in)."""
+    names = set()
+    for kind, name in _INCLUDE_RE.findall(code):
+        if kind == '"':
+            return None
+        names.add(name.strip())
+    return names
+
+
+class PrecompiledHeaders:
+    def __init__(self, root=BUILD_PCH_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._ready = {}      # (lang, key) -> {set name: header path}
+        self._building = set()
+        self.build_ms = {}
+        self.error = None
+        self.counters = {"used": 0, "unmatched": 0, "not_ready": 0, "fallbacks": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def select(self, lang, code, compiler, flags, version):
+        """(set name, header path) to force-include for this build, or (None, None)."""
+        if not BUILD_PCH_ENABLED or lang not in PCH_SETS or not version:
+            return None, None
+        includes = _includes(code)
+        if not includes:
+            self._count("unmatched")
+            return None, None
+        key = hashlib.sha256("\0".join([version] + list(flags)).encode("utf-8")).hexdigest()[:16]
+        with self._lock:
+            ready = self._ready.get((lang, key))
+            if ready is None and (lang, key) not in self._building:
+                self._building.add((lang, key))
+                threading.Thread(target=self._build_all, args=(lang, key, compiler, flags),
+                                 name="pch-build", daemon=True).start()
+        for name, headers in PCH_SETS[lang]:
+            if headers is None or includes <= set(headers):
+                if ready is None or name not in ready:
+                    self._count("not_ready")  # this build parses its headers; later ones will not
+                    return None, None
+                self._count("used")
+                return name, ready[name]
+        self._count("unmatched")
+        return None, None
+
+    def note_fallback(self):
+        """A build failed with the PCH and was redone without it."""
+        self._count("fallbacks")
+
+    def _build_all(self, lang, key, compiler, flags):
+        directory = os.path.join(self.root, f"{lang}-{key}")
+        built = {}
+        for name, headers in PCH_SETS[lang]:
+            header = os.path.join(directory, f"{name}.h")
+            try:
+                if not os.path.exists(header + ".gch"):
+                    started = time.monotonic()
+                    self._build_one(lang, directory, header, headers, compiler, flags)
+                    self.build_ms[f"{lang}/{name}"] = round((time.monotonic() - started) * 1000, 1)
+            except (OSError, subprocess.SubprocessError) as e:
+                self.error = f"{lang}/{name}: {e}"[:500]
+                continue
+            built[name] = header
+        with self._lock:
+            self._ready[(lang, key)] = built
+            self._building.discard((lang, key))
+
+    def _build_one(self, lang, directory, header, headers, compiler, flags):
+        os.makedirs(directory, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=directory)
+        try:
+            text = "".join(f"#include <{h}>\n" for h in headers or ["bits/stdc++.h"])
+            staged = os.path.join(staging, os.path.basename(header))
+            with open(staged, "w", encoding="utf-8") as f:
+                f.write(text)
+            kind = "c++-header" if lang == "cpp" else "c-header"
+            proc = subprocess.run([compiler] + list(flags) + ["-x", kind, staged, "-o", staged + ".gch"],
+                                  capture_output=True, text=True, timeout=PCH_BUILD_TIMEOUT)
+            if proc.returncode != 0:
+                raise subprocess.SubprocessError(proc.stderr.strip()[:300] or f"{compiler} failed")
+            # the .gch first: a header without one would still work, just slowly
+            os.replace(staged + ".gch", header + ".gch")
+            os.replace(staged, header)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self.counters)
+            data["ready"] = sorted(f"{lang}/{name}" for (lang, _), sets in self._ready.items() for name in sets)
+        data.update(enabled=BUILD_PCH_ENABLED, build_ms=dict(self.build_ms), error=self.error)
+        return data
+
+
+precompiled_headers = PrecompiledHeaders()
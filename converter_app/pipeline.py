@@ -0,0 +1,129 @@
+# backend/converter_app/pipeline.py
+"""
+Convert-and-verify in one request, with independent stages overlapped.
+
+Running the original program does not depend on the conversion, so it starts
+together with the LLM call; the converted program is compiled and run as
+soon as its code arrives, and the two runs are compared at the end:
+
+    source_run  ───────────────┐
+    convert ──> converted_run ─┴─> verify
+
+End-to-end latency is max(convert + converted run, source run) instead of
+their sum. Every stage is reported as one NDJSON line when it finishes (with
+its start offset and duration), followed by a summary line.
+"""
+
+import asyncio
+import json
+import time
+
+from .difftest import compare_runs
+from .execution import execution_engine
+from .limiter import LimiterBusy
+from .mcp_connector import aconvert_with_mcp, save_history
+from .utils import format_run
+
+
+def _ms(since):
+    return round((time.monotonic() - since) * 1000, 1)
+
+
+async def _stage(name, coro, started, events, describe):
+    """Await one stage, queue its event and return its value (None if it failed)."""
+    begin = time.monotonic()
+    event = {"stage": name, "started_ms": round((begin - started) * 1000, 1)}
+    value = None
+    try:
+        value = await coro
+    except LimiterBusy as e:
+        event.update(status="busy", error=str(e), retry_after=e.retry_after)
+    except Exception as e:
+        event.update(status="error", error=f"{name} failed: {e}")
+    else:
+        event.update(describe(value))
+    event["elapsed_ms"] = _ms(begin)
+    await events.put(event)
+    return value if event["status"] == "ok" else None
+
+
+def _describe_conversion(res):
+    if not res or res.get("status") == "error":
+        return {"status": "error", "error": (res or {}).get("message", "MCP error")}
+    return {"status": "ok", "converted_code": res.get("converted_code", ""), "notes": res.get("notes", ""),
+            "cache": res.get("cache", "disabled"), "coalesced": res.get("coalesced", False),
+            "model": res.get("model"), "escalated": res.get("escalated", False),
+            "truncated": res.get("truncated", False), "history_id": res.get("history_id")}
+
+
+def _describe_run(lang):
+    return lambda res: dict(format_run(lang, res), status="ok")
+
+
+def _verify(source, converted, compare):
+    """verify event fields; skipped when either side never ran to completion."""
+    for side, res in (("source", source), ("converted", converted)):
+        if res is None:
+            return {"status": "skipped", "reason": f"{side} run unavailable"}
+        if res["compile_error"] or res["unsupported"]:
+            return {"status": "skipped", "reason": f"{side} program did not build"}
+    return compare_runs(source, converted, **compare)
+
+
+async def stream_convert_and_verify(source_code, source_lang, target_lang, stdin="", timeout=10,
+                                    use_cache=True, compare=None):
+    """Yield NDJSON lines: one per stage (source_run, convert, converted_run, verify), then a summary."""
+    started = time.monotonic()
+    compare = compare or {}
+    events = asyncio.Queue()
+
+    async def convert():
+        res = await aconvert_with_mcp(source_code, source_lang, target_lang, use_cache=use_cache)
+        if res and res.get("status") != "error":
+            history_id = await asyncio.to_thread(save_history, res, source_code, source_lang, target_lang)
+            res = dict(res, history_id=history_id)
+        return res
+
+    async def source_side():
+        try:
+            return await _stage("source_run", execution_engine.arun(source_lang, source_code, stdin, timeout),
+                                started, events, _describe_run(source_lang))
+        finally:
+            await events.put(None)
+
+    async def converted_side():
+        try:
+            conversion = await _stage("convert", convert(), started, events, _describe_conversion)
+            if conversion is None:
+                return None
+            return await _stage("converted_run",
+                                execution_engine.arun(target_lang, conversion["converted_code"], stdin, timeout),
+                                started, events, _describe_run(target_lang))
+        finally:
+            await events.put(None)
+
+    tasks = [asyncio.create_task(source_side()), asyncio.create_task(converted_side())]
+    stages = {}
+    try:
+        finished = 0
+        while finished < len(tasks):
+            event = await events.get()
+            if event is None:
+                finished += 1
+                continue
+            stages[event["stage"]] = event["elapsed_ms"]
+            yield json.dumps(event) + "\n"
+        source, converted = [task.result() for task in tasks]
+    finally:
+        # client went away: do not leave runs or LLM calls behind
+        for task in tasks:
+            task.cancel()
+
+    begin = time.monotonic()
+    # spilled output is read off the loop
+    verdict = await asyncio.to_thread(_verify, source, converted, compare)
+    stages["verify"] = _ms(begin)
+    yield json.dumps(dict(verdict, stage="verify", started_ms=round((begin - started) * 1000, 1),
+                          elapsed_ms=stages["verify"], compare=compare)) + "\n"
+    yield json.dumps({"summary": True, "all_passed": verdict["status"] == "pass", "stages": stages,
+                      "elapsed_ms": _ms(started)}) + "\n"
@@ -0,0 +1,204 @@
+# backend/converter_app/sandbox.py
+"""
+Resource limits and accounting for user programs.
+
+Every run starts in its own session with rlimits applied right before the
+program begins: by the zygote's forked child for a warm run, and by
+util-linux prlimit(1) exec'ing the program for a cold one (limited_command()),
+so the threaded server never needs a preexec_fn:
+  * RUN_MAX_CPU_SECONDS  - CPU time (SIGXCPU, then SIGKILL a second later)
+  * RUN_MAX_MEMORY_MB    - RLIMIT_DATA, i.e. heap + private mappings; unlike
+                           RLIMIT_AS it leaves Go/V8/JVM address space
+                           reservations alone (RUN_LANG_MEMORY_MB="java=1024")
+  * RUN_MAX_PROCS        - RLIMIT_NPROC (counted per uid, ignored for root)
+  * RUN_MAX_FILE_MB      - largest file a program may write (SIGXFSZ)
+  * no core dumps
+
+When RUN_CGROUP_DIR names a delegated, writable cgroup v2 directory each run
+also gets a child group with memory.max / pids.max, which bound the whole
+process tree (and work for root), and its leftovers are killed on exit.
+
+CPU time and peak RSS come from wait4(), or from the cgroup counters when
+there is one. Without a cgroup, peak RSS has a floor: the kernel folds the
+RSS of whatever forked the child into its high-water mark, so a cold start
+only has a peak of its own when it grows past the server's (rusage_usage()
+reports None below that) and a warm one includes the zygote's. Stdlib only:
+the Python zygote in warm_pool.py imports this file as well.
+"""
+
+import itertools
+import os
+import resource
+import shutil
+import signal
+
+RUN_MAX_CPU_SECONDS = int(os.getenv("RUN_MAX_CPU_SECONDS", "10"))
+RUN_MAX_MEMORY_MB = int(os.getenv("RUN_MAX_MEMORY_MB", "512"))
+RUN_MAX_PROCS = int(os.getenv("RUN_MAX_PROCS", "512"))
+RUN_MAX_FILE_MB = int(os.getenv("RUN_MAX_FILE_MB", "16"))
+RUN_CGROUP_DIR = os.getenv("RUN_CGROUP_DIR", "")
+
+LANG_ALIASES = {"py": "python", "javascript": "js", "c++": "cpp", "golang": "go"}
+MB = 1024 * 1024
+
+_RLIMITS = {
+    "cpu": resource.RLIMIT_CPU,
+    "data": resource.RLIMIT_DATA,
+    "nproc": resource.RLIMIT_NPROC,
+    "fsize": resource.RLIMIT_FSIZE,
+    "core": resource.RLIMIT_CORE,
+}
+_PRLIMIT = shutil.which("prlimit")
+
+
+def _parse_memory(spec):
+    memory = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        lang, _, value = part.partition("=")
+        lang = lang.lower().strip()
+        memory[LANG_ALIASES.get(lang, lang)] = int(value)
+    return memory
+
+
+RUN_LANG_MEMORY_MB = _parse_memory(os.getenv("RUN_LANG_MEMORY_MB", ""))
+
+
+def run_limits(lang: str) -> dict:
+    """Limits for one run of `lang` (0 = unlimited); passed to apply_limits() in the child."""
+    memory_mb = RUN_LANG_MEMORY_MB.get(lang, RUN_MAX_MEMORY_MB)
+    return {
+        "cpu": RUN_MAX_CPU_SECONDS,
+        "data": memory_mb * MB,
+        "nproc": RUN_MAX_PROCS,
+        "fsize": RUN_MAX_FILE_MB * MB,
+        "core": 0,
+    }
+
+
+def _rlimit_pairs(limits):
+    for name, value in limits.items():
+        which = _RLIMITS.get(name)
+        if which is None or (not value and name != "core"):
+            continue
+        # soft limit signals, the hard limit a second later is SIGKILL
+        yield name, which, value, value + 1 if name == "cpu" else value
+
+
+def _clamp(soft, hard, current_hard):
+    if current_hard != resource.RLIM_INFINITY:
+        soft, hard = min(soft, current_hard), min(hard, current_hard)
+    return soft, hard
+
+
+def apply_limits(limits: dict, pid: int = 0):
+    """Apply limits to the calling process (pid=0) or to an idle child; never raises above a hard limit."""
+    for _, which, soft, hard in _rlimit_pairs(limits):
+        try:
+            resource.prlimit(pid, which, _clamp(soft, hard, resource.prlimit(pid, which)[1]))
+        except (OSError, ValueError):
+            pass
+    if limits.get("cgroup"):
+        try:
+            with open(os.path.join(limits["cgroup"], "cgroup.procs"), "w") as f:
+                f.write(str(pid or os.getpid()))
+        except OSError:
+            pass
+
+
+def limited_command(cmd: list, limits: dict):
+    """
+    `cmd` run through prlimit(1), which sets `limits` and then execs it (joining their
+    cgroup first through sh when there is one), or None without prlimit(1): then limit
+    the started process with apply_limits(limits, pid).
+    """
+    if not _PRLIMIT:
+        return None
+    options = []
+    for name, which, soft, hard in _rlimit_pairs(limits):
+        soft, hard = _clamp(soft, hard, resource.getrlimit(which)[1])  # the child inherits ours
+        options.append(f"--{name}={soft}:{hard}")
+    argv = [_PRLIMIT, *options, "--", *cmd]
+    if limits.get("cgroup"):
+        argv = ["sh", "-c", '{ echo $$ > "$0"; } 2>/dev/null; exec "$@"',
+                os.path.join(limits["cgroup"], "cgroup.procs"), *argv]
+    return argv
+
+
+def rusage_usage(rusage, floor_kb: int = 0) -> dict:
+    """cpu_ms and peak_rss_kb from wait4(); a peak not above floor_kb (the forker's RSS) is unknown."""
+    return {"cpu_ms": round((rusage.ru_utime + rusage.ru_stime) * 1000, 1),
+            "peak_rss_kb": rusage.ru_maxrss if rusage.ru_maxrss > floor_kb else None}  # KiB on Linux
+
+
+def exit_info(returncode) -> dict:
+    """exit_code plus the signal name when the program was killed (SIGXCPU = CPU limit, ...)."""
+    info = {"exit_code": returncode, "signal": None}
+    if returncode is not None and returncode < 0:
+        try:
+            info["signal"] = signal.Signals(-returncode).name
+        except ValueError:
+            info["signal"] = str(-returncode)
+    return info
+
+
+# ---- cgroup v2 (optional) -------------------------------------------------
+
+_cgroup_ids = itertools.count(1)
+_draining = []  # groups whose processes were still exiting when released
+
+
+def cgroup_create(limits: dict):
+    """Make a per-run cgroup under RUN_CGROUP_DIR; returns its path or None (rlimits only)."""
+    if not RUN_CGROUP_DIR:
+        return None
+    path = os.path.join(RUN_CGROUP_DIR, f"run-{os.getpid()}-{next(_cgroup_ids)}")
+    settings = {"memory.max": limits.get("data"), "memory.swap.max": 0, "pids.max": limits.get("nproc")}
+    try:
+        os.mkdir(path)
+    except OSError:
+        return None
+    try:
+        for name, value in settings.items():
+            if value is None or (not value and name != "memory.swap.max"):
+                continue
+            try:
+                with open(os.path.join(path, name), "w") as f:
+                    f.write(str(value))
+            except FileNotFoundError:
+                pass  # controller not enabled for this subtree
+    except OSError:
+        os.rmdir(path)
+        return None
+    return path
+
+
+def cgroup_release(path: str) -> dict:
+    """Kill whatever is left in the group, read its counters and remove it."""
+    usage = {}
+    try:
+        with open(os.path.join(path, "cpu.stat")) as f:
+            for line in f:
+                key, _, value = line.partition(" ")
+                if key == "usage_usec":
+                    usage["cpu_ms"] = round(int(value) / 1000, 1)
+        with open(os.path.join(path, "memory.peak")) as f:
+            usage["peak_rss_kb"] = int(f.read()) // 1024
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(os.path.join(path, "cgroup.kill"), "w") as f:
+            f.write("1")
+    except OSError:
+        pass
+    for group in _draining + [path]:
+        try:
+            os.rmdir(group)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            if group == path:
+                _draining.append(path)  # still exiting; retried by the next release
+            continue
+        if group in _draining:
+            _draining.remove(group)
+    return usage
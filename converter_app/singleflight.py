@@ -0,0 +1,110 @@
+# backend/converter_app/singleflight.py
+"""
+Single-flight coalescing of identical in-flight calls.
+
+The first caller for a key (the leader) does the work; anyone asking for the
+same key while it runs waits for the leader's result instead of starting a
+duplicate upstream call. Results are handed over through a
+concurrent.futures.Future, so sync threads and coroutines on any event loop
+can wait on the same call.
+
+Coalescing is per process; once a call finishes, the conversion cache is
+what lets other workers reuse the result.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class LeaderGone(Exception):
+    """The leader was cancelled before producing a result; waiters retry."""
+
+
+class _Call:
+    __slots__ = ("future", "waiters")
+
+    def __init__(self):
+        self.future = Future()
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.counters = {"leaders": 0, "deduplicated": 0}
+
+    def join(self, key):
+        """Return (call, is_leader). The leader must later call finish()/fail()."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.counters["deduplicated"] += 1
+                return call, False
+            call = _Call()
+            self._calls[key] = call
+            self.counters["leaders"] += 1
+            return call, True
+
+    def finish(self, key, call, result):
+        call.future.set_result(result)
+        self._forget(key, call)
+
+    def fail(self, key, call, exc):
+        if isinstance(exc, (asyncio.CancelledError, GeneratorExit, KeyboardInterrupt, SystemExit)):
+            exc = LeaderGone()
+        call.future.set_exception(exc)
+        self._forget(key, call)
+
+    def _forget(self, key, call):
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+
+    def do(self, key, fn):
+        """Run fn() once per key across concurrent callers. Returns (result, shared)."""
+        while True:
+            call, leader = self.join(key)
+            if leader:
+                try:
+                    result = fn()
+                except BaseException as e:
+                    self.fail(key, call, e)
+                    raise
+                self.finish(key, call, result)
+                return result, False
+            try:
+                return call.future.result(), True
+            except LeaderGone:
+                continue
+
+    async def ado(self, key, coro_fn):
+        """Async form of do(); coro_fn() is awaited only by the leader."""
+        while True:
+            call, leader = self.join(key)
+            if leader:
+                try:
+                    result = await coro_fn()
+                except BaseException as e:
+                    self.fail(key, call, e)
+                    raise
+                self.finish(key, call, result)
+                return result, False
+            try:
+                # shield: a cancelled waiter must not cancel the shared future
+                return await asyncio.shield(asyncio.wrap_future(call.future)), True
+            except LeaderGone:
+                continue
+
+    async def wait(self, call):
+        """Wait for a call obtained from join() as a non-leader."""
+        return await asyncio.shield(asyncio.wrap_future(call.future))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters, in_flight=len(self._calls))
+
+
+conversions_in_flight = SingleFlight()
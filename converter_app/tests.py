@@ -1,3 +1,1940 @@
-from django.test import TestCase
+import asyncio
+import gc
+import importlib
+import io
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import weakref
+import zipfile
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from channels.testing import WebsocketCommunicator
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase
+
+from . import (batch, build_cache, capture, consumers, go_cache, java_runtime, mcp_connector, mock_groq, pch,
+               sandbox, validators, workspaces)
+from .build_cache import ArtifactCache, java_class_names
+from .cache import ConversionCache, make_key
+from .chunking import UNIT_DEF, apply_incremental, group_units, join_units, plan_incremental, split_units
+from .difftest import (DIFFTEST_MAX_TIMEOUT, DiffTestError, adiff_test, compare_runs, reads_stdin, run_timeout,
+                       vectors_from_json)
+from .execution import ExecutionBusy, ExecutionEngine
+from .feedback_store import feedback_writer, find_refinement
+from .go_cache import GoCache
+from .limiter import ConcurrencyLimiter, LimiterBusy
+from .mcp_tools import deep_compare_outputs
+from .model_router import FAST_MODEL, compact_source, looks_valid, route_model
+from .models import Feedback, code_hash, feedback_hash
+from .singleflight import SingleFlight
+from .warm_pool import WarmPool, WarmProcess, astart_process
+from .workspaces import WorkspacePool
+
+HAS_NODE = shutil.which("node") is not None
+HAS_JDK = shutil.which("java") is not None and shutil.which("javac") is not None
+
+
+def _run(returncode=0, stdout="", stderr="", timed_out=False):
+    return {"returncode": returncode, "stdout": stdout, "stderr": stderr, "timed_out": timed_out,
+            "streams": {}, "run_id": "test"}
+
+
+class CompareRunsTests(SimpleTestCase):
+    def test_same_output_passes(self):
+        self.assertEqual(compare_runs(_run(stdout="5\n"), _run(stdout="5\n"))["status"], "pass")
+
+    def test_different_exit_codes_fail(self):
+        verdict = compare_runs(_run(1), _run(3))
+        self.assertEqual(verdict["status"], "fail")
+        self.assertIn("1 vs 3", verdict["reason"])
+
+    def test_error_on_stderr_only_one_side_fails(self):
+        self.assertEqual(compare_runs(_run(1, stderr="Traceback"), _run(1))["status"], "fail")
+        self.assertEqual(compare_runs(_run(1, stderr="Traceback"), _run(1, stderr="Error"))["status"], "pass")
+
+    def test_reads_stdin(self):
+        self.assertTrue(reads_stdin("python", "n = int(input())"))
+        self.assertTrue(reads_stdin("c++", "int n; std::cin >> n;"))
+        self.assertFalse(reads_stdin("py", "print(42)"))
+        self.assertTrue(reads_stdin("cobol", "DISPLAY 'HI'"))
+
+
+@skipUnless(HAS_NODE, "node is not installed")
+@mock.patch.object(mcp_connector, "_llm_verdict", new_callable=mock.AsyncMock,
+                   return_value=mcp_connector._decided(None, "not executed", "not executed", "llm"))
+class ExecutionVerdictTests(SimpleTestCase):
+    async def validate(self, original, converted, **kwargs):
+        return await mcp_connector.avalidate_logic_with_mcp(original, converted, "python", "javascript", **kwargs)
+
+    async def test_identical_output_is_consistent(self, llm):
+        result = await self.validate("print(2 + 3)", "console.log(2 + 3);")
+        self.assertEqual((result["tier"], result["logic_consistent"]), ("execution", True))
+        llm.assert_not_called()
+
+    async def test_reproducible_difference_is_inconsistent(self, llm):
+        result = await self.validate("print(5)", "console.log(6);")
+        self.assertEqual((result["tier"], result["logic_consistent"]), ("execution", False))
+
+    async def test_stdin_program_without_inputs_goes_to_llm(self, llm):
+        result = await self.validate("n = int(input())\nprint(n * 2)",
+                                     "const n = parseInt(require('fs').readFileSync(0, 'utf8'));\n"
+                                     "console.log(n * 2);")
+        self.assertEqual(result["tier"], "llm")
+        self.assertIn("reads stdin", result["escalation_reason"])
+
+    async def test_stdin_program_with_inputs_is_run(self, llm):
+        result = await self.validate("n = int(input())\nprint(n * 2)",
+                                     "const n = parseInt(require('fs').readFileSync(0, 'utf8'));\n"
+                                     "console.log(n * 2);", inputs=["4\n", "21\n"])
+        self.assertEqual((result["tier"], result["logic_consistent"]), ("execution", True))
+
+    async def test_failing_original_is_inconclusive(self, llm):
+        result = await self.validate("import sys\nsys.exit(1)", "process.exit(3);")
+        self.assertEqual(result["tier"], "llm")
+        self.assertIn("exited with status 1", result["escalation_reason"])
+
+
+class LLMTestCase(SimpleTestCase):
+    """Runs mcp_connector against a scripted LLM and a private, empty cache."""
+
+    def setUp(self):
+        self.cache = ConversionCache(disk_dir=tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.cache.disk_dir, True)
+        for name, value in (("conversion_cache", self.cache), ("MOCK_MCP", False),
+                            ("route_model", mock.Mock(return_value=(mcp_connector.MODEL, "test")))):
+            patcher = mock.patch.object(mcp_connector, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def script_llm(self, reply):
+        """Make every LLM call return reply(messages, max_tokens)."""
+        async def call(messages, timeout=None, max_tokens=mcp_connector.GROQ_MAX_TOKENS, model=mcp_connector.MODEL):
+            return dict({"mock": False, "truncated": False, "model": model}, **reply(messages, max_tokens))
+
+        patcher = mock.patch.object(mcp_connector, "_acall_llm_system", side_effect=call)
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+
+class TruncationTests(LLMTestCase):
+    async def test_truncated_reply_is_redone_with_a_larger_budget(self):
+        llm = self.script_llm(lambda messages, max_tokens: {"text": "print(1)", "truncated": max_tokens < 4096})
+        result = await mcp_connector.aconvert_with_mcp("console.log(1);", "javascript", "python", chunked=False)
+        self.assertEqual(result["converted_code"], "print(1)")
+        self.assertFalse(result.get("truncated"))
+        self.assertEqual([c.kwargs["max_tokens"] for c in llm.call_args_list[1:]], [2048, 4096])
+
+    async def test_reply_truncated_at_the_cap_is_reported_and_not_cached(self):
+        self.script_llm(lambda messages, max_tokens: {"text": "print(", "truncated": True})
+        result = await mcp_connector.aconvert_with_mcp("console.log(1);", "javascript", "python", chunked=False)
+        self.assertTrue(result["truncated"])
+        self.assertIn("incomplete", result["notes"])
+        self.assertEqual(self.cache.stats()["stores"], 0)
+
+    async def test_reply_truncated_at_the_cap_falls_back_to_chunks(self):
+        source = "function a() {\n  return 1;\n}\n\nfunction b() {\n  return 2;\n}\n"
+
+        def reply(messages, max_tokens):
+            whole_file = "Convert ONLY" not in messages[-1]["content"] and "top of the" not in messages[-1]["content"]
+            return {"text": "def f(): pass", "truncated": whole_file}
+
+        self.script_llm(reply)
+        with mock.patch.object(mcp_connector, "CHUNK_TOKENS", 1):
+            result = await mcp_connector.aconvert_with_mcp(source, "javascript", "python")
+        self.assertEqual(result["chunks"], 2)
+        self.assertFalse(result.get("truncated"))
+
+
+class ChunkedConversionTests(LLMTestCase):
+    async def test_small_units_are_batched_within_the_request_cap(self):
+        source = "import math\n\n" + "".join(f"def f{i}(x):\n    return x + {i}\n\n" for i in range(20))
+        llm = self.script_llm(lambda messages, max_tokens: {"text": "// part"})
+        with mock.patch.object(mcp_connector, "CHUNK_TOKENS", 20), \
+                mock.patch.object(mcp_connector, "CHUNK_MAX_REQUESTS", 5):
+            result = await mcp_connector.aconvert_with_mcp(source, "python", "javascript", chunked=True)
+        self.assertEqual(result["chunks"], 5)
+        self.assertEqual(llm.call_count, 6)  # five groups and the header
+        parts = [c.args[0][-1]["content"] for c in llm.call_args_list if "Convert ONLY" in c.args[0][-1]["content"]]
+        # the part to convert is the last code block; the one before lists every signature
+        self.assertEqual(sum(part.rsplit("```python", 1)[1].count("def f") for part in parts), 20)
+
+
+SAMPLES = {
+    "python": (
+        "import sys\nfrom math import sqrt\n\n# helpers\n@staticmethod\ndef area(r):\n    return 3.14 * r * r\n\n"
+        "class Shape:\n    def __init__(self):\n        self.n = 0\n\nx = area(2)\nprint(x)\n"
+    ),
+    "javascript": (
+        "'use strict';\nconst fs = require('fs');\n\n/* add */\nfunction add(a, b) {\n  return `${a}}`;\n}\n\n"
+        "const mul = (a, b) => {\n  return a * b;\n};\n\nconsole.log(add(1, 2));\n"
+    ),
+    "go": (
+        "package main\n\nimport \"fmt\"\n\ntype P struct {\n\tX int\n}\n\nfunc (p *P) Get() int {\n\treturn p.X\n}\n\n"
+        "func main()\n{\n\tfmt.Println(\"}\")\n}\n"
+    ),
+    "cpp": (
+        "#include <bits/stdc++.h>\nusing namespace std;\n\n// max\ntemplate <typename T>\nT mx(T a, T b) {\n"
+        "    return a > b ? a : b;\n}\n\ntemplate <typename T,\n          typename U>\n[[nodiscard]] U conv(T a) {\n"
+        "    return U(a);\n}\n\nint main() {\n    cout << mx(1, 2) << endl;\n}\n"
+    ),
+    "java": (
+        "import java.util.*;\n\n@SuppressWarnings(\"unchecked\")\npublic class Main {\n    @Override\n"
+        "    public String toString() { return \"\"; }\n    public static void main(String[] args) {\n"
+        "        System.out.println(1);\n    }\n}\n"
+    ),
+}
+
+
+class SplitUnitsTests(SimpleTestCase):
+    def defs(self, lang):
+        return [u for u in split_units(SAMPLES[lang], lang) if u["kind"] == UNIT_DEF]
+
+    def test_join_gives_back_the_source(self):
+        for lang, source in SAMPLES.items():
+            with self.subTest(lang=lang):
+                self.assertEqual(join_units(split_units(source, lang)), source)
+
+    def test_definitions_are_found(self):
+        self.assertEqual([u["name"] for u in self.defs("python")], ["area", "Shape"])
+        self.assertEqual([u["name"] for u in self.defs("javascript")], ["add", "mul"])
+        self.assertEqual([(u["name"], u["owner"]) for u in self.defs("go")], [("P", ""), ("Get", "P"), ("main", "")])
+
+    def test_template_and_attributes_stay_with_the_definition(self):
+        mx, conv, _ = self.defs("cpp")
+        self.assertTrue(mx["text"].lstrip().startswith("// max\ntemplate <typename T>\nT mx"))
+        self.assertEqual(mx["signature"], "template <typename T> T mx(T a, T b)")
+        self.assertIn("typename U>\n[[nodiscard]] U conv", conv["text"])
+
+    def test_java_class_is_one_definition(self):
+        (main,) = self.defs("java")
+        self.assertTrue(main["text"].lstrip().startswith("@SuppressWarnings"))
+
+    def test_unsplittable_sources(self):
+        self.assertEqual(split_units("def broken(:", "python"), [])
+        self.assertEqual(split_units("10 PRINT 1", "basic"), [])
+
+    def test_group_units_keeps_order_and_text(self):
+        units = split_units(SAMPLES["python"], "python")
+        groups = group_units(units, 60)
+        self.assertEqual(join_units(groups), SAMPLES["python"])
+        self.assertLess(len(groups), len(units))
+        self.assertEqual(len(group_units(units, 1)), len(units))
+
+
+OLD_PY = "import sys\n\ndef area(r):\n    return r * r\n\ndef get_name():\n    return 'x'\n\nprint(area(2))\n"
+OLD_GO = (
+    "// generated\npackage main\n\nimport \"fmt\"\n\nfunc area(r float64) float64 {\n\treturn r * r\n}\n\n"
+    "func getName() string {\n\treturn \"x\"\n}\n\nfunc main() {\n\tfmt.Println(area(2))\n}\n"
+)
+
+
+class IncrementalPlanTests(SimpleTestCase):
+    def plan(self, new_source, old_source=OLD_PY, target=OLD_GO):
+        return plan_incremental(split_units(old_source, "python"), split_units(new_source, "python"),
+                                split_units(target, "go"))
+
+    def test_changed_definition_replaces_its_translation(self):
+        plan, reason = self.plan(OLD_PY.replace("r * r", "abs(r) * r"))
+        self.assertIsNone(reason)
+        self.assertEqual((plan["changed"], plan["added"], plan["removed"], plan["reused"]), (["area"], [], [], 1))
+        self.assertEqual([u["name"] for u in plan["convert"]], ["area"])
+
+    def test_renamed_case_still_matches(self):
+        plan, _ = self.plan(OLD_PY.replace("'x'", "'y'"))
+        self.assertEqual(plan["changed"], ["get_name"])
+
+    def test_added_and_removed_definitions(self):
+        new = OLD_PY.replace("def get_name():\n    return 'x'\n", "def perimeter(r):\n    return 2 * r\n")
+        plan, _ = self.plan(new)
+        self.assertEqual((plan["added"], plan["removed"]), (["perimeter"], ["get_name"]))
+        self.assertEqual(len(plan["delete"]), 1)
+
+    def test_unsafe_edits_are_refused(self):
+        cases = {
+            "imports or top-level statements changed": OLD_PY.replace("import sys", "import os"),
+            "duplicate definition area": OLD_PY + "\ndef area(r):\n    return 0\n",
+        }
+        for reason, new in cases.items():
+            with self.subTest(reason=reason):
+                self.assertEqual(self.plan(new), (None, reason))
+        plan, reason = self.plan(OLD_PY.replace("'x'", "'y'"), target=OLD_GO.replace("getName", "label"))
+        self.assertEqual(reason, "get_name not found in the previous translation")
+
+    def test_apply_replaces_the_header_and_keeps_comments(self):
+        plan, _ = self.plan(OLD_PY.replace("r * r", "abs(r) * r"))
+        body = "func area(r float64) float64 {\n\treturn math.Abs(r) * r\n}"
+        code = apply_incremental(split_units(OLD_GO, "go"), plan, {id(plan["convert"][0]): body},
+                                 header='package main\n\nimport (\n\t"fmt"\n\t"math"\n)')
+        self.assertTrue(code.startswith('// generated\npackage main\n\nimport (\n\t"fmt"\n\t"math"\n)\n\nfunc area'))
+        self.assertIn("math.Abs(r)", code)
+        self.assertIn("func getName() string", code)
+        self.assertEqual(code.count("import"), 1)
+
+
+class ConvertViewTests(LLMTestCase):
+    async def test_conversion_is_cached_and_remembered(self):
+        self.script_llm(lambda messages, max_tokens: {"text": "```python\nprint(1)\n```"})
+        body = json.dumps({"source_code": "console.log(1);", "source_lang": "javascript", "target_lang": "python"})
+        first = (await self.async_client.post("/api/convert/", body, content_type="application/json")).json()
+        second = (await self.async_client.post("/api/convert/", body, content_type="application/json")).json()
+        self.assertEqual((first["converted_code"], first["cache"], second["cache"]), ("print(1)", "miss", "memory"))
+        self.assertEqual(mcp_connector.load_history(first["history_id"]), ("console.log(1);", "print(1)"))
+
+
+class IncrementalConversionTests(LLMTestCase):
+    async def test_header_is_regenerated_for_spliced_code(self):
+        def reply(messages, max_tokens):
+            if "top of the" in messages[-1]["content"]:
+                self.assertIn("math.Abs", messages[-1]["content"])
+                return {"text": '```go\npackage main\n\nimport (\n\t"fmt"\n\t"math"\n)\n```'}
+            return {"text": "func area(r float64) float64 {\n\treturn math.Abs(r) * r\n}"}
+
+        llm = self.script_llm(reply)
+        result = await mcp_connector.aconvert_incremental(OLD_PY.replace("r * r", "abs(r) * r"), "python", "go",
+                                                          OLD_PY, OLD_GO)
+        self.assertEqual(llm.call_count, 2)
+        self.assertIn('\t"math"\n', result["converted_code"])
+        self.assertEqual(result["incremental"]["changed"], ["area"])
+
+
+class FeedbackTests(TestCase):
+    def setUp(self):
+        # rows are written by the explicit flush() below, inside the test's transaction
+        patcher = mock.patch.object(feedback_writer, "_ensure_thread")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def refine(self, code="print(1)", feedback="use f-strings"):
+        response = self.client.post("/api/refine/", json.dumps({
+            "converted_code": code, "feedback": feedback, "source_lang": "js", "target_lang": "python",
+        }), content_type="application/json")
+        feedback_writer.flush()
+        return response.json()
+
+    def test_mock_refinements_are_not_stored(self):
+        with mock.patch.object(mcp_connector, "MOCK_MCP", True):
+            self.assertFalse(self.refine()["reused"])
+            self.assertFalse(self.refine()["reused"])
+        self.assertEqual(Feedback.objects.count(), 0)
+
+    def test_real_refinement_is_reused(self):
+        refined = {"converted_code": "print(f'{1}')", "notes": "refined via Groq LLM", "mock": False}
+        with mock.patch("converter_app.views.arefine_with_feedback", new_callable=mock.AsyncMock,
+                        return_value=refined):
+            self.assertFalse(self.refine()["reused"])
+        self.assertEqual(find_refinement("print(1)  \n", "use   f-strings", "js", "python"), "print(f'{1}')")
+        self.assertTrue(self.refine()["reused"])
+
+    def test_migration_hashes_match_the_models(self):
+        migration = importlib.import_module("converter_app.migrations.0002_feedback_lookup_hashes")
+        for text in ("", "a = 1  \r\nb = 2\n\n", "  fix   the\tloop "):
+            self.assertEqual(migration.code_hash(text), code_hash(text))
+            self.assertEqual(migration.feedback_hash(text), feedback_hash(text))
+
+
+class DiffTestViewTests(SimpleTestCase):
+    def post(self, **fields):
+        data = dict({"source_code": "print(1)", "source_lang": "python", "converted_code": "console.log(1);",
+                     "converted_lang": "javascript", "vectors": [""]}, **fields)
+        return self.client.post("/api/diff_test/", json.dumps(data), content_type="application/json")
+
+    def test_run_timeout(self):
+        self.assertEqual(run_timeout({}), min(10.0, DIFFTEST_MAX_TIMEOUT))
+        self.assertEqual(run_timeout({"timeout": "2.5"}), min(2.5, DIFFTEST_MAX_TIMEOUT))
+        self.assertEqual(run_timeout({"timeout": 1e9}), DIFFTEST_MAX_TIMEOUT)
+        for bad in ("soon", -1, 0, "nan", True, [3]):
+            with self.subTest(timeout=bad), self.assertRaises(DiffTestError):
+                run_timeout({"timeout": bad})
+
+    def test_bad_timeout_is_a_400(self):
+        response = self.post(timeout="soon")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("timeout", response.json()["error"])
+
+    @skipUnless(HAS_NODE, "node is not installed")
+    def test_vectors_are_compared(self):
+        report = self.post(vectors=["", {"stdin": "x"}], timeout=5).json()
+        self.assertEqual((report["all_passed"], report["passed"]), (True, 2))
+
+
+class ConvertAndVerifyViewTests(SimpleTestCase):
+    def test_bad_timeout_is_a_400(self):
+        response = self.client.post("/api/convert_and_verify/", json.dumps({
+            "source_code": "print(1)", "source_lang": "python", "target_lang": "javascript", "timeout": "x",
+        }), content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("timeout", response.json()["error"])
+
+
+@mock.patch.object(validators, "ENABLE_LOCAL_EXEC", True)
+class ValidatorTests(SimpleTestCase):
+    def test_python_run(self):
+        self.assertEqual(validators.run_python_code("print('ok')"), (True, "ok\n"))
+        self.assertFalse(validators.run_python_code("raise SystemExit(2)")[0])
+
+
+class ColdStartTests(SimpleTestCase):
+    async def _start(self, cmd):
+        proc = await astart_process({"lang": "python", "cmd": cmd}, tempfile.gettempdir(), merge_stderr=False)
+        out, err = await proc.communicate()
+        return proc, out.decode(), err.decode()
+
+    async def test_limits_are_applied_before_exec(self):
+        probe = "import resource; print(*resource.getrlimit(resource.RLIMIT_FSIZE))"
+        proc, out, _ = await self._start([sys.executable, "-c", probe])
+        self.assertEqual(proc.returncode, 0)
+        self.assertEqual(out.split(), [str(sandbox.RUN_MAX_FILE_MB * sandbox.MB)] * 2)
+        self.assertEqual(proc.usage["exit_code"], 0)
+
+    async def test_missing_command_exits_127(self):
+        proc, _, err = await self._start(["no-such-command-here"])
+        self.assertEqual(proc.returncode, 127)
+        self.assertIn("no-such-command-here", err)
+
+    async def test_only_the_program_is_billed(self):
+        proc, _, _ = await self._start(["true"])
+        self.assertLess(proc.usage["cpu_ms"], 15)  # no interpreter in front of the program
+        self.assertIsNone(proc.usage["peak_rss_kb"])  # under our own RSS, so not measurable
+
+    async def test_peak_rss_above_the_floor_is_reported(self):
+        floor_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        grow = f"b = bytearray({floor_kb + 64 * 1024} * 1024)\nb[::4096] = b'x' * len(b[::4096])"
+        proc, _, _ = await self._start([sys.executable, "-c", grow])
+        self.assertEqual(proc.returncode, 0)
+        self.assertGreater(proc.usage["peak_rss_kb"], floor_kb)
+
+    def test_limited_command(self):
+        argv = sandbox.limited_command(["./main"], {"cpu": 2, "data": 0, "core": 0})
+        self.assertEqual(argv[1:], ["--cpu=2:3", "--core=0:0", "--", "./main"])
+        argv = sandbox.limited_command(["./main"], {"core": 0, "cgroup": "/cg/run-1"})
+        self.assertEqual([argv[0], argv[3]], ["sh", "/cg/run-1/cgroup.procs"])
+        self.assertEqual(argv[4:], [sandbox._PRLIMIT, "--core=0:0", "--", "./main"])
+        with mock.patch.object(sandbox, "_PRLIMIT", None):
+            self.assertIsNone(sandbox.limited_command(["./main"], {"core": 0}))
+
+    async def test_run_started_after_cancel_is_killed(self):
+        started = []
+
+        def slow_start(*args):
+            time.sleep(0.2)
+            started.append(subprocess.Popen(["sleep", "60"], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                            start_new_session=True))
+            return started[0]
+
+        build = {"lang": "js", "cmd": ["node", "main.js"], "source_path": "main.js"}
+        with mock.patch("converter_app.warm_pool.warm_pool.start", side_effect=slow_start):
+            task = asyncio.create_task(astart_process(build, tempfile.gettempdir()))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            await asyncio.sleep(0.3)
+        self.assertEqual(await asyncio.to_thread(started[0].wait, 5), -9)
+
+
+class CacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = ConversionCache(disk_dir=tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.cache.disk_dir, True)
+
+    def test_key_ignores_line_endings_but_not_the_model(self):
+        key = make_key("x = 1  \r\ny = 2\n", "Python", "js", "m1", "v1")
+        self.assertEqual(key, make_key("x = 1\ny = 2", "python", "js", "m1", "v1"))
+        self.assertNotEqual(key, make_key("x = 1\ny = 2", "python", "js", "m2", "v1"))
+        self.assertNotEqual(key, make_key("x = 1\ny = 2", "python", "js", "m1", "v2"))
+        self.assertNotEqual(key, make_key("x = 1\n    y = 2", "python", "js", "m1", "v1"))
+
+    def test_memory_then_disk_tier(self):
+        key = make_key("print(1)", "python", "js", "m", "v")
+        self.assertEqual(self.cache.get(key), (None, None))
+        self.cache.set(key, {"converted_code": "console.log(1);"})
+        self.assertEqual(self.cache.get(key), ({"converted_code": "console.log(1);"}, "memory"))
+        self.cache.clear_memory()
+        self.assertEqual(self.cache.get(key)[1], "disk")
+        self.assertEqual(self.cache.get(key)[1], "memory")  # promoted
+        stats = self.cache.stats()
+        self.assertEqual((stats["memory_hits"], stats["disk_hits"], stats["misses"]), (2, 1, 1))
+
+    def test_memory_tier_evicts_least_recently_used(self):
+        cache = ConversionCache(memory_max_bytes=100, disk_dir="")
+        for key in "abc":
+            cache.set(key, {"code": key * 30})
+            cache.get("a")
+        self.assertEqual([k for k in "abc" if cache.get(k)[0]], ["a", "c"])
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_expired_disk_entries_are_dropped(self):
+        self.cache.disk_ttl = 60
+        self.cache.set("ab12", {"code": 1})
+        self.cache.clear_memory()
+        path = self.cache._path("ab12")
+        os.utime(path, (0, 0))
+        self.assertEqual(self.cache.get("ab12"), (None, None))
+        self.assertFalse(os.path.exists(path))
+
+    async def test_async_access_keeps_disk_io_off_the_loop(self):
+        disk_threads = []
+        disk_get, disk_put = self.cache._disk_get, self.cache._disk_put
+
+        def on_thread(method):
+            def call(*args):
+                disk_threads.append(threading.current_thread())
+                return method(*args)
+            return call
+
+        with mock.patch.object(self.cache, "_disk_get", on_thread(disk_get)), \
+                mock.patch.object(self.cache, "_disk_put", on_thread(disk_put)):
+            await self.cache.aset("cd34", {"code": 1})
+            self.assertEqual(await self.cache.aget("cd34"), ({"code": 1}, "memory"))  # no disk read
+            self.cache.clear_memory()
+            self.assertEqual(await self.cache.aget("cd34"), ({"code": 1}, "disk"))
+            self.assertEqual(await self.cache.aget("ef56"), (None, None))
+        self.assertEqual(len(disk_threads), 3)
+        self.assertNotIn(threading.current_thread(), disk_threads)
+        stats = self.cache.stats()
+        self.assertEqual((stats["memory_hits"], stats["disk_hits"], stats["misses"], stats["stores"]), (1, 1, 1, 1))
+
+
+class LimiterTests(SimpleTestCase):
+    def limiter(self, **kwargs):
+        options = dict(max_concurrency=1, max_queue=4, queue_timeout=0.05, rate_per_minute=0, burst=1)
+        return ConcurrencyLimiter(**dict(options, **kwargs))
+
+    async def test_waiter_times_out_with_busy(self):
+        limiter = self.limiter()
+        await limiter.acquire()
+        with self.assertRaises(LimiterBusy):
+            await limiter.acquire()
+        stats = limiter.stats()
+        self.assertEqual((stats["timeouts"], stats["waiting"], stats["active"]), (1, 0, 1))
+
+    def test_sync_waiter_times_out_with_busy(self):
+        limiter = self.limiter()
+        limiter.acquire_sync()
+        with self.assertRaises(LimiterBusy):
+            limiter.acquire_sync()
+        self.assertEqual(limiter.stats()["timeouts"], 1)
+
+    async def test_full_queue_rejects_immediately(self):
+        limiter = self.limiter(max_queue=0, queue_timeout=5)
+        await limiter.acquire()
+        with self.assertRaises(LimiterBusy) as ctx:
+            await asyncio.wait_for(limiter.acquire(), 1)
+        self.assertGreaterEqual(ctx.exception.retry_after, 1)
+        self.assertEqual(limiter.stats()["rejected"], 1)
+
+    async def test_release_admits_waiters_in_order(self):
+        limiter = self.limiter(queue_timeout=5)
+        order = []
+
+        async def worker(name):
+            async with limiter.slot():
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        await limiter.acquire()
+        tasks = [asyncio.create_task(worker(name)) for name in "abc"]
+        await asyncio.sleep(0.01)
+        limiter.release()
+        await asyncio.gather(*tasks)
+        self.assertEqual(order, ["a", "b", "c"])
+        self.assertEqual(limiter.stats()["active"], 0)
+
+    async def test_rate_limit_delays_beyond_the_burst(self):
+        limiter = self.limiter(max_concurrency=4, queue_timeout=2, rate_per_minute=600)
+        await limiter.acquire()
+        started = asyncio.get_running_loop().time()
+        await limiter.acquire()
+        self.assertGreater(asyncio.get_running_loop().time() - started, 0.05)
+
+
+class BusyViewTests(LLMTestCase):
+    async def test_limiter_busy_is_a_429(self):
+        patcher = mock.patch.object(mcp_connector, "_acall_llm_system",
+                                    side_effect=LimiterBusy("LLM queue is full", retry_after=2.4))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        response = await self.async_client.post("/api/convert/", json.dumps({
+            "source_code": "print(1)", "source_lang": "python", "target_lang": "javascript",
+        }), content_type="application/json")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "2")
+        self.assertEqual(response.json()["retry_after"], 2.4)
+
+
+def _stream_client(*deltas):
+    """Stand-in AsyncGroq client whose streamed completion yields `deltas`."""
+    async def create(**kwargs):
+        async def chunks():
+            for i, delta in enumerate(deltas):
+                choice = SimpleNamespace(delta=SimpleNamespace(content=delta),
+                                         finish_reason="stop" if i == len(deltas) - 1 else None)
+                yield SimpleNamespace(choices=[choice])
+        return chunks()
+
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+class FenceStripperTests(SimpleTestCase):
+    REPLIES = [
+        "```python\nprint(1)\n```",
+        "  ```js\nconsole.log(`x`);\n```\n",
+        "print(1)\nprint(2)",
+        "```\nint x = 1;\n```",
+        "``` broken fence\nx\n```",
+        "```go\n",
+    ]
+
+    def stream(self, parts):
+        stripper = mcp_connector.FenceStripper()
+        return "".join(stripper.feed(part) for part in parts) + stripper.finish()
+
+    def test_any_split_matches_strip_fences(self):
+        for reply in self.REPLIES:
+            expected = mcp_connector._strip_fences(reply)
+            self.assertEqual(self.stream(reply), expected, reply)  # one character at a time
+            for cut in range(len(reply) + 1):
+                self.assertEqual(self.stream([reply[:cut], reply[cut:]]), expected, (reply, cut))
+
+    def test_code_is_released_before_the_closing_fence(self):
+        stripper = mcp_connector.FenceStripper()
+        self.assertEqual(stripper.feed("```py"), "")
+        self.assertEqual(stripper.feed("thon\nprint(1)\n"), "print(1)")
+        self.assertEqual(stripper.feed("``"), "")
+        self.assertEqual(stripper.feed("`"), "")
+        self.assertEqual(stripper.finish(), "")
+
+
+class StreamConvertTests(LLMTestCase):
+    async def collect(self):
+        return [event async for event in mcp_connector.astream_convert("print(1)", "python", "javascript")]
+
+    async def test_chunks_add_up_to_the_cached_result(self):
+        client = _stream_client("```java", "script\ncons", "ole.log(1);", "\n``", "`")
+        with mock.patch.object(mcp_connector, "GROQ_KEY", "test"), \
+                mock.patch.object(mcp_connector, "get_async_client", return_value=client):
+            events = await self.collect()
+            again = await self.collect()
+        done = events[-1]
+        self.assertEqual(done["type"], "done")
+        self.assertEqual("".join(e["text"] for e in events if e["type"] == "chunk"), "console.log(1);")
+        self.assertEqual((done["converted_code"], done["cache"]), ("console.log(1);", "miss"))
+        self.assertEqual([e["type"] for e in again], ["chunk", "done"])
+        self.assertEqual(again[-1]["cache"], "memory")
+        self.cache.clear_memory()
+        self.assertEqual((await self.collect())[-1]["cache"], "disk")
+
+
+class SingleFlightTests(SimpleTestCase):
+    async def test_concurrent_callers_share_one_call(self):
+        flight, release, calls = SingleFlight(), asyncio.Event(), []
+
+        async def work():
+            calls.append(1)
+            await release.wait()
+            return {"value": 42}
+
+        tasks = [asyncio.create_task(flight.ado("k", work)) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        release.set()
+        results = await asyncio.gather(*tasks)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(shared for _, shared in results), [False] + [True] * 4)
+        self.assertEqual(flight.stats(), {"leaders": 1, "deduplicated": 4, "in_flight": 0})
+
+    async def test_leader_error_reaches_waiters(self):
+        flight, release = SingleFlight(), asyncio.Event()
+
+        async def work():
+            await release.wait()
+            raise ValueError("upstream failed")
+
+        tasks = [asyncio.create_task(flight.ado("k", work)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        release.set()
+        for outcome in await asyncio.gather(*tasks, return_exceptions=True):
+            self.assertIsInstance(outcome, ValueError)
+
+    async def test_waiter_takes_over_from_a_cancelled_leader(self):
+        flight, release = SingleFlight(), asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return "done"
+
+        leader = asyncio.create_task(flight.ado("k", work))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(flight.ado("k", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        await asyncio.sleep(0.01)
+        release.set()
+        self.assertEqual(await waiter, ("done", False))
+
+    def test_threads_share_one_call(self):
+        flight, release, calls, results = SingleFlight(), threading.Event(), [], []
+
+        def work():
+            calls.append(1)
+            release.wait(5)
+            return "done"
+
+        threads = [threading.Thread(target=lambda: results.append(flight.do("k", work))) for _ in range(4)]
+        for t in threads:
+            t.start()
+        while flight.stats()["deduplicated"] < 3:
+            release.wait(0.01)
+        release.set()
+        for t in threads:
+            t.join()
+        self.assertEqual((len(calls), sorted(results)), (1, [("done", False)] + [("done", True)] * 3))
+
+
+class ConvertCacheTests(LLMTestCase):
+    async def test_results_come_back_from_each_tier(self):
+        llm = self.script_llm(lambda messages, max_tokens: {"text": "print(1)"})
+        convert = lambda: mcp_connector.aconvert_with_mcp("console.log(1);", "javascript", "python", chunked=False)
+        self.assertEqual((await convert())["cache"], "miss")
+        self.assertEqual((await convert())["cache"], "memory")
+        self.cache.clear_memory()
+        self.assertEqual((await convert())["cache"], "disk")
+        self.assertEqual(llm.call_count, 1)
+
+
+class CoalescedConversionTests(LLMTestCase):
+    async def test_identical_requests_make_one_llm_call(self):
+        release = asyncio.Event()
+
+        async def call(messages, **kwargs):
+            await release.wait()
+            return {"mock": False, "truncated": False, "model": mcp_connector.MODEL, "text": "print(1)"}
+
+        patcher = mock.patch.object(mcp_connector, "_acall_llm_system", side_effect=call)
+        llm = patcher.start()
+        self.addCleanup(patcher.stop)
+        tasks = [asyncio.create_task(mcp_connector.aconvert_with_mcp("console.log(1);", "javascript", "python"))
+                 for _ in range(3)]
+        await asyncio.sleep(0.01)
+        release.set()
+        results = await asyncio.gather(*tasks)
+        self.assertEqual(llm.call_count, 1)
+        self.assertEqual({r["converted_code"] for r in results}, {"print(1)"})
+        self.assertEqual(sorted(r["coalesced"] for r in results), [False, True, True])
+
+
+class BatchTests(LLMTestCase):
+    async def collect(self, files, concurrency=2):
+        return [json.loads(line) async for line in batch.stream_batch(files, "python", concurrency=concurrency)]
+
+    async def test_bounded_fan_out_with_per_file_errors(self):
+        running = peak = 0
+
+        async def call(messages, **kwargs):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return {"mock": False, "truncated": False, "model": mcp_connector.MODEL, "text": "print(1)"}
+
+        patcher = mock.patch.object(mcp_connector, "_acall_llm_system", side_effect=call)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        files = batch.files_from_json(
+            [{"path": f"src/f{i}.js", "source_code": f"console.log({i});"} for i in range(5)]
+            + [{"path": "empty.js", "source_code": " "}, {"path": "notes.txt", "source_code": "hi"}])
+        lines = await self.collect(files)
+        summary = lines.pop()
+        self.assertEqual((summary["ok"], summary["failed"], summary["concurrency"]), (5, 2, 2))
+        self.assertEqual(peak, 2)
+        by_path = {line["path"]: line for line in lines}
+        self.assertEqual(by_path["src/f3.js"]["output_path"], "src/f3.py")
+        self.assertEqual(by_path["empty.js"]["error"], "Empty source")
+        self.assertEqual(by_path["notes.txt"]["error"], "Unknown source language")
+
+    async def test_busy_limiter_is_retried(self):
+        replies = [LimiterBusy("busy", retry_after=0), {"mock": False, "truncated": False,
+                                                        "model": mcp_connector.MODEL, "text": "print(1)"}]
+        patcher = mock.patch.object(mcp_connector, "_acall_llm_system", side_effect=replies)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        lines = await self.collect(batch.files_from_json([{"path": "a.js", "source_code": "console.log(1);"}]))
+        self.assertEqual((lines[0]["status"], lines[0]["converted_code"]), ("ok", "print(1)"))
+
+    def test_archive_members(self):
+        data = io.BytesIO()
+        with zipfile.ZipFile(data, "w") as zf:
+            zf.writestr("pkg/main.go", "package main")
+            zf.writestr("README.md", "# docs")
+            zf.writestr("big.py", "x" * (batch.BATCH_MAX_FILE_BYTES + 1))
+        data.seek(0)
+        data.name = "src.zip"
+        files = batch.files_from_archive(data)
+        self.assertEqual([(f["path"], f["source_lang"]) for f in files], [("pkg/main.go", "go"), ("big.py", "python")])
+        self.assertIsNone(files[1]["source_code"])
+
+    async def test_view_streams_ndjson(self):
+        self.script_llm(lambda messages, max_tokens: {"text": "print(1)"})
+        response = await self.async_client.post("/api/convert_batch/", json.dumps({
+            "files": [{"path": "a.js", "source_code": "console.log(1);"}], "target_lang": "python",
+        }), content_type="application/json")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = [json.loads(line) async for line in response.streaming_content]
+        self.assertEqual([line.get("status") for line in lines], ["ok", None])
+
+    async def test_view_rejects_bad_input(self):
+        for body in ({"files": [], "target_lang": "python"}, {"files": [{"source_code": "x"}]}):
+            response = await self.async_client.post("/api/convert_batch/", json.dumps(body),
+                                                    content_type="application/json")
+            self.assertEqual(response.status_code, 400)
+
+
+class CompareOutputsTests(SimpleTestCase):
+    def compare(self, a, b, **options):
+        return deep_compare_outputs(a, b, **options)
+
+    def test_exact_ignores_line_endings_and_trailing_blank_lines(self):
+        result = self.compare("a \r\nb\n\n\n", "a\nb")
+        self.assertEqual((result["consistent"], result["lines_compared"]), (True, 2))
+        self.assertFalse(self.compare("a\n\nb", "a\nb")["consistent"])  # inner blank lines count
+
+    def test_first_difference_stops_the_scan(self):
+        def converted():
+            yield from ("1\n", "2\n", "x\n")
+            raise AssertionError("read past the first difference")
+
+        result = self.compare("1\n2\n3\n4\n", converted())
+        self.assertEqual(result["first_difference"], {"line": 3, "original": "3", "converted": "x"})
+        self.assertEqual(result["diff_preview"].splitlines(),
+                         ["--- original", "+++ converted", "@@ line 3 @@", " 1", " 2", "-3", "+x"])
+
+    def test_missing_lines_are_reported_as_end_of_output(self):
+        result = self.compare("1\n2", "1")
+        self.assertEqual(result["first_difference"], {"line": 2, "original": "2", "converted": None})
+        self.assertIn("+ <end of output>", result["diff_preview"])
+
+    def test_whitespace_and_numeric_modes(self):
+        self.assertTrue(self.compare("a  b\n\nc", "a b\nc", mode="whitespace")["consistent"])
+        self.assertFalse(self.compare("a  b", "a b")["consistent"])
+        self.assertTrue(self.compare("pi 3.1415927", "pi 3.14159265", mode="numeric")["consistent"])
+        self.assertFalse(self.compare("pi 3.14", "pi 3.15", mode="numeric")["consistent"])
+        self.assertTrue(self.compare("0.1", "0.11", mode="numeric", float_tolerance=0.05)["consistent"])
+        self.assertFalse(self.compare("nan", "nan2", mode="numeric")["consistent"])
+
+    def test_ignore_order(self):
+        self.assertTrue(self.compare("b\na\nc", "c\nb\na", ignore_order=True)["consistent"])
+        self.assertTrue(self.compare("2.0000001 x\n1", "1\n2 x", mode="numeric", ignore_order=True)["consistent"])
+        result = self.compare("a\na", "a\nb", ignore_order=True)
+        self.assertEqual((result["consistent"], result["first_difference"]["line"]), (False, None))
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            self.compare("", "", mode="fuzzy")
+
+
+DOUBLE_PY = "print(int(input()) * 2)"
+
+
+class DiffTestTests(SimpleTestCase):
+    async def diff(self, converted, vectors, **options):
+        return await adiff_test("python", DOUBLE_PY, "python", converted, vectors, timeout=5, **options)
+
+    async def test_all_vectors_pass(self):
+        report = await self.diff("n = int(input())\nprint(n + n)", ["1", "2", "-7"])
+        self.assertEqual((report["all_passed"], report["passed"]), (True, 3))
+        self.assertEqual([v["source"]["stdout"] for v in sorted(report["vectors"], key=lambda v: v["index"])],
+                         ["2\n", "4\n", "-14\n"])
+
+    async def test_failures_without_early_exit(self):
+        report = await self.diff("n = int(input())\nprint(0 if n == 3 else n * 2)", ["1", "3", "4"],
+                                 early_exit=False)
+        self.assertEqual((report["passed"], report["failed"], report["skipped"]), (2, 1, 0))
+        failure = next(v for v in report["vectors"] if v["status"] == "fail")
+        self.assertEqual((failure["index"], failure["reason"]), (1, "output differs"))
+        self.assertEqual(failure["first_difference"], {"line": 1, "original": "6", "converted": "0"})
+
+    async def test_early_exit_skips_the_rest(self):
+        report = await self.diff("print(0)", [str(i) for i in range(1, 9)], concurrency=1)
+        self.assertEqual(report["failed"], 1)
+        self.assertGreater(report["skipped"], 0)
+        self.assertEqual(report["passed"] + report["failed"] + report["skipped"], 8)
+
+    async def test_crash_is_a_failure(self):
+        report = await self.diff("raise SystemExit(3)", ["1"])
+        self.assertEqual(report["vectors"][0]["reason"], "exit status differs (0 vs 3)")
+
+    async def test_long_output_is_compared_from_the_spill_file(self):
+        printer = "n = int(input())\nfor i in range(20000):\n    print(i, 'x' * 10)\n"
+        report = await adiff_test("python", printer, "python", printer, ["1"], timeout=10)
+        self.assertTrue(report["all_passed"])
+        report = await adiff_test("python", printer, "python", printer + "print('extra')", ["1"], timeout=10)
+        self.assertEqual(report["vectors"][0]["first_difference"]["line"], 20001)
+
+    @skipUnless(shutil.which("gcc"), "gcc is not installed")
+    async def test_compile_error_is_reported_without_running(self):
+        report = await adiff_test("python", DOUBLE_PY, "c", "int main( {", ["1"], timeout=5)
+        self.assertFalse(report["all_passed"])
+        self.assertFalse(report["compile"]["converted"]["ok"])
+        self.assertTrue(report["compile"]["converted"]["compile_error"])
+        self.assertEqual((report["vectors"], report["skipped"]), ([], 1))
+
+    def test_vectors_from_json(self):
+        self.assertEqual(vectors_from_json(["1", {"stdin": "2"}, {}]), ["1", "2", ""])
+        for bad in ([], "1", [1], [{"stdin": 2}]):
+            with self.subTest(vectors=bad), self.assertRaises(DiffTestError):
+                vectors_from_json(bad)
+
+
+class WarmPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.pool = WarmPool(size=1, max_uses=3)
+        self.addCleanup(self.shutdown)
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+
+    def shutdown(self):
+        for zygote in self.pool._zygotes:
+            zygote.close()
+        for spares in self.pool._node.values():
+            for worker in spares:
+                worker.discard()
+
+    def script(self, name, code):
+        path = os.path.join(self.dir, name)
+        with open(path, "w") as f:
+            f.write(code)
+        return path
+
+    def warm_start(self, lang, path):
+        """Start on a warm worker, waiting for the pool to fill after the first (cold) request."""
+        handle = self.pool.start(lang, path, self.dir)
+        deadline = time.monotonic() + 10
+        while handle is None and time.monotonic() < deadline:
+            time.sleep(0.05)
+            handle = self.pool.start(lang, path, self.dir)
+        self.assertIsNotNone(handle, "no warm worker became ready")
+        return handle
+
+    def test_python_runs_in_a_fresh_child(self):
+        path = self.script("main.py", "import json, random, sys\n"
+                                      "print(json.dumps([input(), __name__, sys.argv[0]]))\n"
+                                      "print(random.random(), file=sys.stderr)\n")
+        outputs = []
+        for _ in range(2):
+            handle = self.warm_start("python", path)
+            self.assertIsInstance(handle, WarmProcess)
+            out, err = handle.communicate(b"hi\n", timeout=10)
+            self.assertEqual(handle.returncode, 0)
+            self.assertEqual(json.loads(out), ["hi", "__main__", path])
+            outputs.append(err)
+            self.assertIsNotNone(handle.usage["cpu_ms"])
+        self.assertNotEqual(outputs[0], outputs[1])  # random state is not shared
+
+    def test_python_failure_looks_like_a_cold_run(self):
+        path = self.script("main.py", "def f():\n    raise ValueError('boom')\nf()\n")
+        handle = self.warm_start("python", path)
+        _, err = handle.communicate(timeout=10)
+        self.assertEqual(handle.returncode, 1)
+        self.assertIn(f'File "{path}", line 3', err.decode())
+        self.assertNotIn("runpy", err.decode())
+
+    def test_kill_right_after_start(self):
+        path = self.script("main.py", "import time\ntime.sleep(60)\n")
+        for _ in range(3):
+            handle = self.warm_start("python", path)
+            handle.kill()  # may land before the child's setsid()
+            self.assertEqual(handle.wait(5), -9)
+            handle.stdout.close()
+            handle.stderr.close()
+
+    def test_kill_before_started_does_not_wait(self):
+        handle = WarmProcess(None, None, None)
+        began = time.monotonic()
+        handle.kill()
+        self.assertLess(time.monotonic() - began, 0.1)
+        child = subprocess.Popen(["sleep", "60"], start_new_session=True)
+        handle._set_started(child.pid)  # the pending SIGKILL goes out now
+        self.assertEqual(child.wait(5), -9)
+
+    def test_zygote_is_retired_after_max_uses(self):
+        path = self.script("main.py", "print(1)\n")
+        for _ in range(4):
+            self.warm_start("python", path).communicate(timeout=10)
+        stats = self.pool.stats()
+        self.assertEqual(stats["zygote_retired"], 1)
+        self.assertEqual(stats["zygote_spawns"], 2)
+
+    def test_dead_zygote_is_replaced(self):
+        self.warm_start("python", self.script("main.py", "pass\n")).communicate(timeout=10)
+        zygote = self.pool._zygotes[0]
+        zygote.proc.kill()
+        zygote.proc.wait()
+        self.pool.check_health()
+        self.assertEqual(self.pool.stats()["health_failures"], 1)
+        self.assertIsNot(self.pool._zygotes[0], zygote)
+
+    @skipUnless(HAS_NODE, "node is not installed")
+    def test_node_worker_runs_the_script(self):
+        path = self.script("main.js", "const fs = require('fs');\n"
+                                      "console.log(process.argv[1], fs.readFileSync(0, 'utf8').trim());\n")
+        handle = self.warm_start("js", path)
+        out, _ = handle.communicate(b"hi\n", timeout=10)
+        self.assertEqual((handle.returncode, out.decode().split()), (0, [path, "hi"]))
+
+    def test_disabled_pool_always_falls_back(self):
+        self.assertIsNone(WarmPool(size=0).start("python", self.script("main.py", ""), self.dir))
+
+
+class ExecutionEngineTests(SimpleTestCase):
+    def engine(self, **kwargs):
+        engine = ExecutionEngine(**dict({"max_concurrency": 1, "max_queue": 1, "queue_timeout": 5}, **kwargs))
+        self.addCleanup(lambda: engine._loop and engine._loop.call_soon_threadsafe(engine._loop.stop))
+        return engine
+
+    async def hold(self, engine, lang, release, on_position=None):
+        async with engine.slot(lang, on_position):
+            await release.wait()
+
+    async def test_queue_positions_and_rejection(self):
+        engine, release, positions = self.engine(), asyncio.Event(), []
+        first = asyncio.create_task(self.hold(engine, "python", release))
+        await asyncio.sleep(0.05)
+        second = asyncio.create_task(self.hold(engine, "python", release, lambda pos, eta: positions.append(pos)))
+        await asyncio.sleep(0.05)
+        with self.assertRaises(ExecutionBusy):
+            await self.hold(engine, "python", release)
+        self.assertEqual((positions, engine.stats()["waiting"]), ([0], 1))
+        release.set()
+        await asyncio.gather(first, second)
+        await asyncio.sleep(0.05)  # slots are handed back on the engine loop
+        stats = engine.stats()
+        self.assertEqual((stats["admitted"], stats["rejected"], stats["active"]), (2, 1, 0))
+
+    async def test_queue_timeout(self):
+        engine, release = self.engine(queue_timeout=0.1), asyncio.Event()
+        holder = asyncio.create_task(self.hold(engine, "python", release))
+        await asyncio.sleep(0.05)
+        with self.assertRaises(ExecutionBusy):
+            await self.hold(engine, "python", release)
+        release.set()
+        await holder
+        self.assertEqual((engine.stats()["timeouts"], engine.stats()["waiting"]), (1, 0))
+
+    async def test_saturated_language_does_not_block_others(self):
+        engine, release = self.engine(max_concurrency=2, lang_limits={"java": 1}), asyncio.Event()
+        tasks = []
+        for lang in ("java", "java", "python"):
+            tasks.append(asyncio.create_task(self.hold(engine, lang, release)))
+            await asyncio.sleep(0.05)
+        stats = engine.stats()
+        self.assertEqual((stats["active_by_lang"], stats["waiting"]), ({"java": 1, "python": 1}, 1))
+        release.set()
+        await asyncio.gather(*tasks)
+        self.assertEqual(engine.stats()["admitted"], 3)
+
+    async def test_run_and_timeout(self):
+        engine = self.engine()
+        result = await engine.arun("python", "print(input()[::-1])", stdin="abc\n")
+        self.assertEqual((result["returncode"], result["stdout"]), (0, "cba\n"))
+        self.assertIsNotNone(result["queue_ms"])
+        result = await engine.arun("python", "import time\ntime.sleep(30)", timeout=0.5)
+        self.assertTrue(result["timed_out"])
+        self.assertLess(result["metrics"]["wall_ms"], 5000)
+
+    def test_sync_run(self):
+        result = self.engine().run("py", "import sys\nsys.exit(4)")
+        self.assertEqual(result["returncode"], 4)
+        self.assertEqual(self.engine().run("cobol", "x")["unsupported"], True)
+
+
+class SandboxTests(SimpleTestCase):
+    def setUp(self):
+        self.engine = ExecutionEngine(max_concurrency=1)
+        self.addCleanup(lambda: self.engine._loop and self.engine._loop.call_soon_threadsafe(self.engine._loop.stop))
+
+    def test_metrics_are_reported(self):
+        metrics = self.engine.run("python", "sum(range(10 ** 6))")["metrics"]
+        self.assertEqual((metrics["exit_code"], metrics["signal"]), (0, None))
+        for key in ("cpu_ms", "wall_ms", "compile_ms"):
+            self.assertIsNotNone(metrics[key], key)
+        self.assertIn("peak_rss_kb", metrics)  # None when it stayed under the forker's RSS
+        usage = self.engine.stats()["usage"]["python"]
+        self.assertEqual(usage["runs"], 1)
+
+    @mock.patch.object(sandbox, "RUN_MAX_CPU_SECONDS", 1)
+    def test_cpu_limit(self):
+        result = self.engine.run("python", "while True:\n    pass", timeout=8)
+        self.assertFalse(result["timed_out"])
+        self.assertIn(result["metrics"]["signal"], ("SIGXCPU", "SIGKILL"))
+        self.assertEqual(self.engine.stats()["usage"]["python"]["signals"], {result["metrics"]["signal"]: 1})
+
+    @mock.patch.object(sandbox, "RUN_MAX_MEMORY_MB", 64)
+    def test_memory_limit(self):
+        result = self.engine.run("python", "x = bytearray(256 * 1024 * 1024)\nprint('allocated')")
+        self.assertNotEqual(result["returncode"], 0)
+        self.assertIn("MemoryError", result["stderr"])
+
+    @mock.patch.object(sandbox, "RUN_MAX_FILE_MB", 1)
+    def test_file_size_limit(self):
+        code = "with open('out.bin', 'wb') as f:\n    f.write(b'x' * (4 * 1024 * 1024))"
+        self.assertNotEqual(self.engine.run("python", code)["returncode"], 0)
+
+    def test_exit_info(self):
+        self.assertEqual(sandbox.exit_info(-24), {"exit_code": -24, "signal": "SIGXCPU"})
+        self.assertEqual(sandbox.exit_info(2), {"exit_code": 2, "signal": None})
+        self.assertEqual(sandbox.run_limits("python")["core"], 0)
+
+
+@mock.patch.multiple(capture, CAPTURE_HEAD_BYTES=4, CAPTURE_TAIL_BYTES=4, CAPTURE_SPILL_BYTES=20)
+class CaptureTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(capture, "CAPTURE_DIR", tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, patcher.start(), True)
+        self.addCleanup(patcher.stop)
+
+    def captured(self, *chunks):
+        out = capture.OutputCapture(capture.new_run_id(), "stdout")
+        for chunk in chunks:
+            out.feed(chunk)
+        out.close()
+        return out
+
+    def test_short_output_stays_in_memory(self):
+        out = self.captured(b"abc", b"defg")
+        self.assertEqual((out.preview(), out.info()), ("abcdefg", {"bytes": 7, "truncated": False, "stored_bytes": 0}))
+        self.assertIsNone(capture.stored_size(out.run_id, "stdout"))
+
+    def test_long_output_keeps_head_and_tail_and_spills(self):
+        out = self.captured(b"0123", b"4567", b"89abcdef", b"ghij")
+        self.assertEqual(out.preview(), "0123\n[... 12 bytes omitted ...]\nghij")
+        self.assertEqual(out.info(), {"bytes": 20, "truncated": True, "stored_bytes": 20})
+        self.assertEqual(capture.read_range(out.run_id, "stdout", 0, 19), b"0123456789abcdefghij")
+
+    def test_spill_is_capped(self):
+        out = self.captured(b"x" * 30)
+        self.assertEqual((out.info()["bytes"], capture.stored_size(out.run_id, "stdout")), (30, 20))
+
+    async def test_afeed_spills_off_the_loop_thread(self):
+        out = capture.OutputCapture(capture.new_run_id(), "stdout")
+        loop_thread = threading.get_ident()
+        writers = set()
+        real_write = out._write
+
+        def write(data):
+            writers.add(threading.get_ident())
+            real_write(data)
+
+        with mock.patch.object(out, "_write", side_effect=write):
+            for chunk in (b"0123", b"4567", b"89abcdef", b"ghij"):
+                await out.afeed(chunk)
+        out.close()
+        self.assertTrue(writers)
+        self.assertNotIn(loop_thread, writers)
+        self.assertEqual(capture.read_range(out.run_id, "stdout", 0, 19), b"0123456789abcdefghij")
+
+    def test_spill_prunes_at_most_once_per_interval(self):
+        with mock.patch.object(capture, "_last_prune", float("-inf")), mock.patch.object(capture, "prune") as prune:
+            self.captured(b"x" * 30)
+            self.captured(b"y" * 30)
+        self.assertEqual(prune.call_count, 1)
+
+    def test_only_run_ids_map_to_files(self):
+        self.assertIsNone(capture.spill_path("../etc/passwd", "stdout"))
+        self.assertIsNone(capture.spill_path(capture.new_run_id(), "stdin"))
+
+    def test_run_output_ranges(self):
+        run_id = self.captured(b"0123456789abcdefghij").run_id
+        url = f"/api/run_output/{run_id}/"
+        response = self.client.get(url)
+        self.assertEqual((response.status_code, response.content), (200, b"0123456789abcdefghij"))
+        response = self.client.get(url, HTTP_RANGE="bytes=2-5")
+        self.assertEqual((response.status_code, response.content, response["Content-Range"]),
+                         (206, b"2345", "bytes 2-5/20"))
+        self.assertEqual(self.client.get(url, HTTP_RANGE="bytes=-3").content, b"hij")
+        self.assertEqual(self.client.get(url, {"start": 18}).content, b"ij")
+        self.assertEqual(self.client.get(url, HTTP_RANGE="bytes=40-").status_code, 416)
+        self.assertEqual(self.client.get(url, HTTP_RANGE="bytes=x-").status_code, 400)
+        self.assertEqual(self.client.get(f"/api/run_output/{capture.new_run_id()}/").status_code, 404)
+
+
+class WorkspacePoolTests(SimpleTestCase):
+    def setUp(self):
+        self.root = os.path.join(tempfile.mkdtemp(), "ws")
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.root), True)
+
+    def test_directories_are_wiped_and_reused(self):
+        pool = WorkspacePool(root=self.root, size=1)
+        with pool.acquire() as path:
+            os.mkdir(os.path.join(path, "pkg"))
+            with open(os.path.join(path, "pkg", "main.py"), "w") as f:
+                f.write("print(1)")
+        with pool.acquire() as again:
+            self.assertEqual((again, os.listdir(again)), (path, []))
+        stats = pool.stats()
+        self.assertEqual((stats["created"], stats["reused"], stats["free"], stats["active"]), (1, 2, 1, 0))
+
+    def test_extra_workspaces_are_removed_on_release(self):
+        pool = WorkspacePool(root=self.root, size=1)
+        first, second = pool.acquire(), pool.acquire()
+        first.release()
+        second.release()
+        second.release()  # a second release is a no-op
+        self.assertFalse(os.path.exists(second.path))
+        self.assertEqual(pool.stats()["free"], 1)
+
+    def test_byte_cap_moves_runs_to_disk(self):
+        used = [1000]
+        with mock.patch.object(workspaces, "_byte_cap", return_value=10), \
+                mock.patch.object(workspaces, "_fs_used", side_effect=lambda path: used[0]):
+            pool = WorkspacePool(root=self.root, size=2, max_bytes=10)
+            held = pool.acquire()
+            self.assertTrue(held.path.startswith(self.root))
+            used[0] += 20  # the held run wrote 20 bytes
+            with pool.acquire() as path:
+                self.assertFalse(path.startswith(self.root))
+            held.release()
+            used[0] -= 20
+            with pool.acquire() as again:
+                self.assertTrue(again.startswith(self.root))
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(pool.stats()["spilled_to_disk"], 1)
+
+    def test_byte_cap_is_bounded_by_the_filesystem(self):
+        self.assertEqual(workspaces._byte_cap(tempfile.gettempdir(), 10), 0)  # spilling would not help
+        st = os.statvfs("/dev/shm") if os.path.isdir("/dev/shm") else None
+        if st and os.stat("/dev/shm").st_dev != os.stat(tempfile.gettempdir()).st_dev:
+            self.assertEqual(workspaces._byte_cap("/dev/shm", 10), 10)
+            self.assertEqual(workspaces._byte_cap("/dev/shm", 1 << 62), st.f_blocks * st.f_frsize // 2)
+
+    def test_leaked_workspace_is_recycled(self):
+        pool = WorkspacePool(root=self.root, size=1)
+        pool.acquire("leaky")
+        gc.collect()
+        self.assertEqual((pool.stats()["leaked"], pool.stats()["active"], pool.stats()["free"]), (1, 0, 1))
+
+    def test_directories_of_dead_servers_are_removed(self):
+        os.makedirs(os.path.join(self.root, "ws-999999999-1"))
+        WorkspacePool(root=self.root, size=1).acquire().release()
+        self.assertNotIn("ws-999999999-1", os.listdir(self.root))
+
+
+@mock.patch("converter_app.model_router.ROUTING_ENABLED", True)
+class ModelRouterTests(SimpleTestCase):
+    def test_small_simple_code_goes_to_the_fast_model(self):
+        self.assertEqual(route_model("print(1 + 2)", "python", "large")[0], FAST_MODEL)
+
+    def test_large_or_hard_code_goes_to_the_large_model(self):
+        self.assertEqual(route_model("x = 1\n" * 2000, "python", "large"), ("large", "~3000 tokens"))
+        hard = "async def f():\n    await g()\n    return [lambda: (yield)]\n"
+        self.assertEqual(route_model(hard, "python", "large")[0], "large")
+
+    def test_looks_valid(self):
+        self.assertTrue(looks_valid("def f():\n    return 1", "python"))
+        self.assertFalse(looks_valid("def f(:\n", "python"))
+        self.assertFalse(looks_valid("Here is the converted code:\nint x;", "c"))
+        self.assertTrue(looks_valid('int main() { puts("}"); }', "c"))
+        self.assertFalse(looks_valid("int main() {", "c"))
+
+    def test_compact_source_keeps_strings(self):
+        py = "# header\nx = '# not a comment'  # trailing\n\n\n\ny = 2\n"
+        self.assertEqual(compact_source(py, "python"), "x = '# not a comment'\n\ny = 2\n")
+        c = 'int x = 1; // note\n/* block\n   comment */\nchar *s = "// kept";\n'
+        self.assertEqual(compact_source(c, "c"), 'int x = 1;\nchar *s = "// kept";\n')
+        go = 'import "C"\n// #include <stdio.h>\n'
+        self.assertEqual(compact_source(go, "go"), go)
+
+
+class EscalationTests(LLMTestCase):
+    async def test_invalid_fast_reply_is_redone_on_the_large_model(self):
+        async def call(messages, model=mcp_connector.MODEL, **kwargs):
+            text = "Sure! def f(:" if model == FAST_MODEL else "def f():\n    return 1"
+            return {"mock": False, "truncated": False, "model": model, "text": text}
+
+        patcher = mock.patch.object(mcp_connector, "_acall_llm_system", side_effect=call)
+        llm = patcher.start()
+        self.addCleanup(patcher.stop)
+        with mock.patch.object(mcp_connector, "route_model", return_value=(FAST_MODEL, "small")):
+            result = await mcp_connector.aconvert_with_mcp("function f() { return 1; }", "javascript", "python")
+        self.assertEqual([c.kwargs.get("model", mcp_connector.MODEL) for c in llm.call_args_list],
+                         [FAST_MODEL, mcp_connector.MODEL])
+        self.assertTrue(result["escalated"])
+        self.assertEqual(result["converted_code"], "def f():\n    return 1")
+
+
+HELLO_C = '#include <stdio.h>\nint main(void) { puts("hi"); return 0; }\n'
+
+
+@skipUnless(shutil.which("gcc"), "gcc is not installed")
+class ArtifactCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = ArtifactCache(root=tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.cache.root, True)
+
+    def test_second_build_is_a_hit(self):
+        cmd, state, error = self.cache.get_or_build("c", HELLO_C, 30)
+        self.assertEqual((state, error), ("miss", None))
+        self.assertEqual(self.cache.get_or_build("c", HELLO_C, 30), (cmd, "hit", None))
+        self.assertEqual(subprocess.run(cmd, capture_output=True, text=True).stdout, "hi\n")
+        self.assertEqual({k: self.cache.stats()[k] for k in ("hits", "misses", "stores")},
+                         {"hits": 1, "misses": 1, "stores": 1})
+
+    def test_compile_errors_are_not_cached(self):
+        for _ in range(2):
+            cmd, state, error = self.cache.get_or_build("c", "int main( {", 30)
+            self.assertIsNone(cmd)
+            self.assertIn("error", error)
+        self.assertEqual((self.cache.stats()["compile_errors"], self.cache.stats()["stores"]), (2, 0))
+
+    def test_concurrent_builds_share_one_compile(self):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.cache.get_or_build("c", HELLO_C, 30)))
+                   for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.cache.stats()["misses"], 1)
+        self.assertEqual(len({tuple(cmd) for cmd, _, _ in results}), 1)
+
+    def test_least_recently_used_build_is_evicted(self):
+        old_cmd, _, _ = self.cache.get_or_build("c", HELLO_C, 30)
+        os.utime(os.path.join(os.path.dirname(old_cmd[0]), "meta.json"), (0, 0))
+        self.cache.max_bytes = 1
+        new_cmd, _, _ = self.cache.get_or_build("c", HELLO_C.replace("hi", "hello"), 30)
+        self.assertFalse(os.path.exists(old_cmd[0]))
+        self.assertTrue(os.path.exists(new_cmd[0]))  # too recent to evict
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_java_class_names(self):
+        self.assertEqual(java_class_names("public class App { public static void main(String[] a) {} }"),
+                         ("App", "App"))
+        self.assertEqual(java_class_names("class Util {}\nclass Runner { static void main(String[] a) {} }"),
+                         ("Runner", "Runner"))
+        self.assertEqual(java_class_names("interface X {}"), ("Main", "Main"))
+
+
+class PrecompiledHeadersTests(SimpleTestCase):
+    def setUp(self):
+        self.pch = pch.PrecompiledHeaders(root=tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.pch.root, True)
+
+    def select(self, lang, code, version="gcc 1"):
+        return self.pch.select(lang, code, build_cache.COMPILERS[lang], build_cache.FLAGS[lang], version)
+
+    def build_fake_sets(self, lang, code, build_one=None):
+        with mock.patch.object(self.pch, "_build_one", side_effect=build_one) as one:
+            self.assertEqual(self.select(lang, code), (None, None))  # starts building, parses this time
+            deadline = time.monotonic() + 5
+            while self.pch._building and time.monotonic() < deadline:
+                time.sleep(0.01)
+        return one
+
+    def test_sets_are_built_lazily_and_once(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def build_all(*args):
+            started.set()
+            release.wait(5)
+
+        with mock.patch.object(self.pch, "_build_all", side_effect=build_all) as build:
+            self.assertEqual(self.select("cpp", "#include <vector>\n"), (None, None))
+            self.assertTrue(started.wait(5))
+            self.assertEqual(self.select("cpp", "#include <map>\n"), (None, None))
+            release.set()
+        build.assert_called_once()
+        self.assertEqual(self.pch.stats()["not_ready"], 2)
+
+    def test_nothing_to_select_without_a_version_or_for_other_languages(self):
+        with mock.patch.object(self.pch, "_build_all") as build:
+            self.assertEqual(self.select("cpp", "#include <vector>\n", version=""), (None, None))
+            self.assertEqual(self.select("go", "package main\n"), (None, None))
+        build.assert_not_called()
+
+    def test_smallest_covering_set_wins(self):
+        self.build_fake_sets("cpp", "#include <vector>\n")
+        self.assertEqual(self.select("cpp", "#include <vector>\n#include <map>\n")[0], "stl")
+        self.assertEqual(self.select("cpp", "#include <bits/stdc++.h>\n")[0], "bits")
+        self.assertEqual(self.select("cpp", '#include <vector>\n#include "local.h"\n'), (None, None))
+        self.assertEqual(self.select("cpp", "int main() {}\n"), (None, None))
+        stats = self.pch.stats()
+        self.assertEqual((stats["used"], stats["unmatched"]), (2, 2))
+        self.assertEqual(stats["ready"], ["cpp/bits", "cpp/stl"])
+
+    def test_failed_set_is_reported_and_skipped(self):
+        def build_one(lang, directory, header, headers, compiler, flags):
+            if headers is not None:
+                raise subprocess.SubprocessError("stl failed")
+
+        self.build_fake_sets("cpp", "#include <vector>\n", build_one)
+        self.assertEqual(self.pch.error, "cpp/stl: stl failed")
+        self.assertEqual(self.select("cpp", "#include <vector>\n"), (None, None))  # covered by stl only
+        self.assertEqual(self.pch.stats()["ready"], ["cpp/bits"])
+
+    @skipUnless(shutil.which("gcc"), "gcc is not installed")
+    def test_real_header_set_is_used_by_builds(self):
+        version = build_cache.toolchain_version("gcc")
+        self.assertEqual(self.select("c", HELLO_C, version), (None, None))
+        deadline = time.monotonic() + 60
+        while not self.pch.stats()["ready"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        name, header = self.select("c", HELLO_C, version)
+        self.assertEqual(name, "libc", self.pch.error)
+        self.assertTrue(os.path.exists(header + ".gch"))
+        outdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, outdir, True)
+        with mock.patch.object(build_cache, "precompiled_headers", self.pch):
+            self.assertEqual(build_cache._compile("c", HELLO_C, outdir, 30), ({"exe": "main"}, None))
+        self.assertEqual(build_cache._last_compile.cc["pch"], "libc")
+        self.assertEqual(subprocess.run([os.path.join(outdir, "main")], capture_output=True, text=True).stdout, "hi\n")
+
+
+class CompileCCTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+
+    def compile_cc(self, header, ccache=None):
+        with open(os.path.join(self.dir, "main.o"), "wb"):
+            pass
+        done = subprocess.CompletedProcess([], 0, "", "")
+        with mock.patch.object(build_cache, "CCACHE", ccache), \
+                mock.patch.object(build_cache.subprocess, "run", return_value=done) as run:
+            build_cache._compile_cc("cpp", "main.cpp", self.dir, 30, header)
+        return [call.args[0] for call in run.call_args_list], run
+
+    def test_plain_compile(self):
+        argvs, _ = self.compile_cc(None)
+        self.assertEqual(argvs, [["g++", "main.cpp"] + build_cache.FLAGS["cpp"] + ["-o", "main"]])
+
+    def test_precompiled_header_is_force_included(self):
+        argvs, _ = self.compile_cc("/pch/stl.h")
+        self.assertEqual(argvs, [["g++", "-include", "/pch/stl.h", "main.cpp"] + build_cache.FLAGS["cpp"]
+                                 + ["-o", "main"]])
+
+    def test_ccache_compiles_then_links(self):
+        argvs, run = self.compile_cc("/pch/stl.h", ccache="/usr/bin/ccache")
+        self.assertEqual(argvs, [
+            ["/usr/bin/ccache", "g++", "-include", "/pch/stl.h", "-c", "main.cpp"] + build_cache.FLAGS["cpp"]
+            + ["-o", "main.o"],
+            ["g++", "main.o"] + build_cache.FLAGS["cpp"] + ["-o", "main"],
+        ])
+        self.assertEqual(run.call_args_list[0].kwargs["env"], build_cache.CCACHE_ENV)
+        self.assertFalse(os.path.exists(os.path.join(self.dir, "main.o")))
+
+    def test_failed_pch_build_is_redone_without_it(self):
+        results = [subprocess.CompletedProcess([], 1, "", "clash"), subprocess.CompletedProcess([], 0, "", "")]
+        with mock.patch.object(build_cache.precompiled_headers, "select", return_value=("stl", "/pch/stl.h")), \
+                mock.patch.object(build_cache.precompiled_headers, "note_fallback") as fallback, \
+                mock.patch.object(build_cache, "_compile_cc", side_effect=results) as compile_cc:
+            self.assertEqual(build_cache._compile("cpp", "int main() {}\n", self.dir, 30), ({"exe": "main"}, None))
+        self.assertEqual([call.args[4] for call in compile_cc.call_args_list], ["/pch/stl.h", None])
+        fallback.assert_called_once()
+        self.assertIsNone(build_cache._last_compile.cc["pch"])
+
+    def test_error_without_pch_is_not_retried(self):
+        failed = subprocess.CompletedProcess([], 1, "", "main.cpp:1: error")
+        with mock.patch.object(build_cache.precompiled_headers, "select", return_value=(None, None)), \
+                mock.patch.object(build_cache, "_compile_cc", return_value=failed) as compile_cc:
+            self.assertEqual(build_cache._compile("cpp", "int main( {\n", self.dir, 30), (None, "main.cpp:1: error"))
+        compile_cc.assert_called_once()
+
+
+# speaks CompileServer.java's protocol: "hang" never answers, "exit" quits, anything else is an error on the last arg
+FAKE_COMPILE_SERVER = r"""
+import sys
+for line in sys.stdin:
+    args = line.rstrip("\n").split("\t")
+    if args[0] == "exit":
+        break
+    if args[0] != "hang":
+        text = ("%s:1: error: nope\n" % args[-1]).encode()
+        sys.stdout.buffer.write(b"1\t%d\n" % len(text) + text)
+        sys.stdout.flush()
+"""
+
+HELLO_JAVA = 'public class Main {\n    public static void main(String[] a) { System.out.println("hi"); }\n}\n'
+
+
+class JavaRuntimeTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.runtime = java_runtime.JavaRuntime()
+
+    def serve(self):
+        proc = subprocess.Popen([sys.executable, "-c", FAKE_COMPILE_SERVER], stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, bufsize=0)
+        self.addCleanup(java_runtime._stop, proc)
+        self.runtime._server = proc
+        return proc
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_without_a_jdk_builds_use_plain_javac_and_java(self):
+        with mock.patch.object(java_runtime.shutil, "which", return_value=None):
+            self.runtime._setup()
+        self.assertIsNone(self.runtime.base)
+        self.assertIn("no JDK", self.runtime.stats()["error"])
+        self.assertIsNone(self.runtime.compile(["-d", self.dir, "Main.java"], self.dir, 5))
+        self.assertEqual(self.runtime.stats()["cold_compiles"], 1)
+        self.assertEqual(self.runtime.launch_flags(), java_runtime.JAVA_RUN_FLAGS)
+        self.assertEqual(self.runtime.build_metrics("javac"),
+                         {"compiled_by": "javac", "cds": False, "compile_saved_ms": 0.0, "startup_saved_ms": 0.0})
+
+    def test_failed_setup_is_reported_and_leaves_the_plain_path(self):
+        failure = subprocess.CalledProcessError(1, ["javac"], b"", b"boom")
+        with mock.patch.object(java_runtime, "_jdk_id", return_value="jdk"), \
+                mock.patch.object(java_runtime, "JAVA_RUNTIME_DIR", self.dir), \
+                mock.patch.object(java_runtime, "_timed", side_effect=failure):
+            self.runtime._setup()
+        self.assertIn("returned non-zero exit status 1", self.runtime.error)
+        self.assertFalse(self.runtime.server_running())
+        self.assertIsNone(self.runtime.archive)
+
+    def test_launch_flags_use_the_archive_once_it_exists(self):
+        self.runtime.archive = "/cds/jdk.jsa"
+        flags = self.runtime.launch_flags()
+        self.assertEqual(flags[:len(java_runtime.JAVA_RUN_FLAGS)], java_runtime.JAVA_RUN_FLAGS)
+        self.assertIn("-XX:SharedArchiveFile=/cds/jdk.jsa", flags)
+        self.assertIn("-Xshare:auto", flags)  # never fail a run over the archive
+        self.assertEqual(self.runtime.build_metrics(None)["cds"], True)
+
+    def test_java_builds_run_with_the_runtime_flags(self):
+        with mock.patch.object(build_cache.java_runtime, "archive", "/cds/jdk.jsa"):
+            cmd = build_cache._command("java", "/builds/ab", {"main_class": "Main"})
+        self.assertEqual(cmd[0], "java")
+        self.assertIn("-XX:SharedArchiveFile=/cds/jdk.jsa", cmd)
+        self.assertEqual(cmd[-3:], ["-cp", "/builds/ab", "Main"])
+
+    def test_server_replies_are_read_and_paths_made_relative(self):
+        self.serve()
+        source = os.path.join(self.dir, "Main.java")
+        self.assertEqual(self.runtime.compile(["-d", self.dir, source], self.dir, 5),
+                         (1, "Main.java:1: error: nope\n"))
+        self.assertEqual(self.runtime.stats()["server_compiles"], 1)
+
+    def test_reply_may_arrive_in_pieces(self):
+        read_fd, write_fd = os.pipe()
+        self.addCleanup(os.close, read_fd)
+        with os.fdopen(write_fd, "wb", buffering=0) as w:
+            w.write(b"0\t5\nab")
+            threading.Timer(0.05, w.write, [b"cde"]).start()
+            self.assertEqual(java_runtime._read_reply(read_fd, 5), (0, "abcde"))
+            time.sleep(0.1)
+
+    def test_falls_back_when_the_server_cannot_take_the_compile(self):
+        self.assertIsNone(self.runtime.compile(["Main.java"], self.dir, 5))  # not started yet
+        self.serve()
+        self.assertIsNone(self.runtime.compile(["Ma\tin.java"], self.dir, 5))  # not expressible in the protocol
+        with mock.patch.object(java_runtime, "JAVA_COMPILE_SERVER_WAIT", 0.05), self.runtime._server_lock:
+            self.assertIsNone(self.runtime.compile(["Main.java"], self.dir, 5))
+        self.assertEqual(self.runtime.stats()["server_busy"], 1)
+        self.assertEqual(self.runtime.stats()["cold_compiles"], 3)
+
+    def test_dead_server_is_dropped(self):
+        proc = self.serve()
+        with mock.patch.object(self.runtime, "_start_server"):
+            self.assertIsNone(self.runtime.compile(["exit"], self.dir, 5))
+            self.wait_for(lambda: self.runtime.stats()["server_restarts"])
+        self.assertIsNotNone(proc.poll())
+        stats = self.runtime.stats()
+        self.assertEqual((stats["server_failures"], stats["server_restarts"]), (1, 1))
+
+    def test_timed_out_compile_kills_and_replaces_the_server(self):
+        proc = self.serve()
+        with mock.patch.object(self.runtime, "_start_server") as start:
+            with self.assertRaises(subprocess.TimeoutExpired):
+                self.runtime.compile(["hang"], self.dir, 0.2)
+            self.wait_for(lambda: start.called)
+        self.assertIsNotNone(proc.poll())
+        self.assertIsNone(self.runtime._server)
+        start.assert_called_once()
+
+    def test_server_is_recycled_after_max_compiles(self):
+        self.serve()
+        with mock.patch.object(java_runtime, "JAVA_COMPILE_SERVER_MAX_COMPILES", 2), \
+                mock.patch.object(self.runtime, "_start_server") as start:
+            for _ in range(2):
+                self.assertIsNotNone(self.runtime.compile(["Main.java"], self.dir, 5))
+            self.wait_for(lambda: start.called)
+        start.assert_called_once()
+
+    def test_missing_javac_is_a_compile_error(self):
+        with mock.patch.object(build_cache.java_runtime, "compile", return_value=None), \
+                mock.patch.object(build_cache.subprocess, "run", side_effect=FileNotFoundError("javac")):
+            self.assertEqual(build_cache._compile("java", HELLO_JAVA, self.dir, 5), (None, "[javac is not installed]"))
+
+    def test_server_diagnostics_become_the_compile_error(self):
+        with mock.patch.object(build_cache.java_runtime, "compile", return_value=(1, "Main.java:1: error: x")):
+            self.assertEqual(build_cache._compile("java", HELLO_JAVA, self.dir, 5), (None, "Main.java:1: error: x"))
+        self.assertEqual(build_cache._last_compile.by, "server")
+
+
+@skipUnless(HAS_JDK, "no JDK installed")
+class JavaRuntimeJDKTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.dir = tempfile.mkdtemp()
+        cls.patcher = mock.patch.object(java_runtime, "JAVA_RUNTIME_DIR", cls.dir)
+        cls.patcher.start()
+        cls.runtime = java_runtime.JavaRuntime()
+        cls.runtime._setup()
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.runtime._server is not None:
+            java_runtime._stop(cls.runtime._server)
+        cls.patcher.stop()
+        shutil.rmtree(cls.dir, True)
+        super().tearDownClass()
+
+    def test_setup_measures_both_savings(self):
+        stats = self.runtime.stats()
+        self.assertIsNone(stats["error"])
+        self.assertTrue(stats["compile_server"])
+        self.assertIsNotNone(stats["compile_saved_ms"])
+        self.assertIsNotNone(stats["startup_saved_ms"])
+
+    def test_compile_server_builds_and_reports_errors(self):
+        with tempfile.TemporaryDirectory() as outdir:
+            source = os.path.join(outdir, "Main.java")
+            with open(source, "w") as f:
+                f.write(HELLO_JAVA)
+            self.assertEqual(self.runtime.compile(["-d", outdir, source], outdir, 60), (0, ""))
+            run = subprocess.run(["java"] + self.runtime.launch_flags() + ["-cp", outdir, "Main"],
+                                 capture_output=True, text=True, timeout=60)
+            self.assertEqual((run.stdout, run.stderr), ("hi\n", ""))
+            with open(source, "w") as f:
+                f.write("public class Main {")
+            status, text = self.runtime.compile(["-d", outdir, source], outdir, 60)
+        self.assertNotEqual(status, 0)
+        self.assertIn("Main.java:1: error", text)
+        self.assertNotIn(outdir, text)
+
+    def test_archive_is_created_once_and_reused(self):
+        self.assertTrue(os.path.exists(self.runtime.archive))
+        other = java_runtime.JavaRuntime()
+        with mock.patch.object(java_runtime, "JAVA_COMPILE_SERVER", False), \
+                mock.patch.object(java_runtime, "_timed", wraps=java_runtime._timed) as timed:
+            other._setup()
+        self.assertEqual(other.archive, self.runtime.archive)
+        argvs = [call.args[0] for call in timed.call_args_list]
+        self.assertFalse(any("-Xshare:dump" in argv for argv in argvs))
+        self.assertFalse(any(argv[0] == "javac" for argv in argvs))  # helpers were reused too
+
+    def test_training_program_runs(self):
+        run = subprocess.run(["java", "-cp", self.runtime._classes(), "Training"], input=java_runtime.PROBE_STDIN,
+                             capture_output=True, timeout=60)
+        self.assertEqual(run.returncode, 0, run.stderr)
+        self.assertTrue(run.stdout)
+
+
+class GoCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = GoCache(root=tempfile.mkdtemp(), max_bytes=100)
+        self.addCleanup(shutil.rmtree, self.cache.root, True)
+
+    def warm(self, returncode=0, stderr=""):
+        done = subprocess.CompletedProcess([], returncode, "", stderr)
+        with mock.patch.object(go_cache.subprocess, "run", return_value=done) as run:
+            self.cache.warm_up()
+            self.cache.warm_up()  # only the first call starts warming
+            deadline = time.monotonic() + 5
+            while self.cache.state == "warming" and time.monotonic() < deadline:
+                time.sleep(0.01)
+        return run
+
+    def test_env_points_go_at_the_managed_cache(self):
+        env = self.cache.env()
+        self.assertEqual(env["GOCACHE"], os.path.join(self.cache.root, "build"))
+        self.assertEqual(env["GOPATH"], os.path.join(self.cache.root, "path"))
+        self.assertEqual(env["GOTOOLCHAIN"], "local")
+        self.assertEqual(env["PATH"], os.environ["PATH"])
+
+    def test_warm_up_builds_std_at_low_priority_once(self):
+        run = self.warm()
+        self.assertEqual(self.cache.state, "warm")
+        self.assertIsNotNone(self.cache.warm_ms)
+        run.assert_called_once()
+        self.assertEqual(run.call_args.args[0][:5], ["nice", "-n", "10", "go", "build"])
+        self.assertNotIn("preexec_fn", run.call_args.kwargs)
+        self.assertEqual(run.call_args.kwargs["env"]["GOCACHE"], self.cache.env()["GOCACHE"])
+
+    def test_failed_warm_up_is_reported(self):
+        self.warm(returncode=1, stderr="go: cannot find GOROOT")
+        self.assertEqual((self.cache.state, self.cache.error), ("failed", "go: cannot find GOROOT"))
+
+    def test_trim_evicts_least_recently_used_files(self):
+        build = os.path.join(self.cache.root, "build", "ab")
+        os.makedirs(build)
+        for age, name in enumerate(["new", "mid", "old"]):
+            path = os.path.join(build, name)
+            with open(path, "wb") as f:
+                f.write(b"x" * 40)
+            os.utime(path, (1000 - age, 1000 - age))
+        with open(os.path.join(self.cache.root, "build", "README"), "wb") as f:
+            f.write(b"x" * 400)  # go's own bookkeeping is never counted or removed
+        self.cache.trim()
+        self.assertEqual(sorted(os.listdir(build)), ["mid", "new"])
+        stats = self.cache.stats()
+        self.assertEqual((stats["trims"], stats["evicted_files"], stats["evicted_bytes"]), (1, 1, 40))
+
+    def test_builds_trim_at_most_once_per_interval(self):
+        with mock.patch.object(self.cache, "trim") as trim:
+            for _ in range(3):
+                self.cache.after_build()
+            time.sleep(0.1)
+        trim.assert_called_once()
+        self.assertEqual(self.cache.stats()["builds"], 3)
+
+    @skipUnless(shutil.which("go"), "go is not installed")
+    def test_go_build_fills_the_managed_cache(self):
+        with open(os.path.join(self.cache.root, "main.go"), "w") as f:
+            f.write('package main\n\nfunc main() { println("hi") }\n')
+        proc = subprocess.run(["go", "build", "-o", "main", "main.go"], cwd=self.cache.root, env=self.cache.env(),
+                              capture_output=True, text=True, timeout=300)
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        self.assertTrue(os.listdir(os.path.join(self.cache.root, "build")))
+        self.cache.trim()
+        self.assertGreater(self.cache.stats()["evicted_files"], 0)
+
+
+class RunSocketTests(SimpleTestCase):
+    @asynccontextmanager
+    async def connected(self):
+        self.socket = WebsocketCommunicator(consumers.CodeRunnerConsumer.as_asgi(), "/ws/run/")
+        connected, _ = await self.socket.connect()
+        self.assertTrue(connected)
+        try:
+            yield
+        finally:
+            await self.socket.disconnect()
+
+    async def run_code(self, run_id, code, lang="python"):
+        await self.socket.send_json_to({"action": "run", "run_id": run_id, "lang": lang, "code": code})
+
+    async def frames_until(self, done, timeout=10):
+        """Frames received until done(frames) holds."""
+        frames = []
+        while not done(frames):
+            frames.append(await self.socket.receive_json_from(timeout))
+        return frames
+
+    @staticmethod
+    def finished(*run_ids):
+        return lambda frames: {f["run_id"] for f in frames if f.get("type") == "run_done"} >= set(run_ids)
+
+    @staticmethod
+    def output(frames, run_id):
+        return "".join(f.get("output", "") for f in frames if f["run_id"] == run_id and "type" not in f)
+
+    async def test_runs_are_multiplexed_by_run_id(self):
+        async with self.connected():
+            await self.run_code("a", "print('from a')")
+            await self.run_code("b", "print('from b')")
+            frames = await self.frames_until(self.finished("a", "b"))
+            self.assertIn("from a", self.output(frames, "a"))
+            self.assertIn("from b", self.output(frames, "b"))
+            self.assertNotIn("from b", self.output(frames, "a"))
+
+    async def test_stdin_reaches_the_right_run(self):
+        async with self.connected():
+            await self.run_code("echo", "print(input()[::-1])")
+            await self.frames_until(lambda frames: any("Running" in f.get("output", "") for f in frames))
+            await self.socket.send_json_to({"action": "stdin", "run_id": "echo", "input": "abc"})
+            frames = await self.frames_until(self.finished("echo"))
+            self.assertIn("cba", self.output(frames, "echo"))
+
+    async def test_stdin_sent_before_the_program_starts_is_kept(self):
+        async with self.connected():
+            await self.run_code("early", "print(input()[::-1])")
+            await self.socket.send_json_to({"action": "stdin", "run_id": "early", "input": "xyz"})
+            frames = await self.frames_until(self.finished("early"))
+            self.assertIn("zyx", self.output(frames, "early"))
+            self.assertNotIn("not running", self.output(frames, "early"))
+
+    async def test_program_exiting_after_closing_its_output_keeps_its_status(self):
+        async with self.connected():
+            await self.run_code("late", "import os, time\nprint('bye', flush=True)\nos.close(1)\nos.close(2)\n"
+                                        "time.sleep(0.3)\nos._exit(3)")
+            frames = await self.frames_until(self.finished("late"))
+            metrics = frames[-1]["metrics"]
+            self.assertEqual((metrics["exit_code"], metrics["signal"]), (3, None))
+
+    async def test_cancel_stops_the_run(self):
+        async with self.connected():
+            await self.run_code("slow", "import time\ntime.sleep(60)")
+            await self.frames_until(lambda frames: any("Running" in f.get("output", "") for f in frames))
+            await self.socket.send_json_to({"action": "cancel", "run_id": "slow"})
+            frames = await self.frames_until(lambda frames: any(f.get("type") == "run_cancelled" for f in frames))
+            self.assertEqual((frames[-1]["run_id"], frames[-1]["running"]), ("slow", True))
+
+    async def test_runs_per_connection_are_capped(self):
+        async with self.connected():
+            with mock.patch.object(consumers, "WS_MAX_RUNS", 1):
+                await self.run_code("a", "import time\ntime.sleep(60)")
+                await self.run_code("b", "print(1)")
+                frames = await self.frames_until(lambda frames: any(f.get("type") == "run_busy" for f in frames))
+            self.assertEqual(frames[-1]["run_id"], "b")
+            await self.socket.send_json_to({"action": "cancel", "run_id": "a"})
+            await self.frames_until(lambda frames: any(f.get("type") == "run_cancelled" for f in frames))
+
+    async def test_output_is_coalesced_into_frames(self):
+        async with self.connected():
+            await self.run_code("loud", "for i in range(2000):\n    print(i)")
+            frames = await self.frames_until(self.finished("loud"))
+            self.assertIn("\n".join(map(str, range(2000))), self.output(frames, "loud"))
+            self.assertLess(sum(1 for f in frames if "type" not in f), 50)
+            self.assertEqual(frames[-1]["metrics"]["output_bytes"], sum(len(f"{i}\n") for i in range(2000)))
+
+    async def test_output_is_cut_after_the_stream_limit(self):
+        async with self.connected():
+            with mock.patch.object(consumers, "STREAM_MAX_BYTES", 100):
+                await self.run_code("big", "print('x' * 1000)")
+                frames = await self.frames_until(self.finished("big"))
+            self.assertEqual(self.output(frames, "big").count("x"), 100)
+            self.assertTrue(frames[-1]["metrics"]["output_truncated"])
+
+
+class LatencyTests(SimpleTestCase):
+    def test_specs(self):
+        for spec, seconds in (("fixed:200", 0.2), ("fixed", 0.0), ("uniform:100,100", 0.1), ("normal:250,0", 0.25),
+                              ("lognormal:250,0", 0.25), ("Normal: -50", 0.0)):
+            self.assertAlmostEqual(mock_groq.Latency(spec).sample(), seconds, msg=spec)
+
+    def test_samples_stay_in_range(self):
+        latency = mock_groq.Latency("uniform:100,400")
+        self.assertTrue(all(0.1 <= latency.sample() <= 0.4 for _ in range(100)))
+
+    def test_bad_specs(self):
+        with self.assertRaisesMessage(ValueError, "Unknown latency distribution: gamma"):
+            mock_groq.Latency("gamma:1")
+        with self.assertRaises(ValueError):
+            mock_groq.Latency("fixed:soon")
+
+
+CODE_PROMPT = [{"role": "system", "content": "convert"},
+               {"role": "user", "content": "Convert this:\n```python\nprint(1)\n```\n"}]
+
+
+class MockGroqTests(SimpleTestCase):
+    """make_server on a free port, driven over HTTP and by the connector's real Groq clients."""
+
+    def serve(self, **options):
+        self.recordings = os.path.join(tempfile.mkdtemp(), "recordings.jsonl")
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.recordings), True)
+        self.config = mock_groq.MockGroqConfig(**options)
+        server = mock_groq.make_server(port=0, config=self.config)
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.url = f"http://127.0.0.1:{server.server_address[1]}"
+        for name, value in (("GROQ_BASE_URL", self.url), ("GROQ_KEY", "test"), ("MOCK_MCP", False),
+                            ("GROQ_MAX_RETRIES", 0), ("GROQ_RECORD_FILE", self.recordings), ("_client", None),
+                            ("_async_clients", weakref.WeakKeyDictionary())):
+            patcher = mock.patch.object(mcp_connector, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post(self, **body):
+        data = json.dumps(dict({"model": "m", "messages": CODE_PROMPT}, **body)).encode()
+        request = urllib.request.Request(self.url + "/openai/v1/chat/completions", data=data,
+                                         headers={"Content-Type": "application/json"})
+        return urllib.request.urlopen(request, timeout=10)
+
+    def test_echoes_the_last_code_block(self):
+        self.serve()
+        reply = json.load(self.post())
+        self.assertEqual(reply["choices"][0]["message"]["content"], "```\nprint(1)\n```")
+        self.assertEqual(reply["choices"][0]["finish_reason"], "stop")
+        self.assertEqual(self.config.counters["echoed"], 1)
+
+    def test_max_tokens_truncates(self):
+        self.serve()
+        choice = json.load(self.post(max_tokens=2))["choices"][0]
+        self.assertEqual((choice["message"]["content"], choice["finish_reason"]), ("```\nprin", "length"))
+
+    def test_rejects_with_429(self):
+        self.serve(rate_429=1.0)
+        with self.assertRaises(urllib.error.HTTPError) as caught:
+            self.post()
+        self.assertEqual((caught.exception.code, caught.exception.headers["retry-after"]), (429, "1"))
+        self.assertEqual(json.load(caught.exception)["error"]["code"], "rate_limit_exceeded")
+        self.assertEqual(self.config.counters["rejected_429"], 1)
+
+    def test_stream_format(self):
+        self.serve()
+        response = self.post(stream=True)
+        self.assertEqual(response.headers["Content-Type"], "text/event-stream")
+        events = response.read().decode().split("\n\n")
+        self.assertEqual(events[-2:], ["data: [DONE]", ""])
+        chunks = [json.loads(event.removeprefix("data: ")) for event in events[:-2]]
+        self.assertEqual({c["object"] for c in chunks}, {"chat.completion.chunk"})
+        self.assertEqual(len({c["id"] for c in chunks}), 1)
+        self.assertEqual("".join(c["choices"][0]["delta"].get("content", "") for c in chunks), "```\nprint(1)\n```")
+        self.assertEqual([c["choices"][0]["finish_reason"] for c in chunks][-2:], [None, "stop"])
+
+    def test_client_round_trip_is_recorded_and_replayed(self):
+        self.serve()
+        out = mcp_connector._call_llm_system(CODE_PROMPT, model="m")
+        self.assertEqual((out["mock"], out["text"], out["truncated"]), (False, "```\nprint(1)\n```", False))
+        replay = mock_groq.MockGroqConfig(replay=self.recordings)
+        self.assertEqual(replay.recordings, {mock_groq.message_key(CODE_PROMPT): "```\nprint(1)\n```"})
+        self.assertEqual(replay.reply_for(CODE_PROMPT), "```\nprint(1)\n```")
+        self.assertEqual(replay.reply_for(CODE_PROMPT[:1]), "```\nconvert\n```")  # other messages are echoed
+        self.assertEqual((replay.counters["replayed"], replay.counters["echoed"]), (1, 1))
+
+    def test_replayed_reply_reaches_the_client(self):
+        self.serve()
+        mock_groq.record_completion(self.recordings, CODE_PROMPT, "m", "```\nputs 1\n```")
+        self.config.recordings = mock_groq.MockGroqConfig(replay=self.recordings).recordings
+        self.assertEqual(mcp_connector._call_llm_system(CODE_PROMPT)["text"], "```\nputs 1\n```")
+        self.assertEqual(self.config.counters["replayed"], 1)
+
+    def test_client_sees_truncation_and_429(self):
+        self.serve()
+        self.assertTrue(mcp_connector._call_llm_system(CODE_PROMPT, max_tokens=2)["truncated"])
+        self.config.rate_429 = 1.0
+        self.assertIn("429", mcp_connector._call_llm_system(CODE_PROMPT)["error"])
+
+    async def test_async_client_streams(self):
+        self.serve()
+        events = [event async for event in mcp_connector._astream_completion("print(1)", "python", "javascript")]
+        self.assertEqual(events[-1]["type"], "done")
+        self.assertFalse(events[-1]["mock"], events[-1])
+        self.assertEqual("".join(e["text"] for e in events[:-1]), events[-1]["text"].strip("`\n"))
+        self.assertEqual(self.config.counters["echoed"], 1)
+
+
+class MockGroqCommandTests(SimpleTestCase):
+    def test_bad_options_are_command_errors(self):
+        with self.assertRaisesMessage(CommandError, "Unknown latency distribution"):
+            call_command("mock_groq", latency="gamma:1")
+        with self.assertRaises(CommandError):
+            call_command("mock_groq", replay="/nonexistent/recordings.jsonl")
+
+    def test_serves_until_interrupted(self):
+        server = mock.Mock(**{"serve_forever.side_effect": KeyboardInterrupt})
+        out = io.StringIO()
+        with mock.patch("converter_app.management.commands.mock_groq.make_server", return_value=server) as make:
+            call_command("mock_groq", port=9999, tokens_per_second=50.0, stdout=out)
+        config = make.call_args.args[2]
+        self.assertEqual((config.tokens_per_second, config.latency.kind), (50.0, "fixed"))
+        self.assertIn("GROQ_BASE_URL=http://127.0.0.1:9999", out.getvalue())
+        server.server_close.assert_called_once()
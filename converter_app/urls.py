@@ -4,6 +4,12 @@ from . import views
 
 urlpatterns = [
     path('convert/', views.convert_code, name='convert'),
+    path('convert_batch/', views.convert_batch, name='convert_batch'),
     path('run_source/', views.run_source_code, name='run_source'),
     path('run_converted/', views.run_converted_code, name='run_converted'),
+    path('convert_and_verify/', views.convert_and_verify, name='convert_and_verify'),
+    path('diff_test/', views.diff_test, name='diff_test'),
+    path('refine/', views.refine_code, name='refine'),
+    path('cache_stats/', views.cache_stats, name='cache_stats'),
+    path('run_output/<str:run_id>/', views.run_output, name='run_output'),
 ]
@@ -1,9 +1,10 @@
 # backend/converter_app/utils.py
-import subprocess
-import tempfile
-import os
-import sys
-from typing import Tuple
+from .build_cache import normalize_lang
+from .execution import ExecutionBusy, execution_engine
+
+# signals the kernel sends when a sandbox limit is hit (see sandbox.py)
+LIMIT_SIGNALS = {"SIGXCPU": "CPU time limit", "SIGXFSZ": "File size limit"}
+
 
 def run_code(lang: str, code: str, stdin: str = "", timeout: int = 10) -> str:
     """
@@ -12,74 +13,57 @@ def run_code(lang: str, code: str, stdin: str = "", timeout: int = 10) -> str:
     stdin is a string that will be provided to the process input (used for batch run).
     timeout is in seconds.
     """
-    lang = (lang or "").lower().strip()
-    ext_map = {
-        "python": "py", "py": "py",
-        "go": "go",
-        "java": "java",
-        "js": "js", "javascript": "js",
-        "c": "c",
-        "cpp": "cpp", "c++": "cpp"
-    }
-    ext = ext_map.get(lang, "txt")
-
-    with tempfile.TemporaryDirectory() as tmpdir:
-        filename = os.path.join(tmpdir, f"Main.{ext}")
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write(code)
-
-        try:
-            # Compose execution command depending on language
-            if lang in ("python", "py"):
-                cmd = [sys.executable, filename]
-
-            elif lang == "go":
-                cmd = ["go", "run", filename]
+    return run_code_detailed(lang, code, stdin=stdin, timeout=timeout)["output"]
 
-            elif lang in ("js", "javascript"):
-                cmd = ["node", filename]
 
-            elif lang == "java":
-                # ensure filename is Main.java for public class Main
-                main_path = os.path.join(tmpdir, "Main.java")
-                if filename != main_path:
-                    os.rename(filename, main_path)
-                    filename = main_path
-                compile_proc = subprocess.run(["javac", "Main.java"], cwd=tmpdir,
-                                              capture_output=True, text=True, timeout=timeout)
-                if compile_proc.returncode != 0:
-                    return compile_proc.stderr.strip() or "[javac failed]"
-                cmd = ["java", "-cp", tmpdir, "Main"]
-
-            elif lang == "c":
-                exe = os.path.join(tmpdir, "a.out")
-                compile_proc = subprocess.run(["gcc", filename, "-o", exe], cwd=tmpdir,
-                                              capture_output=True, text=True, timeout=timeout)
-                if compile_proc.returncode != 0:
-                    return compile_proc.stderr.strip() or "[gcc failed]"
-                cmd = [exe]
-
-            elif lang in ("cpp", "c++"):
-                exe = os.path.join(tmpdir, "a.out")
-                compile_proc = subprocess.run(["g++", filename, "-o", exe], cwd=tmpdir,
-                                              capture_output=True, text=True, timeout=timeout)
-                if compile_proc.returncode != 0:
-                    return compile_proc.stderr.strip() or "[g++ failed]"
-                cmd = [exe]
+def run_code_detailed(lang: str, code: str, stdin: str = "", timeout: int = 10) -> dict:
+    """
+    Same as run_code but returns {"output", "compile_cache", "queue_ms", "metrics",
+    "run_id", "truncated", "streams"}; compile_cache is "hit"/"miss"/"disabled"
+    for compiled languages (see build_cache.py) and None otherwise, metrics is
+    described in execution.py. Long output is cut to a head/tail preview and
+    streams[name]["url"] serves the full text by byte range (see capture.py).
+    """
+    try:
+        res = execution_engine.run(lang, code, stdin=stdin, timeout=timeout)
+    except ExecutionBusy as e:
+        return {"output": f"[{e}]", "compile_cache": None}
+    except Exception as e:
+        return {"output": f"[Execution error: {e}]", "compile_cache": None}
+    return format_run(lang, res)
 
-            else:
-                return f"[Unsupported language: {lang}]"
 
-            # Execute with provided stdin (batch)
-            proc = subprocess.run(cmd, input=stdin, capture_output=True, text=True, timeout=timeout, cwd=tmpdir)
+async def arun_code_detailed(lang: str, code: str, stdin: str = "", timeout: int = 10, on_position=None) -> dict:
+    """Async run_code_detailed for async views; raises ExecutionBusy when the engine is saturated."""
+    try:
+        res = await execution_engine.arun(lang, code, stdin=stdin, timeout=timeout, on_position=on_position)
+    except ExecutionBusy:
+        raise
+    except Exception as e:
+        return {"output": f"[Execution error: {e}]", "compile_cache": None}
+    return format_run(lang, res)
 
-            if proc.returncode == 0:
-                return proc.stdout.strip() or "[No output]"
-            else:
-                # Prefer stderr if present
-                return (proc.stderr.strip() or proc.stdout.strip() or f"[Non-zero exit code: {proc.returncode}]")
 
-        except subprocess.TimeoutExpired:
-            return "[Execution timed out]"
-        except Exception as e:
-            return f"[Execution error: {e}]"
+def format_run(lang: str, res: dict) -> dict:
+    """Turn an execution engine result into the text the UI shows."""
+    if res["compile_error"]:
+        output = res["compile_error"]
+    elif res["unsupported"]:
+        output = f"[Unsupported language: {normalize_lang(lang)}]"
+    elif res["timed_out"]:
+        output = "[Execution timed out]"
+    elif res["returncode"] == 0:
+        output = res["stdout"].strip() or "[No output]"
+    else:
+        # Prefer stderr if present
+        output = res["stderr"].strip() or res["stdout"].strip()
+        limit = LIMIT_SIGNALS.get((res.get("metrics") or {}).get("signal"))
+        if limit:
+            output = f"{output}\n[{limit} exceeded]".lstrip()
+        elif not output:
+            output = f"[Non-zero exit code: {res['returncode']}]"
+    streams = {name: dict(info, url=f"/api/run_output/{res['run_id']}/?stream={name}" if info["stored_bytes"] else None)
+               for name, info in (res.get("streams") or {}).items()}
+    return {"output": output, "compile_cache": res["compile_cache"], "queue_ms": res.get("queue_ms"),
+            "metrics": res.get("metrics"), "run_id": res.get("run_id"),
+            "truncated": any(info["truncated"] for info in streams.values()), "streams": streams}
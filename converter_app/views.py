@@ -1,12 +1,38 @@
 # backend/converter_app/views.py
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from asgiref.sync import sync_to_async
 import json
-from .mcp_connector import convert_with_mcp  # your MCP integration (mock mode supported)
-from .utils import run_code
+from .mcp_connector import (  # your MCP integration (mock mode supported)
+    aconvert_incremental, aconvert_with_mcp, arefine_with_feedback, load_history, save_history,
+)
+from .feedback_store import feedback_writer, find_refinement
+from .cache import conversion_cache
+from .limiter import LimiterBusy, llm_limiter
+from .singleflight import conversions_in_flight
+from . import model_router
+from .utils import arun_code_detailed
+from .build_cache import artifact_cache
+from .warm_pool import warm_pool
+from .java_runtime import java_runtime
+from .pch import precompiled_headers
+from .go_cache import go_cache
+from .execution import execution_engine
+from .workspaces import workspace_pool
+from . import capture
+from .batch import BatchError, clamp_concurrency, files_from_archive, files_from_json, stream_batch
+from .difftest import DiffTestError, adiff_test, comparison_options, run_timeout, vectors_from_json
+from .pipeline import stream_convert_and_verify
+
+
+def _busy_response(exc):
+    response = JsonResponse({"error": str(exc), "retry_after": exc.retry_after}, status=429)
+    response["Retry-After"] = str(max(1, int(round(exc.retry_after))))
+    return response
+
 
 @csrf_exempt
-def convert_code(request):
+async def convert_code(request):
     if request.method != "POST":
         return JsonResponse({"error": "POST required"}, status=400)
 
@@ -22,19 +48,137 @@ def convert_code(request):
     if not source_code or not source_lang or not target_lang:
         return JsonResponse({"error": "Missing fields"}, status=400)
 
+    # "bypass_cache": true forces a fresh LLM call (the result is still stored)
+    use_cache = not payload.get("bypass_cache", False)
+    # "chunked": true/false forces large-input mode on or off; default is by size
+    chunked = payload.get("chunked")
+
+    # incremental mode: the previous round trip, given inline or by history_id
+    previous_source = payload.get("previous_source")
+    previous_converted = payload.get("previous_converted")
+    if payload.get("history_id") and not (previous_source and previous_converted):
+        previous_source, previous_converted = await sync_to_async(load_history, thread_sensitive=False)(
+            payload["history_id"])
+
     # call your MCP connector; it should return dict with 'converted_code'
-    mcp_res = convert_with_mcp(source_code, source_lang, target_lang)
+    try:
+        if previous_source and previous_converted:
+            mcp_res = await aconvert_incremental(source_code, source_lang, target_lang,
+                                                 previous_source, previous_converted, use_cache=use_cache)
+        else:
+            mcp_res = await aconvert_with_mcp(source_code, source_lang, target_lang, use_cache=use_cache, chunked=chunked)
+    except LimiterBusy as e:
+        return _busy_response(e)
     if not mcp_res or mcp_res.get("status") == "error":
         return JsonResponse({"error": mcp_res.get("message", "MCP error")}, status=500)
 
-    return JsonResponse({
+    # the history entry goes to the cache's disk tier
+    history_id = await sync_to_async(save_history, thread_sensitive=False)(mcp_res, source_code, source_lang,
+                                                                           target_lang)
+    response = {
         "converted_code": mcp_res.get("converted_code", ""),
-        "notes": mcp_res.get("notes", "")
-    })
+        "notes": mcp_res.get("notes", ""),
+        "cache": mcp_res.get("cache", "disabled"),
+        "coalesced": mcp_res.get("coalesced", False),
+        "chunks": mcp_res.get("chunks", 1),
+        "model": mcp_res.get("model"),
+        "escalated": mcp_res.get("escalated", False),
+        "truncated": mcp_res.get("truncated", False),
+        "history_id": history_id,
+    }
+    if "incremental" in mcp_res:
+        response["incremental"] = mcp_res["incremental"]
+        if mcp_res.get("incremental_fallback"):
+            response["incremental_fallback"] = mcp_res["incremental_fallback"]
+    elif payload.get("history_id"):
+        response["incremental"] = False
+        response["incremental_fallback"] = "unknown or expired history_id"
+    return JsonResponse(response)
+
+
+@csrf_exempt
+async def convert_batch(request):
+    """
+    Convert many files at once and stream one NDJSON line per file.
+    Accepts JSON {"files": [{path, source_code, source_lang?}], "target_lang", ...}
+    or a multipart upload with an "archive" (.zip/.tar/.tar.gz) field.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=400)
+
+    try:
+        if request.content_type == "multipart/form-data":
+            params = request.POST
+            upload = request.FILES.get("archive")
+            if upload is None:
+                return JsonResponse({"error": "Missing archive"}, status=400)
+            files = files_from_archive(upload, params.get("source_lang", ""))
+        else:
+            try:
+                params = json.loads(request.body)
+            except json.JSONDecodeError:
+                return JsonResponse({"error": "Invalid JSON"}, status=400)
+            files = files_from_json(params.get("files"), params.get("source_lang", ""))
+    except BatchError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    target_lang = params.get("target_lang", "")
+    if not target_lang:
+        return JsonResponse({"error": "Missing fields"}, status=400)
+
+    bypass = str(params.get("bypass_cache", "")).lower() in ("1", "true")
+    lines = stream_batch(files, target_lang, concurrency=clamp_concurrency(params.get("concurrency")),
+                         use_cache=not bypass)
+    return StreamingHttpResponse(lines, content_type="application/x-ndjson")
+
+
+@csrf_exempt
+async def refine_code(request):
+    """Refine converted code from user feedback, reusing a stored refinement when one matches."""
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=400)
+    try:
+        payload = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+    converted_code = payload.get("converted_code", "")
+    feedback = payload.get("feedback", "")
+    source_lang = payload.get("source_lang", "")
+    target_lang = payload.get("target_lang", "")
+    if not converted_code or not feedback or not target_lang:
+        return JsonResponse({"error": "Missing fields"}, status=400)
+
+    refined = await sync_to_async(find_refinement)(converted_code, feedback, source_lang, target_lang)
+    if refined is not None:
+        return JsonResponse({"converted_code": refined, "notes": "reused previous refinement", "reused": True})
+
+    try:
+        res = await arefine_with_feedback(converted_code, feedback, source_lang, target_lang)
+    except LimiterBusy as e:
+        return _busy_response(e)
+
+    # persisted in the background; the response does not wait on the commit
+    if not res.get("mock"):
+        feedback_writer.submit(source_lang, target_lang, converted_code, feedback, res["converted_code"])
+    return JsonResponse({"converted_code": res["converted_code"], "notes": res.get("notes", ""), "reused": False})
+
+
+def cache_stats(request):
+    """Per-worker counters for caching, coalescing, the LLM limiter, model routing, builds, warm interpreters,
+    the execution engine, run workspaces, the Java compile server / CDS archive, precompiled headers,
+    the Go build cache and the feedback writer."""
+    stats = {"enabled": False} if conversion_cache is None else dict(conversion_cache.stats(), enabled=True)
+    builds = {"enabled": False} if artifact_cache is None else dict(artifact_cache.stats(), enabled=True)
+    return JsonResponse(dict(stats, coalescing=conversions_in_flight.stats(), llm_limiter=llm_limiter.stats(),
+                             model_routing=model_router.stats(), build_cache=builds, warm_pool=warm_pool.stats(),
+                             execution=execution_engine.stats(), workspaces=workspace_pool.stats(),
+                             java=java_runtime.stats(), pch=precompiled_headers.stats(), gocache=go_cache.stats(),
+                             feedback_writer=feedback_writer.stats()))
 
 
 @csrf_exempt
-def run_source_code(request):
+async def run_source_code(request):
     if request.method != "POST":
         return JsonResponse({"error": "POST required"}, status=400)
     try:
@@ -49,12 +193,15 @@ def run_source_code(request):
     if not source_code or not source_lang:
         return JsonResponse({"error": "Missing code or language"}, status=400)
 
-    out = run_code(source_lang, source_code, stdin=stdin, timeout=10)
-    return JsonResponse({"output": out})
+    try:
+        res = await arun_code_detailed(source_lang, source_code, stdin=stdin, timeout=10)
+    except LimiterBusy as e:
+        return _busy_response(e)
+    return JsonResponse(res)
 
 
 @csrf_exempt
-def run_converted_code(request):
+async def run_converted_code(request):
     if request.method != "POST":
         return JsonResponse({"error": "POST required"}, status=400)
     try:
@@ -69,5 +216,116 @@ def run_converted_code(request):
     if not converted_code or not converted_lang:
         return JsonResponse({"error": "Missing code or language"}, status=400)
 
-    out = run_code(converted_lang, converted_code, stdin=stdin, timeout=10)
-    return JsonResponse({"output": out})
+    try:
+        res = await arun_code_detailed(converted_lang, converted_code, stdin=stdin, timeout=10)
+    except LimiterBusy as e:
+        return _busy_response(e)
+    return JsonResponse(res)
+
+
+@csrf_exempt
+async def diff_test(request):
+    """Run original and converted code on every stdin vector and compare the outputs."""
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=400)
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+    source_code = data.get("source_code", "")
+    source_lang = data.get("source_lang", "")
+    converted_code = data.get("converted_code", "")
+    converted_lang = data.get("converted_lang", "")
+    if not source_code or not source_lang or not converted_code or not converted_lang:
+        return JsonResponse({"error": "Missing fields"}, status=400)
+    try:
+        vectors = vectors_from_json(data.get("vectors"))
+        compare = comparison_options(data)
+        timeout = run_timeout(data)
+    except DiffTestError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    try:
+        report = await adiff_test(source_lang, source_code, converted_lang, converted_code, vectors,
+                                  timeout=timeout,
+                                  early_exit=data.get("early_exit", True) is not False, compare=compare)
+    except LimiterBusy as e:
+        return _busy_response(e)
+    return JsonResponse(report)
+
+
+@csrf_exempt
+async def convert_and_verify(request):
+    """
+    Convert, run both programs and compare them in one request, streaming one
+    NDJSON line per stage as it finishes; the source run overlaps the conversion.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=400)
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+    source_code = data.get("source_code", "")
+    source_lang = data.get("source_lang", "")
+    target_lang = data.get("target_lang", "")
+    if not source_code or not source_lang or not target_lang:
+        return JsonResponse({"error": "Missing fields"}, status=400)
+    try:
+        compare = comparison_options(data)
+        timeout = run_timeout(data)
+    except DiffTestError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    lines = stream_convert_and_verify(source_code, source_lang, target_lang, stdin=data.get("stdin", ""),
+                                      timeout=timeout,
+                                      use_cache=not data.get("bypass_cache", False), compare=compare)
+    return StreamingHttpResponse(lines, content_type="application/x-ndjson")
+
+
+RUN_OUTPUT_MAX_RANGE = 1024 * 1024  # bytes per run_output response
+
+
+def _requested_range(request):
+    """(start, end) from a `Range: bytes=a-b` header or ?start=&end=; end is inclusive or None."""
+    header = request.headers.get("Range", "")
+    if header.startswith("bytes="):
+        first, _, last = header[len("bytes="):].split(",")[0].partition("-")
+        if not first:
+            return -int(last), None  # suffix range: the last N bytes
+        return int(first), int(last) if last else None
+    start = int(request.GET.get("start", 0))
+    end = request.GET.get("end")
+    return start, int(end) if end not in (None, "") else None
+
+
+def run_output(request, run_id):
+    """Serve a byte range of a run's full stdout/stderr (?stream=stdout|stderr) when it was cut short."""
+    stream = request.GET.get("stream", "stdout")
+    try:
+        start, end = _requested_range(request)
+    except ValueError:
+        return JsonResponse({"error": "Invalid range"}, status=400)
+
+    size = capture.stored_size(run_id, stream)
+    if size is None:
+        return JsonResponse({"error": "Output not found or expired"}, status=404)
+    if start < 0:
+        start = max(0, size + start)
+    end = size - 1 if end is None else min(end, size - 1)
+    end = min(end, start + RUN_OUTPUT_MAX_RANGE - 1)
+    if start >= size or end < start:
+        response = JsonResponse({"error": "Range not satisfiable", "size": size}, status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    data = capture.read_range(run_id, stream, start, end)
+    if data is None:
+        return JsonResponse({"error": "Output not found or expired"}, status=404)
+    response = HttpResponse(data, content_type="text/plain; charset=utf-8",
+                            status=206 if (start, end) != (0, size - 1) else 200)
+    response["Content-Range"] = f"bytes {start}-{start + len(data) - 1}/{size}"
+    response["Accept-Ranges"] = "bytes"
+    return response
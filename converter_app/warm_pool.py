@@ -0,0 +1,788 @@
+# backend/converter_app/warm_pool.py
+"""
+Warm interpreters for Python and JavaScript runs.
+
+Python: WARM_POOL_SIZE zygote processes start once, import the commonly used
+standard modules and then fork a fresh child per run. The run's stdin/stdout/
+stderr pipes are handed to the zygote over a Unix socket (SCM_RIGHTS), so the
+child is as isolated as a cold `python3 Main.py` but skips interpreter start-up
+and those imports. A zygote is replaced after WARM_MAX_USES forks or when it
+fails a health check.
+
+Node cannot fork, so WARM_POOL_SIZE idle `node` processes are kept spawned;
+each one blocks reading a small header (script path and cwd) from a pipe, runs
+the script once and exits. A replacement is spawned in the background.
+
+Everything falls back to a cold process whenever no warm worker is ready, so
+the pool can only make runs faster. This file is also the zygote's entry
+point (python warm_pool.py <socket fd> <preload>), hence stdlib imports only
+(sandbox.py is stdlib-only too).
+
+Warm or cold, every run gets the limits from sandbox.run_limits() and its own
+session, and AsyncProcess.usage reports its CPU time, peak RSS and wall time.
+"""
+
+import asyncio
+import collections
+import itertools
+import json
+import os
+import resource
+import select
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    from . import sandbox
+except ImportError:  # started as the zygote script
+    import sandbox
+
+WARM_POOL_ENABLED = os.getenv("WARM_POOL", "1") == "1"
+WARM_POOL_SIZE = int(os.getenv("WARM_POOL_SIZE", "2"))
+WARM_MAX_USES = int(os.getenv("WARM_MAX_USES", "200"))             # forks per Python zygote
+WARM_HEALTH_INTERVAL = float(os.getenv("WARM_HEALTH_INTERVAL", "30"))
+WARM_MAX_IDLE = float(os.getenv("WARM_MAX_IDLE", "600"))           # seconds before an idle node worker is refreshed
+WARM_PY_PRELOAD = os.getenv("WARM_PY_PRELOAD", "json,math,re,collections,itertools,functools,heapq,bisect,"
+                                               "random,string,typing,dataclasses,datetime,decimal,fractions")
+
+# ---- zygote side ----------------------------------------------------------
+
+
+def _zygote_main(fd, preload):
+    import importlib
+
+    for name in filter(None, preload.split(",")):
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+    sock = socket.socket(fileno=fd)
+    wake_r, wake_w = os.pipe()
+    os.set_blocking(wake_r, False)
+    os.set_blocking(wake_w, False)
+    signal.set_wakeup_fd(wake_w)
+    signal.signal(signal.SIGCHLD, lambda *_: None)
+    children = {}  # pid -> run id
+
+    def send(msg):
+        try:
+            sock.send(json.dumps(msg).encode("utf-8"))
+        except OSError:
+            pass  # parent closed the socket; recv_fds() below sees that and we exit
+
+    def reap():
+        while children:
+            try:
+                pid, status, rusage = os.wait4(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            run_id = children.pop(pid, None)
+            if run_id is not None:
+                send({"op": "exit", "id": run_id, "status": os.waitstatus_to_exitcode(status),
+                      "usage": sandbox.rusage_usage(rusage)})
+
+    send({"op": "ready", "pid": os.getpid()})
+    while True:
+        try:
+            readable, _, _ = select.select([sock, wake_r], [], [])
+        except InterruptedError:
+            continue
+        if wake_r in readable:
+            try:
+                while os.read(wake_r, 512):
+                    pass
+            except BlockingIOError:
+                pass
+        if sock in readable:
+            data, fds, _, _ = socket.recv_fds(sock, 65536, 3)
+            if not data:
+                break  # parent retired us
+            msg = json.loads(data)
+            if msg["op"] == "ping":
+                send({"op": "pong", "id": msg["id"]})
+            elif msg["op"] == "run":
+                try:
+                    pid = os.fork()
+                except OSError as e:
+                    send({"op": "error", "id": msg["id"], "error": str(e)})
+                    pid = None
+                if pid == 0:
+                    sock.close()
+                    os.close(wake_r)
+                    os.close(wake_w)
+                    _run_child(msg, fds)  # never returns
+                for f in fds:
+                    os.close(f)
+                if pid:
+                    children[pid] = msg["id"]
+                    send({"op": "started", "id": msg["id"], "pid": pid})
+        reap()
+
+
+def _std_stream(fd):
+    """Text stream buffered the way CPython sets up stdout/stderr (honours -u / PYTHONUNBUFFERED)."""
+    import io
+
+    buffered = not sys.stdout.write_through  # the zygote itself was started with the same flags/env
+    raw = io.FileIO(fd, "w", closefd=False)
+    return io.TextIOWrapper(
+        io.BufferedWriter(raw) if buffered else raw,
+        encoding=sys.stdout.encoding, errors="backslashreplace" if fd == 2 else sys.stdout.errors,
+        line_buffering=buffered and (fd == 2 or os.isatty(fd)), write_through=not buffered,
+    )
+
+
+def _run_child(msg, fds):
+    """Inside the forked child: become a normal `python path` process."""
+    import random
+    import runpy
+    import traceback
+
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    os.setsid()  # own process group, so the parent can kill the whole tree
+    sandbox.apply_limits(msg.get("limits") or {})
+    for target, fd in zip((0, 1, 2), fds):
+        os.dup2(fd, target)
+    for fd in set(fds):
+        if fd > 2:
+            os.close(fd)
+    sys.stdin = sys.__stdin__ = open(0, "r", closefd=False)
+    sys.stdout = sys.__stdout__ = _std_stream(1)
+    sys.stderr = sys.__stderr__ = _std_stream(2)
+
+    path = msg["path"]
+    os.chdir(msg["cwd"])
+    sys.argv = [path]
+    sys.path[0] = os.path.dirname(path)
+    random.seed()  # siblings must not share the zygote's random state
+
+    code = 0
+    try:
+        runpy.run_path(path, run_name="__main__")
+    except SystemExit as e:
+        code = e.code
+    except BaseException as e:
+        # drop the runpy frames so the traceback looks like a cold run's
+        tb = e.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != path:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb)
+        code = 1
+    sys.exit(code)  # normal interpreter shutdown: atexit, threads, flushing
+
+
+# ---- parent side ----------------------------------------------------------
+
+
+class WarmProcess:
+    """Popen-like handle for a child forked by a zygote (binary pipes)."""
+
+    def __init__(self, stdin, stdout, stderr):
+        self.stdin = stdin
+        self.stdout = stdout
+        self.stderr = stderr
+        self.pid = None
+        self.returncode = None
+        self.usage = None
+        self._exited = threading.Event()
+        self._exit_callbacks = []
+        self._lock = threading.Lock()
+        self._pending_signal = None  # sent on "started"; send_signal() runs on the event loop and must not wait
+
+    def _set_started(self, pid):
+        with self._lock:
+            self.pid = pid
+            if self._pending_signal is not None:
+                self._signal(self._pending_signal)
+                self._pending_signal = None
+
+    def _set_exit(self, status, usage=None):
+        with self._lock:
+            self.returncode = status
+            self._pending_signal = None
+        self.usage = usage
+        self._exited.set()
+        for callback in self._exit_callbacks:
+            try:
+                callback()
+            except Exception:
+                pass  # e.g. the waiter's event loop is closed; the zygote reader must carry on
+
+    def add_exit_callback(self, callback):
+        """Call callback() from the reader thread once the child has exited (or right away)."""
+        self._exit_callbacks.append(callback)
+        if self._exited.is_set():
+            callback()
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self, timeout=None):
+        if not self._exited.wait(timeout):
+            raise subprocess.TimeoutExpired("warm python", timeout)
+        return self.returncode
+
+    def send_signal(self, sig):
+        with self._lock:
+            if self.returncode is not None:
+                return
+            if self.pid is None:
+                if self._pending_signal != signal.SIGKILL:
+                    self._pending_signal = sig
+                return
+            self._signal(sig)
+
+    def _signal(self, sig):
+        try:
+            os.killpg(self.pid, sig)
+        except ProcessLookupError:
+            # "started" can beat the child's setsid(); until then it has no group and no
+            # children, and the zygote has not reaped it, so the pid is still ours
+            try:
+                os.kill(self.pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def communicate(self, input=None, timeout=None):
+        return _communicate(self, input, timeout)
+
+
+def _communicate(proc, input, timeout):
+    """subprocess.Popen.communicate for any handle with binary pipes."""
+    results = {}
+
+    def read(name, stream):
+        results[name] = stream.read() if stream else None
+        if stream:
+            stream.close()
+
+    def write():
+        try:
+            if input:
+                proc.stdin.write(input)
+            proc.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+
+    threads = [threading.Thread(target=read, args=(name, getattr(proc, name)), daemon=True)
+               for name in ("stdout", "stderr")]
+    if proc.stdin:
+        threads.append(threading.Thread(target=write, daemon=True))
+    for t in threads:
+        t.start()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    proc.wait(timeout)
+    for t in threads:
+        t.join(None if deadline is None else max(0.1, deadline - time.monotonic()))
+    return results.get("stdout"), results.get("stderr")
+
+
+class _Zygote:
+    def __init__(self, preload=WARM_PY_PRELOAD):
+        parent_sock, child_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self.sock = parent_sock
+        self.proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), str(child_sock.fileno()), preload],
+            pass_fds=[child_sock.fileno()], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+        )
+        child_sock.close()
+        self.ready = threading.Event()
+        self.uses = 0
+        self.retiring = False
+        self._ids = itertools.count(1)
+        self._pending = {}  # run id -> WarmProcess
+        self._pings = {}    # ping id -> Event
+        self._lock = threading.Lock()
+        threading.Thread(target=self._reader, name="warm-zygote-reader", daemon=True).start()
+
+    @property
+    def alive(self):
+        return self.proc.poll() is None
+
+    def _send(self, msg, fds=()):
+        data = json.dumps(msg).encode("utf-8")
+        with self._lock:
+            if fds:
+                socket.send_fds(self.sock, [data], list(fds))
+            else:
+                self.sock.send(data)
+
+    def _reader(self):
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except OSError:
+                data = b""
+            if not data:
+                break
+            msg = json.loads(data)
+            op = msg["op"]
+            if op == "ready":
+                self.ready.set()
+                continue
+            if op == "pong":
+                event = self._pings.pop(msg["id"], None)
+                if event:
+                    event.set()
+                continue
+            with self._lock:
+                handle = self._pending.get(msg["id"])
+                if op in ("exit", "error"):
+                    self._pending.pop(msg["id"], None)
+                done = self.retiring and not self._pending
+            if handle is None:
+                continue
+            if op == "started":
+                handle._set_started(msg["pid"])
+            elif op == "exit":
+                handle._set_exit(msg["status"], msg.get("usage"))
+            else:
+                handle._set_exit(-1)
+            if done:
+                self.close()
+
+        # zygote gone: nobody can report these exits any more
+        with self._lock:
+            orphans, self._pending = list(self._pending.values()), {}
+        for handle in orphans:
+            handle._set_exit(-1)
+
+    def spawn(self, path, cwd, merge_stderr=False, limits=None):
+        in_r, in_w = os.pipe()
+        out_r, out_w = os.pipe()
+        if merge_stderr:
+            err_r, err_w = None, out_w
+        else:
+            err_r, err_w = os.pipe()
+        handle = WarmProcess(os.fdopen(in_w, "wb", 0), os.fdopen(out_r, "rb", 0),
+                             os.fdopen(err_r, "rb", 0) if err_r is not None else None)
+        run_id = next(self._ids)
+        with self._lock:
+            self._pending[run_id] = handle
+            self.uses += 1
+        try:
+            self._send({"op": "run", "id": run_id, "path": path, "cwd": cwd, "limits": limits or {}},
+                       (in_r, out_w, err_w))
+        except OSError:
+            with self._lock:
+                self._pending.pop(run_id, None)
+            for f in (handle.stdin, handle.stdout, handle.stderr):
+                if f:
+                    f.close()
+            return None
+        finally:
+            for fd in {in_r, out_w, err_w}:
+                os.close(fd)
+        return handle
+
+    def ping(self, timeout=2.0) -> bool:
+        ping_id = next(self._ids)
+        event = self._pings[ping_id] = threading.Event()
+        try:
+            self._send({"op": "ping", "id": ping_id})
+        except OSError:
+            return False
+        return event.wait(timeout)
+
+    def retire(self):
+        """Stop handing out runs; close once the in-flight ones have exited."""
+        with self._lock:
+            self.retiring = True
+            idle = not self._pending
+        if idle:
+            self.close()
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        try:
+            self.proc.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+
+# argv[1] is the header pipe's fd; it is then replaced by the script path
+_NODE_BOOTSTRAP = (
+    "const fs = require('fs');"
+    "const fd = Number(process.argv[1]);"
+    "const h = JSON.parse(fs.readFileSync(fd, 'utf8'));"
+    "fs.closeSync(fd);"
+    "process.chdir(h.cwd);"
+    "process.argv[1] = h.path;"
+    "require('module').runMain();"
+)
+
+
+class _NodeWorker:
+    def __init__(self, merge_stderr):
+        header_r, self.header_w = os.pipe()
+        self.proc = subprocess.Popen(
+            ["node", "-e", _NODE_BOOTSTRAP, str(header_r)], pass_fds=[header_r],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT if merge_stderr else subprocess.PIPE, start_new_session=True,
+        )
+        os.close(header_r)
+        os.set_inheritable(self.header_w, False)
+        self.created = time.monotonic()
+
+    @property
+    def alive(self):
+        return self.proc.poll() is None
+
+    def start(self, path, cwd, limits=None):
+        # the worker is still blocked on its header, so limiting it now is race-free
+        sandbox.apply_limits(limits or {}, self.proc.pid)
+        os.write(self.header_w, json.dumps({"path": path, "cwd": cwd}).encode("utf-8"))
+        os.close(self.header_w)
+        return self.proc
+
+    def discard(self):
+        try:
+            os.close(self.header_w)
+        except OSError:
+            pass
+        if self.alive:
+            self.proc.kill()
+            self.proc.wait()
+
+
+class WarmPool:
+    def __init__(self, size=WARM_POOL_SIZE, max_uses=WARM_MAX_USES):
+        self.size = max(0, size)
+        self.max_uses = max(1, max_uses)
+        self._zygotes = []
+        self._node = {False: collections.deque(), True: collections.deque()}
+        self._node_wanted = {False: False, True: False}
+        self._rr = itertools.count()
+        self._lock = threading.Lock()
+        self._monitor = None
+        self.counters = {"warm_starts": 0, "cold_starts": 0, "zygote_spawns": 0, "zygote_retired": 0,
+                         "node_spawns": 0, "health_failures": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    # -- public --
+
+    def start(self, lang, path, cwd, merge_stderr=False, limits=None):
+        """Start `path` on a warm worker; returns a Popen-like handle or None (use a cold start)."""
+        if not self.size:
+            return None
+        self._ensure_monitor()
+        handle = None
+        if lang == "python":
+            handle = self._start_python(path, cwd, merge_stderr, limits)
+        elif lang == "js":
+            handle = self._start_node(path, cwd, merge_stderr, limits)
+        self._count("warm_starts" if handle is not None else "cold_starts")
+        return handle
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self.counters)
+            data["zygotes"] = sum(1 for z in self._zygotes if z.ready.is_set() and z.alive)
+            data["node_idle"] = len(self._node[False]) + len(self._node[True])
+        data.update(enabled=bool(self.size), size=self.size, max_uses=self.max_uses)
+        return data
+
+    # -- python --
+
+    def _start_python(self, path, cwd, merge_stderr, limits):
+        with self._lock:
+            if not self._zygotes:
+                self._fill_zygotes()
+                return None  # first run pays the cold start while the pool warms up
+            ready = [z for z in self._zygotes if z.ready.is_set() and z.alive]
+            if not ready:
+                return None
+            zygote = ready[next(self._rr) % len(ready)]
+            if zygote.uses + 1 >= self.max_uses:
+                self._zygotes.remove(zygote)
+                self.counters["zygote_retired"] += 1
+                self._fill_zygotes()
+        handle = zygote.spawn(path, cwd, merge_stderr, limits)
+        if zygote.uses >= self.max_uses:
+            zygote.retire()
+        return handle
+
+    def _fill_zygotes(self):
+        # caller holds self._lock
+        while len(self._zygotes) < self.size:
+            try:
+                self._zygotes.append(_Zygote())
+            except OSError:
+                return
+            self.counters["zygote_spawns"] += 1
+
+    # -- node --
+
+    def _start_node(self, path, cwd, merge_stderr, limits):
+        with self._lock:
+            self._node_wanted[merge_stderr] = True
+            spares = self._node[merge_stderr]
+            worker = None
+            while spares:
+                candidate = spares.popleft()
+                if candidate.alive:
+                    worker = candidate
+                    break
+                candidate.discard()
+        threading.Thread(target=self._fill_node, args=(merge_stderr,), daemon=True).start()
+        if worker is None:
+            return None
+        try:
+            return worker.start(path, cwd, limits)
+        except OSError:
+            worker.discard()
+            return None
+
+    def _fill_node(self, merge_stderr):
+        while True:
+            with self._lock:
+                if len(self._node[merge_stderr]) >= self.size:
+                    return
+            try:
+                worker = _NodeWorker(merge_stderr)
+            except OSError:
+                return  # node not installed
+            with self._lock:
+                self._node[merge_stderr].append(worker)
+                self.counters["node_spawns"] += 1
+
+    # -- health --
+
+    def _ensure_monitor(self):
+        with self._lock:
+            if self._monitor is None or not self._monitor.is_alive():
+                self._monitor = threading.Thread(target=self._health_loop, name="warm-pool-health", daemon=True)
+                self._monitor.start()
+
+    def _health_loop(self):
+        while True:
+            time.sleep(WARM_HEALTH_INTERVAL)
+            self.check_health()
+
+    def check_health(self):
+        """Replace zygotes that died or stopped answering and node workers that are dead or stale."""
+        with self._lock:
+            zygotes = list(self._zygotes)
+        for zygote in zygotes:
+            if not zygote.ready.is_set() and zygote.alive:
+                continue  # still importing
+            if zygote.alive and zygote.ping():
+                continue
+            self._count("health_failures")
+            with self._lock:
+                if zygote in self._zygotes:
+                    self._zygotes.remove(zygote)
+                self._fill_zygotes()
+            zygote.retire()
+            if zygote.alive:
+                zygote.proc.kill()
+
+        now = time.monotonic()
+        for merge_stderr, spares in self._node.items():
+            with self._lock:
+                stale = [w for w in spares if not w.alive or now - w.created > WARM_MAX_IDLE]
+                for w in stale:
+                    spares.remove(w)
+                wanted = self._node_wanted[merge_stderr]
+            for w in stale:
+                if not w.alive:
+                    self._count("health_failures")
+                w.discard()
+            if wanted:
+                self._fill_node(merge_stderr)
+
+
+warm_pool = WarmPool() if WARM_POOL_ENABLED else WarmPool(size=0)
+
+
+# ---- runner helpers -------------------------------------------------------
+
+
+class AsyncProcess:
+    """asyncio.subprocess.Process look-alike that also records what the run cost."""
+
+    def __init__(self, handle, stdin, stdout, stderr=None, cgroup=None):
+        self._handle = handle
+        self.stdin = stdin
+        self.stdout = stdout
+        self.stderr = stderr
+        self.usage = None
+        self._cgroup = cgroup
+        self._started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        self._exited = loop.create_future()
+        if isinstance(handle, WarmProcess):
+            handle.add_exit_callback(lambda: loop.call_soon_threadsafe(self._on_exit, handle.usage))
+        else:
+            # our own child: a pidfd says when it exits and wait4() reaps it with its rusage
+            self._rss_floor_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self._pidfd = os.pidfd_open(handle.pid)
+            loop.add_reader(self._pidfd, self._reap, loop)
+
+    @property
+    def pid(self):
+        return self._handle.pid
+
+    @property
+    def returncode(self):
+        return self._handle.returncode
+
+    def _reap(self, loop):
+        loop.remove_reader(self._pidfd)
+        os.close(self._pidfd)
+        try:
+            _, status, rusage = os.wait4(self._handle.pid, 0)
+        except ChildProcessError:  # reaped behind our back: exit status and usage are lost
+            if self._handle.returncode is None:
+                self._handle.returncode = -1
+            self._on_exit(None)
+            return
+        self._handle.returncode = os.waitstatus_to_exitcode(status)
+        self._on_exit(sandbox.rusage_usage(rusage, self._rss_floor_kb))
+
+    def _on_exit(self, usage):
+        if self._exited.done():
+            return
+        usage = dict(usage or {"cpu_ms": None, "peak_rss_kb": None})
+        if self._cgroup:
+            usage.update(sandbox.cgroup_release(self._cgroup))
+        usage["wall_ms"] = round((time.monotonic() - self._started) * 1000, 1)
+        usage.update(sandbox.exit_info(self.returncode))
+        self.usage = usage
+        self._exited.set_result(None)
+
+    async def wait(self):
+        """Wait for exit without tying up a thread."""
+        await asyncio.shield(self._exited)
+        return self.returncode
+
+    async def communicate(self, input=None):
+        async def feed():
+            if input:
+                self.stdin.write(input)
+                try:
+                    await self.stdin.drain()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+            self.stdin.close()
+
+        async def read(stream):
+            return await stream.read() if stream is not None else None
+
+        _, out, err = await asyncio.gather(feed(), read(self.stdout), read(self.stderr))
+        await self.wait()
+        return out, err
+
+    def send_signal(self, sig):
+        if self._exited.done():
+            return  # reaped: the pid may already belong to someone else
+        if isinstance(self._handle, WarmProcess):
+            self._handle.send_signal(sig)
+            return
+        try:
+            os.killpg(self._handle.pid, sig)  # the run is a session leader
+        except ProcessLookupError:
+            pass
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+
+def _discard_started(future):
+    """Done callback: kill a warm run whose starter was cancelled, off the event loop."""
+    if future.cancelled() or future.exception() is not None or future.result() is None:
+        return
+    handle = future.result()
+
+    def discard():
+        if isinstance(handle, WarmProcess):
+            handle.kill()
+        else:
+            try:
+                os.killpg(handle.pid, signal.SIGKILL)  # a node worker leads its own session
+            except ProcessLookupError:
+                pass
+        handle.wait()
+        for f in (handle.stdin, handle.stdout, handle.stderr):
+            if f:
+                f.close()
+
+    threading.Thread(target=discard, daemon=True).start()
+
+
+async def astart_process(build: dict, cwd: str, merge_stderr: bool = True):
+    """
+    Start a run with piped stdin/stdout (and stderr unless merged) on the running loop,
+    under sandbox limits. Returns an AsyncProcess.
+    """
+    limits = sandbox.run_limits(build["lang"])
+    cgroup = sandbox.cgroup_create(limits)
+    if cgroup:
+        limits["cgroup"] = cgroup
+    handle = None
+    try:
+        if build.get("source_path"):
+            start = asyncio.ensure_future(asyncio.to_thread(warm_pool.start, build["lang"], build["source_path"],
+                                                            cwd, merge_stderr, limits))
+            try:
+                handle = await asyncio.shield(start)
+            except asyncio.CancelledError:
+                # the thread still starts the run; it must not outlive us in a recycled workspace
+                start.add_done_callback(_discard_started)
+                raise
+        if handle is None:
+            argv = sandbox.limited_command(build["cmd"], limits)
+            handle = subprocess.Popen(
+                argv or build["cmd"], cwd=cwd, stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT if merge_stderr else subprocess.PIPE,
+                start_new_session=True)
+            if argv is None:
+                sandbox.apply_limits(limits, handle.pid)  # no prlimit(1): limit it as soon as it runs
+    except BaseException:
+        if cgroup:
+            sandbox.cgroup_release(cgroup)
+        raise
+
+    loop = asyncio.get_running_loop()
+
+    async def reader_for(pipe):
+        if pipe is None:
+            return None
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+        return reader
+
+    process = AsyncProcess(handle, None, None, cgroup=cgroup)
+    transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, handle.stdin)
+    process.stdin = asyncio.StreamWriter(transport, protocol, None, loop)
+    process.stdout = await reader_for(handle.stdout)
+    process.stderr = await reader_for(handle.stderr)
+    return process
+
+
+if __name__ == "__main__":
+    _zygote_main(int(sys.argv[1]), sys.argv[2] if len(sys.argv) > 2 else "")
@@ -0,0 +1,188 @@
+# backend/converter_app/workspaces.py
+"""
+Recycled working directories for runs.
+
+Instead of mkdtemp + rmtree per run, WORKSPACE_POOL_SIZE directories are
+created once under a RAM-backed root (/dev/shm unless it is missing or
+mounted noexec; override with WORKSPACE_ROOT). A run borrows one, and on
+return its contents are unlinked and the directory goes back on the free
+list; only a directory that cannot be wiped is thrown away.
+
+While the pool runs, its root's filesystem may fill by at most
+WORKSPACE_MAX_BYTES, and by at most half of its size (Docker gives
+/dev/shm only 64 MB); one statvfs() per acquire checks that. Past the cap
+new workspaces are made on disk (tempfile.gettempdir()) and deleted after
+use; when the root already is on that disk there is no cap. Workspaces that
+are garbage collected without being released are recycled and counted as
+leaks.
+"""
+
+import itertools
+import os
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+from collections import Counter
+
+WORKSPACE_POOL_SIZE = int(os.getenv("WORKSPACE_POOL_SIZE", "16"))
+WORKSPACE_MAX_BYTES = int(os.getenv("WORKSPACE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+def _default_root():
+    shm = "/dev/shm"
+    try:
+        usable = os.access(shm, os.W_OK) and not os.statvfs(shm).f_flag & os.ST_NOEXEC
+    except OSError:
+        usable = False
+    return os.path.join(shm if usable else tempfile.gettempdir(), f"code_converter_ws_{os.getuid()}")
+
+
+WORKSPACE_ROOT = os.getenv("WORKSPACE_ROOT") or _default_root()
+
+
+def _fs_used(path):
+    st = os.statvfs(path)
+    return (st.f_blocks - st.f_bfree) * st.f_frsize
+
+
+def _byte_cap(root, max_bytes):
+    """How far the pool may fill root's filesystem; 0 (no cap) when spilling would land on it anyway."""
+    if not max_bytes or os.stat(root).st_dev == os.stat(tempfile.gettempdir()).st_dev:
+        return 0
+    st = os.statvfs(root)
+    return min(max_bytes, st.f_blocks * st.f_frsize // 2)
+
+
+def _owner_alive(name):
+    try:
+        os.kill(int(name.split("-")[1]), 0)
+    except (IndexError, ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _wipe(path):
+    """Empty `path` but keep the directory itself."""
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:
+                os.unlink(entry.path)
+
+
+class Workspace:
+    """A borrowed directory; use as a context manager or call release()."""
+
+    def __init__(self, pool, path, owner, recycled):
+        self.path = path
+        self.owner = owner
+        self._pool = pool
+        self._finalizer = weakref.finalize(self, pool._leaked, path, recycled)
+
+    def release(self):
+        # detach() hands back the arguments only once, so double releases are harmless
+        info = self._finalizer.detach()
+        if info:
+            self._pool._release(*info[2])
+
+    def __enter__(self):
+        return self.path
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class WorkspacePool:
+    def __init__(self, root=WORKSPACE_ROOT, size=WORKSPACE_POOL_SIZE, max_bytes=WORKSPACE_MAX_BYTES):
+        self.root = root
+        self.size = max(0, size)
+        self.max_bytes = max_bytes
+        self._free = []
+        self._active = {}  # path -> (owner, acquired)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._ready = False
+        self._cap = 0
+        self._baseline = 0  # bytes used on the root's filesystem when the pool started
+        self.counters = {"acquired": 0, "reused": 0, "created": 0, "spilled_to_disk": 0,
+                         "wipe_failures": 0, "leaked": 0}
+
+    def _prepare(self):
+        # caller holds self._lock
+        if self._ready:
+            return
+        os.makedirs(self.root, mode=0o700, exist_ok=True)
+        # left behind by server processes that are gone (other workers share the root)
+        for name in os.listdir(self.root):
+            if not _owner_alive(name):
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+        for _ in range(self.size):
+            self._free.append(self._new_dir())
+        self._cap = _byte_cap(self.root, self.max_bytes)
+        self._baseline = _fs_used(self.root)
+        self._ready = True
+
+    def _new_dir(self):
+        path = os.path.join(self.root, f"ws-{os.getpid()}-{next(self._ids)}")
+        os.mkdir(path, 0o700)
+        self.counters["created"] += 1
+        return path
+
+    def acquire(self, owner="run") -> Workspace:
+        """Borrow an empty directory for one run."""
+        with self._lock:
+            self.counters["acquired"] += 1
+            try:
+                self._prepare()
+                in_ram = not self._cap or _fs_used(self.root) - self._baseline < self._cap
+            except OSError:
+                in_ram = False
+            if not in_ram:
+                self.counters["spilled_to_disk"] += 1
+                path, recycled = tempfile.mkdtemp(prefix="code_run_"), False
+            elif self._free:
+                self.counters["reused"] += 1
+                path, recycled = self._free.pop(), True
+            else:
+                path, recycled = self._new_dir(), True
+            self._active[path] = (owner, time.monotonic())
+        return Workspace(self, path, owner, recycled)
+
+    def _release(self, path, recycled):
+        with self._lock:
+            self._active.pop(path, None)
+        if recycled:
+            try:
+                _wipe(path)
+            except OSError:
+                with self._lock:
+                    self.counters["wipe_failures"] += 1
+            else:
+                with self._lock:
+                    if len(self._free) < self.size:
+                        self._free.append(path)
+                        return
+        shutil.rmtree(path, ignore_errors=True)
+
+    def _leaked(self, path, recycled):
+        with self._lock:
+            self.counters["leaked"] += 1
+        self._release(path, recycled)
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self.counters)
+            now = time.monotonic()
+            ages = [now - acquired for _, acquired in self._active.values()]
+            data.update(root=self.root, byte_cap=self._cap, active=len(self._active), free=len(self._free),
+                        active_by_owner=dict(Counter(owner for owner, _ in self._active.values())),
+                        oldest_active_seconds=round(max(ages), 1) if ages else 0.0)
+        return data
+
+
+workspace_pool = WorkspacePool()